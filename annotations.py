@@ -1,101 +1,145 @@
+from collections import namedtuple
+
 from sgflib import Property
 from utils import convert_position, is_pass
 
+# Win rate losses of mistake severities commented by render_delta, from the worst one
+MISTAKE_LEVELS = (('big mistakes', 0.2), ('mistakes', 0.1), ('not best', 0.05), ('disliked', 0.025))
+
+# Name of the bot in comments
+BOT_NAME = "Leela"
+
+LABELS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+SEPARATOR = "=================================\n"
+WINRATE_TEMPLATE = "Overall black win%: {winrate:.2f}%\n"
+NO_WINRATE_TEMPLATE = "Overall black win%: not computed ({bot} still in opening book)\n"
+PREFERRED_MOVE_TEMPLATE = "{bot}'s preferred next move: {move}\n"
+
+# Comment lines of mistake severities of MISTAKE_LEVELS, and whether the move is labelled
+MISTAKE_TEMPLATES = (("{bot} thinks {move} is a big mistake!\nWinning percentage drops by {loss:.2f}%!\n", True),
+                     ("{bot} thinks {move} is a mistake!\nWinning percentage drops by {loss:.2f}%\n", True),
+                     ("{bot} thinks {move} is not the best choice.\nWinning percentage drops by {loss:.2f}%\n", True),
+                     ("{bot} slightly dislikes {move}.\n", False))
+
+BOOK_MOVES_TEMPLATE = "==========================\nConsidered {bookmoves}/{positions} bookmoves\n"
+VISITS_TEMPLATE = "==========================\nVisited {visits} nodes\n\n"
+CANDIDATE_TEMPLATE = "{label} -> Win%: {winrate:.2f}% ({visits} visits) \n"
+
+# Results attached to a node, they are rendered in the order they were added
+WinrateRecord = namedtuple('WinrateRecord', ['stats', 'move_list', 'next_game_move'])
+DeltaRecord = namedtuple('DeltaRecord', ['delta', 'move'])
+AnalysisRecord = namedtuple('AnalysisRecord', ['stats', 'move_list', 'this_move'])
+
+
+def render_winrate(record, board_size, bot, comment, labels, triangles):
+    stats, move_list = record.stats, record.move_list
 
-def format_winrate(stats, move_list, board_size, next_game_move):
-    comment = ""
     if 'winrate' in stats:
-        comment += "Overall black win%%: %.2f%%\n" % (stats['winrate'] * 100)
+        comment.append(WINRATE_TEMPLATE.format(winrate=stats['winrate'] * 100))
     else:
-        comment += "Overall black win%: not computed (Leela still in opening book)\n"
+        comment.append(NO_WINRATE_TEMPLATE.format(bot=bot))
 
-    if len(move_list) > 0 and move_list[0]['pos'] != next_game_move:
-        comment += "Leela's preferred next move: %s\n" % convert_position(board_size, move_list[0]['pos'])
+    if len(move_list) > 0 and move_list[0]['pos'] != record.next_game_move:
+        comment.append(PREFERRED_MOVE_TEMPLATE.format(bot=bot, move=convert_position(board_size, move_list[0]['pos'])))
     else:
-        comment += "\n"
-
-    return comment
-
-
-def format_delta_info(delta, this_move, board_size):
-    comment = ""
-    LB_values = []
-    if delta <= -0.2:
-        comment += "=================================\n"
-        comment += "Leela thinks %s is a big mistake!\n" % convert_position(board_size, this_move)
-        comment += "Winning percentage drops by %.2f%%!\n" % (-delta * 100)
-        comment += "=================================\n"
-        if not is_pass(board_size, this_move):
-            LB_values.append("%s:%s" % (this_move, "?"))
-    elif delta <= -0.1:
-        comment += "=================================\n"
-        comment += "Leela thinks %s is a mistake!\n" % convert_position(board_size, this_move)
-        comment += "Winning percentage drops by %.2f%%\n" % (-delta * 100)
-        comment += "=================================\n"
-        if not is_pass(board_size, this_move):
-            LB_values.append("%s:%s" % (this_move, "?"))
-    elif delta <= -0.05:
-        comment += "=================================\n"
-        comment += "Leela thinks %s is not the best choice.\n" % convert_position(board_size, this_move)
-        comment += "Winning percentage drops by %.2f%%\n" % (-delta * 100)
-        comment += "=================================\n"
-        if not is_pass(board_size, this_move):
-            LB_values.append("%s:%s" % (this_move, "?"))
-    elif delta <= -0.025:
-        comment += "=================================\n"
-        comment += "Leela slightly dislikes %s.\n" % convert_position(board_size, this_move)
-        comment += "=================================\n"
-
-    comment += "\n"
-    return comment, LB_values
+        comment.append("\n")
+
+
+def render_delta(record, board_size, bot, comment, labels, triangles):
+    for (_, loss), (template, labelled) in zip(MISTAKE_LEVELS, MISTAKE_TEMPLATES):
+        if record.delta <= -loss:
+            comment.append(SEPARATOR)
+            comment.append(template.format(bot=bot, move=convert_position(board_size, record.move),
+                                           loss=-record.delta * 100))
+            comment.append(SEPARATOR)
+
+            if labelled and not is_pass(board_size, record.move):
+                labels.append(f"{record.move}:?")
+            break
+
+    comment.append("\n")
 
 
 def flip_winrate(wr, color):
     return (1.0 - wr) if color == "white" else wr
 
 
-def format_analysis(stats, move_list, this_move, board_size):
-    abet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
-    comment = ""
+def render_analysis(record, board_size, bot, comment, labels, triangles):
+    stats, move_list, this_move = record.stats, record.move_list, record.this_move
+
     if 'bookmoves' in stats:
-        comment += "==========================\n"
-        comment += "Considered %d/%d bookmoves\n" % (stats['bookmoves'], stats['positions'])
+        comment.append(BOOK_MOVES_TEMPLATE.format(bookmoves=int(stats['bookmoves']), positions=int(stats['positions'])))
     else:
-        comment += "==========================\n"
-        comment += "Visited %d nodes\n" % (stats['visits'])
-        comment += "\n"
-
-        for move_label, move in list(zip(abet, move_list)):
-            comment += "%s -> Win%%: %.2f%% (%d visits) \n" \
-                       % (move_label, flip_winrate(move['winrate'], move['color']) * 100, move['visits'])
+        comment.append(VISITS_TEMPLATE.format(visits=int(stats['visits'])))
+        for label, move in zip(LABELS, move_list):
+            comment.append(CANDIDATE_TEMPLATE.format(label=label, visits=int(move['visits']),
+                                                     winrate=flip_winrate(move['winrate'], move['color']) * 100))
 
     # Check for pos being "" or "tt", values which indicate passes, and don't attempt to display markers for them
-    LB_values = ["%s:%s" % (mv['pos'], L) for L, mv in zip(abet, move_list) if mv['pos'] != "" and mv['pos'] != "tt"]
-    mvs = [mv['pos'] for mv in move_list]
-    if this_move not in mvs and this_move is not None and not is_pass(board_size, this_move):
-        TR_values = [this_move]
+    labels.extend(f"{move['pos']}:{label}" for label, move in zip(LABELS, move_list) if move['pos'] not in ("", "tt"))
+
+    if this_move is not None and not is_pass(board_size, this_move) \
+            and all(move['pos'] != this_move for move in move_list):
+        triangles.append(this_move)
+
+
+RENDERERS = {WinrateRecord: render_winrate, DeltaRecord: render_delta, AnalysisRecord: render_analysis}
+
+
+def render_records(records, board_size, bot=BOT_NAME):
+    """ Returns comment, LB and TR values of given records."""
+    comment, labels, triangles = [], [], []
+
+    for record in records:
+        RENDERERS[type(record)](record, board_size, bot, comment, labels, triangles)
+
+    return "".join(comment), labels, triangles
+
+
+class Annotations:
+    """
+    Analysis results attached to SGF nodes as records, so analysis only collects them.
+    Comments, LB and TR properties are rendered when the game is saved, only for nodes with new records.
+    Text and markers the node had before the first record are kept in front of rendered ones.
+    """
+
+    def __init__(self, board_size, bot=BOT_NAME):
+        self.board_size = board_size
+        self.bot = bot
+        self._nodes = {}
+        self._changed = {}
+
+    def add(self, node, record):
+        key = id(node)
+
+        if key not in self._nodes:
+            original = (node['C'].data[0] if 'C' in node else "",
+                        list(node['LB'].data) if 'LB' in node else [],
+                        list(node['TR'].data) if 'TR' in node else [])
+            self._nodes[key] = (node, original, [])
+
+        self._nodes[key][2].append(record)
+        self._changed[key] = node
+
+    def render(self):
+        """ Writes properties of nodes with records added since the previous call."""
+        changed, self._changed = self._changed, {}
+
+        for key in changed:
+            node, (original_comment, original_labels, original_triangles), records = self._nodes[key]
+            comment, labels, triangles = render_records(records, self.board_size, self.bot)
+
+            if comment:
+                set_property(node, 'C', [original_comment + comment])
+            if labels:
+                set_property(node, 'LB', original_labels + labels)
+            if triangles:
+                set_property(node, 'TR', original_triangles + triangles)
+
+
+def set_property(node, label, values):
+    if label in node:
+        node[label].data = values
     else:
-        TR_values = []
-    return comment, LB_values, TR_values
-
-
-def annotate_sgf(cursor, comment, LB_values, TR_values):
-    c_node = cursor.node
-
-    if comment:
-        if 'C' in c_node:
-            c_node['C'].data[0] += comment
-        else:
-            c_node.add_property(Property('C', [comment]))
-
-    if LB_values:
-        if 'LB' in c_node:
-            c_node['LB'].extend(LB_values)
-        else:
-            c_node.add_property(Property('LB', LB_values))
-
-    if TR_values:
-        if 'TR' in c_node:
-            c_node['TR'].extend(TR_values)
-        else:
-            c_node.add_property(Property('TR', TR_values))
+        node.add_property(Property(label, values))
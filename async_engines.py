@@ -0,0 +1,271 @@
+import asyncio
+from collections import namedtuple
+
+from bot_engines import STDERR_TIMEOUT, CLIException, EngineFailure
+from engine_pool import MAX_RETRIES
+from log import logger
+
+# Position to analyze: GTP commands of played moves and game settings
+Position = namedtuple('Position', ['history', 'board_size', 'komi', 'handicap'])
+Position.__new__.__defaults__ = (19, 6.5, 0)
+
+
+class AsyncGTPEngine:
+    """
+    GTP console driven by asyncio, so a single thread can run searches of many engines at the same time.
+    Game settings, history, output parsing and session of the given synchronous CLI are used, it is never started.
+    Missed deadlines and closed output fail the engine with EngineFailure as they do in BaseCLI.
+    """
+
+    def __init__(self, cli):
+        self.cli = cli
+        self.process = None
+        self.stderr = []
+        self._stderr_task = None
+        self._summarized = None
+        self._lock = None
+        self._killed = False
+
+    @property
+    def running(self):
+        if self.cli.replaying:
+            return self._lock is not None
+        return self.process is not None and self.process.returncode is None and not self._killed \
+            and not self.cli.failed
+
+    def engine_failure(self, message) -> EngineFailure:
+        """ Marks GTP console as failed and returns exception to raise, exit status is added if it exited."""
+        self.cli.failed = True
+
+        if self.process is not None and self.process.returncode is not None:
+            message = f"{message} Exit status: {self.process.returncode}."
+
+        return EngineFailure(message)
+
+    async def start(self):
+        logger.info("Starting GTP...")
+
+        self.cli.open_transcript()
+        self._lock = asyncio.Lock()
+
+        if self.cli.replaying:
+            logger.info("Replaying GTP session from %s.", self.cli.session.path)
+            return
+
+        self.cli.failed = False
+        self.process = await asyncio.create_subprocess_exec(self.cli.executable, *self.cli.arguments,
+                                                            stdin=asyncio.subprocess.PIPE,
+                                                            stdout=asyncio.subprocess.PIPE,
+                                                            stderr=asyncio.subprocess.PIPE)
+        self.stderr = []
+        self._killed = False
+        self._summarized = asyncio.Event()
+        self._stderr_task = asyncio.ensure_future(self._read_stderr(self.process.stderr))
+
+        # Deadlines of commands apply once GTP console is ready
+        await self.send_command(f'boardsize {self.cli.board_size}', timeout=self.cli.startup_timeout)
+        await self.send_command(f'komi {self.cli.komi}')
+        await self.send_command(f'time_settings 0 {self.cli.time_per_move} 1')
+        logger.info("GTP started successfully.")
+
+    async def stop(self, timeout=5):
+        """ Asks GTP console to quit and kills it if it doesn't."""
+        logger.info("Stopping GTP...")
+
+        if self.process is None:
+            self._lock = None
+            self.cli.close_transcript()
+            return
+
+        if self.running:
+            try:
+                await self.send_command('quit', timeout=timeout)
+                await asyncio.wait_for(self.process.wait(), timeout)
+            except (CLIException, OSError, asyncio.TimeoutError):
+                logger.warning("GTP console is not responding.")
+
+        # Failed GTP console would not quit anyway
+        self.kill()
+        await self.process.wait()
+        await self._stderr_task
+        self.process = None
+        self._lock = None
+        self.cli.close_transcript()
+
+        logger.info("GTP stopped successfully...")
+
+    def kill(self):
+        """ Kills GTP console at once, e.g. when its search is cancelled and its state is unknown."""
+        if self.process is not None and self.process.returncode is None and not self._killed:
+            self.process.kill()
+            self._killed = True
+
+    async def _read_stderr(self, stream):
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+
+            line = line.decode('utf-8', errors='replace')
+            self.stderr.append(line)
+            self.cli.log_transcript("! ", [line])
+            self.cli.parse_status_update(line)
+
+            if self.cli.is_summary_line(line):
+                self._summarized.set()
+
+        # Nothing more is coming
+        self._summarized.set()
+
+    async def _read_reply(self):
+        """ Returns lines of the next reply, it starts with '=' or '?' and ends with an empty line."""
+        lines = []
+
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise self.engine_failure("GTP console closed its output.")
+
+            line = line.decode('utf-8', errors='replace')
+            if not lines and line[:1] not in ('=', '?'):
+                continue
+
+            if not line.strip():
+                break
+
+            lines.append(line)
+
+        self.cli.log_transcript("< ", lines)
+        return lines
+
+    async def send_command(self, cmd, timeout=10):
+        """
+        Sends GTP command and returns its reply lines, raises CLIException if command failed.
+        Missed deadline fails the engine, late reply would be taken for reply of the next command.
+        """
+        self.cli.log_transcript("> ", [cmd])
+        self.process.stdin.write(f"{cmd}\n".encode())
+        await self.process.stdin.drain()
+
+        try:
+            reply = await asyncio.wait_for(self._read_reply(), timeout)
+        except asyncio.TimeoutError:
+            raise self.engine_failure(f"GTP console did not reply to {cmd} in {timeout:.1f} seconds.")
+
+        if reply[0].startswith('?'):
+            raise CLIException(f"Command {cmd} failed: {reply[0][1:].strip()}")
+
+        return reply
+
+    async def set_position(self, position: Position, time_per_move):
+        if position.board_size != self.cli.board_size:
+            await self.send_command(f'boardsize {position.board_size}')
+        if position.komi != self.cli.komi:
+            await self.send_command(f'komi {position.komi}')
+        if time_per_move != self.cli.time_per_move:
+            await self.send_command(f'time_settings 0 {time_per_move} 1')
+
+        self.cli.set_game(position.board_size, position.komi, position.handicap)
+        self.cli.time_per_move = time_per_move
+        self.cli.set_history(position.history)
+
+        await self.send_command('clear_board')
+        for command in position.history:
+            await self.send_command(command)
+
+    async def analyze(self, position: Position, time_per_move):
+        """ Analyzes position with given seconds per search, returns stats and move list as BaseCLI.analyze."""
+        async with self._lock:
+            if self.cli.replaying:
+                self.cli.set_game(position.board_size, position.komi, position.handicap)
+                self.cli.time_per_move = time_per_move
+                self.cli.set_history(position.history)
+                stdout, stderr = self.cli.replay_search()
+            else:
+                stdout, stderr = await self.genmove(position, time_per_move)
+
+            return self.cli.parse_analysis(stdout, stderr)
+
+    async def genmove(self, position, time_per_move):
+        await self.set_position(position, time_per_move)
+        await self.send_command(f'time_left black {time_per_move:d} 1')
+        await self.send_command(f'time_left white {time_per_move:d} 1')
+
+        del self.stderr[:]
+        self._summarized.clear()
+        stdout = await self.send_command(f'genmove {self.cli.whose_turn()}', timeout=time_per_move * 2 + 10)
+
+        # Analysis is written before the move, but stderr is read by its own task
+        try:
+            await asyncio.wait_for(self._summarized.wait(), STDERR_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("GTP console did not summarize the search in %.1f seconds.", STDERR_TIMEOUT)
+        stderr, self.stderr = self.stderr, []
+
+        self.cli.record_search(stdout, stderr)
+        return stdout, stderr
+
+
+class AsyncEnginePool:
+    """
+    Set of started async GTP consoles, each of them analyzes a single position at a time.
+    Positions wait for an idle engine in a queue, so any number of them can be analyzed concurrently.
+    """
+
+    def __init__(self, factory, size=1):
+        self._factory = factory
+        self._engines = []
+        self._idle = None
+
+        self.size = max(1, int(size))
+
+    async def start(self):
+        logger.info("Starting %d bot instances...", self.size)
+
+        self._idle = asyncio.Queue()
+        self._engines = [AsyncGTPEngine(self._factory()) for _ in range(self.size)]
+        await asyncio.gather(*(engine.start() for engine in self._engines))
+
+        for engine in self._engines:
+            self._idle.put_nowait(engine)
+
+    async def stop(self):
+        await asyncio.gather(*(engine.stop() for engine in self._engines))
+        self._engines = []
+
+    async def analyze(self, position: Position, time_per_move, timeout=None):
+        """
+        Analyzes position on the first idle engine, waiting for it is included in timeout.
+        Engine interrupted by timeout or cancellation is killed and restarted for the next position.
+        """
+        return await asyncio.wait_for(self._analyze(position, time_per_move), timeout)
+
+    async def _analyze(self, position, time_per_move):
+        # Search failed by the engine is retried on restarted engine, as EnginePool does
+        for retry in range(MAX_RETRIES + 1):
+            engine = await self._idle.get()
+
+            try:
+                if not engine.running:
+                    await engine.stop()
+                    await engine.start()
+
+                return await engine.analyze(position, time_per_move)
+
+            except EngineFailure:
+                engine.kill()
+                if retry >= MAX_RETRIES:
+                    raise
+                logger.exception("Engine failed, retrying analysis...")
+
+            except (asyncio.CancelledError, asyncio.TimeoutError, CLIException, OSError):
+                engine.kill()
+                raise
+
+            finally:
+                self._idle.put_nowait(engine)
+
+    async def analyze_all(self, positions, time_per_move, timeout=None):
+        """ Analyzes positions concurrently, failed positions get their exception instead of results."""
+        return await asyncio.gather(*(self.analyze(position, time_per_move, timeout) for position in positions),
+                                    return_exceptions=True)
@@ -0,0 +1,53 @@
+"""
+Measures time spent by analysis threads on logging raw engine output, run from repository root:
+
+    python benchmarks/log_overhead.py [records]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import QueueListener
+from queue import Queue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log import DeferredQueueHandler, LazyLines  # noqa: E402
+
+LINES = [f" Q{i % 19 + 1} ->    {1000 - i} (V: 45.12%) (LCB: 44.00%) (N: 12.50%) PV: Q16 D4 Q3 D16 R5\n"
+         for i in range(200)]
+
+
+def measure(name, handler, log, records):
+    bench_logger = logging.getLogger(f'bench.{name}')
+    bench_logger.propagate = False
+    bench_logger.setLevel(logging.DEBUG)
+    bench_logger.addHandler(handler)
+
+    start = time.perf_counter()
+    for _ in range(records):
+        log(bench_logger)
+    elapsed = time.perf_counter() - start
+
+    bench_logger.removeHandler(handler)
+    print(f"{name:<40} {elapsed / records * 1e6:8.1f} us per record in analysis thread")
+
+
+if __name__ == '__main__':
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_handler = logging.FileHandler(os.path.join(tmp_dir, 'sync.log'))
+        measure('file handler, joined output', file_handler,
+                lambda bench_logger: bench_logger.debug("GTP stderr:\n%s", ''.join(LINES)), records)
+        file_handler.close()
+
+        queue_file_handler = logging.FileHandler(os.path.join(tmp_dir, 'queue.log'))
+        records_queue = Queue()
+        listener = QueueListener(records_queue, queue_file_handler)
+        listener.start()
+        measure('queue handler, lazily joined output', DeferredQueueHandler(records_queue),
+                lambda bench_logger: bench_logger.debug("%s", LazyLines("! ", LINES)), records)
+        listener.stop()
+        queue_file_handler.close()
@@ -0,0 +1,175 @@
+"""
+Measures overhead of the analyzer itself on synthetic games, bots are replaced by tests/fake_engine.py.
+Run from repository root:
+
+    python benchmarks/orchestration.py [--engines 2] [--lengths 20,60,120] [--delay 0]
+
+Reports GTP command round trip, parse cost, positions/sec of analysis without checkpoints, with checkpoints on disk
+and with results cached in memory (watch mode), memory of main line results in the store compared to dicts of bots,
+and cost of saving annotated SGF.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_ENGINE = os.path.join(REPO_DIR, 'tests', 'fake_engine.py')
+BOTS = ('fake-leela', 'fake-leela-zero')
+
+sys.path.insert(0, REPO_DIR)
+
+
+def write_config(path, engines, delay):
+    import yaml
+
+    with open(os.path.join(REPO_DIR, 'config.yaml')) as yaml_stream:
+        config = yaml.safe_load(yaml_stream)
+
+    config['log_level'] = 40
+    config['config'].update(analyze_time=1, variations_time=1, engines=engines, graph_format='svg')
+    config['bots'] = {'default': BOTS[-1]}
+    for bot in BOTS:
+        config['bots'][bot] = {'bot_type': bot[len('fake-'):], 'executable': sys.executable,
+                               'arguments': f"{FAKE_ENGINE} --format {bot[len('fake-'):]} --delay {delay}"}
+
+    with open(path, mode='w') as yaml_stream:
+        yaml.safe_dump(config, yaml_stream)
+
+
+def write_game(path, length):
+    """ Writes game of random distinct moves, the same for the same length."""
+    rng = random.Random(length)
+    points = rng.sample([f"{chr(97 + x)}{chr(97 + y)}" for x in range(19) for y in range(19)], length)
+    moves = "".join(f";{'BW'[i % 2]}[{point}]" for i, point in enumerate(points))
+
+    with open(path, mode='w') as sgf_file:
+        sgf_file.write(f"(;GM[1]FF[4]SZ[19]KM[6.5]PB[Black]PW[White]{moves})")
+
+
+def count_files(path):
+    return sum(len(files) for _, _, files in os.walk(path))
+
+
+def report(name, value, unit):
+    print(f"{name:<52} {value:12,.1f} {unit}")
+
+
+def measure_commands(bot, count=200):
+    from sgfanalyze import create_bot
+
+    cli = create_bot(bot)
+    cli.start()
+    try:
+        start = time.perf_counter()
+        for _ in range(count):
+            cli.send_command('name')
+        report(f"{bot}: command round trip", (time.perf_counter() - start) / count * 1e6, "us")
+
+        outputs = []
+        for i in range(20):
+            cli.set_history([f"play {'black' if j % 2 == 0 else 'white'} {'ABCDEFGHJ'[j % 9]}{j // 9 + 1}"
+                             for j in range(i)])
+            cli.go_to_position()
+            outputs.append((list(cli.history), cli.genmove()))
+    finally:
+        cli.stop()
+
+    repeats = 100
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for history, (stdout, stderr) in outputs:
+            cli.set_history(history)
+            cli.parse_analysis(stdout, stderr)
+    report(f"{bot}: parse analysis", (time.perf_counter() - start) / repeats / len(outputs) * 1e6, "us")
+
+
+def measure_results_memory(bot, length, analyzer):
+    """ Reports bytes per main line position kept by the store and by the same results as dicts returned by bots."""
+    move_nums = list(analyzer.all_stats)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        results = [(analyzer.all_stats[move_num], analyzer.all_move_lists[move_num]) for move_num in move_nums]
+        dicts_bytes = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del results
+
+    report(f"{bot}, {length} moves: main line results in store", analyzer.results.nbytes / len(move_nums),
+           "bytes/position")
+    report(f"{bot}, {length} moves: main line results as dicts", dicts_bytes / len(move_nums), "bytes/position")
+
+
+def measure_analysis(bot, engines, lengths, games_dir):
+    import settings
+    from engine_pool import EnginePool
+    from sgfanalyze import BotAnalyzer, ResultsCache, create_bot
+
+    checkpoints_dir = settings.CHECKPOINTS_DIR.format(bot)
+    pool = EnginePool(partial(create_bot, bot), engines)
+    pool.start()
+
+    try:
+        for length in lengths:
+            path = os.path.join(games_dir, f"game_{length}.sgf")
+            write_game(path, length)
+            cache = ResultsCache()
+
+            def run():
+                analyzer = BotAnalyzer(path, bot, pool=pool, cache=cache)
+                start = time.perf_counter()
+                assert analyzer.run(), "analysis failed, see log for details"
+                return analyzer, time.perf_counter() - start
+
+            analyzed = count_files(checkpoints_dir)
+            analyzer, elapsed = run()
+            positions = count_files(checkpoints_dir) - analyzed
+            report(f"{bot}, {length} moves: analysis ({positions} positions)", positions / elapsed, "positions/s")
+            measure_results_memory(bot, length, analyzer)
+
+            cache = ResultsCache()
+            _, elapsed = run()
+            report(f"{bot}, {length} moves: stored checkpoints", positions / elapsed, "positions/s")
+
+            analyzer, elapsed = run()
+            report(f"{bot}, {length} moves: cached results", positions / elapsed, "positions/s")
+
+            repeats = 20
+            start = time.perf_counter()
+            for _ in range(repeats):
+                analyzer.save_to_file()
+            report(f"{bot}, {length} moves: save SGF", (time.perf_counter() - start) / repeats * 1e3, "ms")
+    finally:
+        pool.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--engines', type=int, default=2, help="Number of fake bots")
+    parser.add_argument('--lengths', default='20,60,120', help="Comma separated numbers of moves of synthetic games")
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds of every fake search")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Settings, checkpoints and logs are relative to the working directory
+        os.chdir(work_dir)
+        write_config(os.path.join(work_dir, 'config.yaml'), args.engines, args.delay)
+
+        import sgfanalyze
+        sgfanalyze.init(os.path.join(work_dir, 'config.yaml'))
+
+        for bot in BOTS:
+            measure_commands(bot)
+            measure_analysis(bot, args.engines, [int(length) for length in args.lengths.split(',')], work_dir)
+
+        os.chdir(REPO_DIR)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Measures parsing throughput of recorded Leela and Leela Zero output, run from repository root:
+
+    python benchmarks/parser.py [repeats]
+
+Reference parser is the former one, matching every pattern against every line, results of both must be equal.
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot_engines import LeelaCLI, LeelaZeroCLI, str_to_percent  # noqa: E402
+from utils import parse_position  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def load_samples(path):
+    """ Returns (stdout, stderr) of every genmove recorded in file, sections start with '#stdout' and '#stderr'."""
+    samples = []
+    stdout, stderr, section = [], [], None
+
+    with open(path) as data_file:
+        for line in data_file:
+            if line.startswith('#stderr'):
+                if stdout or stderr:
+                    samples.append((stdout, stderr))
+                stdout, stderr = [], []
+                section = stderr
+            elif line.startswith('#stdout'):
+                section = stdout
+            else:
+                section.append(line)
+
+    samples.append((stdout, stderr))
+    return samples
+
+
+class ReferenceLeelaCLI(LeelaCLI):
+    status_regex = r'MC winrate=([0-9]+\.[0-9]+), ' \
+                   r'NN eval=([0-9]+\.[0-9]+), ' \
+                   r'score=([BW]\+[0-9]+\.[0-9]+)'
+    status_regex_no_vn = r'MC winrate=([0-9]+\.[0-9]+), ' \
+                         r'score=([BW]\+[0-9]+\.[0-9]+)'
+    move_regex = r'^([A-Z][0-9]+) -> +([0-9]+) ' \
+                 r'\(W: +(\-?[0-9]+\.[0-9]+)\%\) ' \
+                 r'\(U: +(\-?[0-9]+\.[0-9]+)\%\) ' \
+                 r'\(V: +([0-9]+\.[0-9]+)\%: +([0-9]+)\) ' \
+                 r'\(N: +([0-9]+\.[0-9]+)\%\) ' \
+                 r'PV: (.*)$'
+    move_regex_no_vn = r'^([A-Z][0-9]+) -> +([0-9]+) ' \
+                       r'\(U: +(\-?[0-9]+\.[0-9]+)\%\) ' \
+                       r'\(R: +([0-9]+\.[0-9]+)\%: +([0-9]+)\) ' \
+                       r'\(N: +([0-9]+\.[0-9]+)\%\) ' \
+                       r'PV: (.*)$'
+    best_regex = r'([0-9]+) visits, ' \
+                 r'score (\-? ?[0-9]+\.[0-9]+)\% \(from \-? ?[0-9]+\.[0-9]+\%\) ' \
+                 r'PV: (.*)'
+    stats_regex = r'([0-9]+) visits, ' \
+                  r'([0-9]+) nodes(?:, ([0-9]+) playouts)(?:, ([0-9]+) p/s)'
+    bookmove_regex = r'([0-9]+) book moves, ([0-9]+) total positions'
+    finished_regex = r'= ([A-Z][0-9]+|resign|pass)'
+
+    def parse_analysis(self, stdout, stderr):
+        stats = {}
+        move_list = []
+
+        finished = False
+        summarized = False
+
+        for line in stderr:
+            line = line.strip()
+            if line.startswith('================'):
+                finished = True
+
+            stats = self.parse_bookmove(stats, line)
+            stats.update(self.parse_move_status(line))
+            move_list = self.parse_move(move_list, line)
+
+            if finished and not summarized:
+                stats = self.parse_best(stats, line)
+                stats, summarized = self.parse_status(stats, summarized, line)
+
+        stats = self.parse_finished(stats, stdout)
+
+        if 'bookmoves' in stats and len(move_list) == 0:
+            move_list.append({'pos': stats['chosen'], 'is_book': True})
+        elif stats['chosen'] == "resign":
+            stats['chosen'] = stats['best']
+
+        if 'best' in stats:
+            move_list = sorted(move_list,
+                               key=(lambda move: 1000000000000000 if move['pos'] == stats[
+                                   'best'] else move['visits']),
+                               reverse=True)
+
+        return stats, move_list
+
+    def parse_bookmove(self, stats, line):
+        m = re.match(self.bookmove_regex, line)
+        if m is not None:
+            stats['bookmoves'] = int(m.group(1))
+            stats['positions'] = int(m.group(2))
+        return stats
+
+    def parse_move_status(self, line):
+        m = re.match(self.status_regex, line)
+        if m is not None:
+            return {'mc_winrate': self.flip_winrate(float(m.group(1))),
+                    'nn_winrate': self.flip_winrate(float(m.group(2))),
+                    'margin': m.group(3)}
+
+        m = re.match(self.status_regex_no_vn, line)
+        if m is not None:
+            return {'mc_winrate': self.flip_winrate(float(m.group(1))),
+                    'margin': m.group(2)}
+        return {}
+
+    def parse_move(self, move_list, line):
+        m = re.match(self.move_regex, line)
+        if m is not None:
+            move_list.append({
+                'pos': parse_position(self.board_size, m.group(1)),
+                'visits': int(m.group(2)),
+                'winrate': self.flip_winrate(str_to_percent(m.group(3))),
+                'mc_winrate': self.flip_winrate(str_to_percent(m.group(4))),
+                'nn_winrate': self.flip_winrate(str_to_percent(m.group(5))),
+                'nn_count': int(m.group(6)),
+                'policy_prob': str_to_percent(m.group(7)),
+                'pv': [parse_position(self.board_size, p) for p in m.group(8).split()],
+                'color': self.whose_turn()
+            })
+
+        m = re.match(self.move_regex_no_vn, line)
+        if m is not None:
+            mc_winrate = self.flip_winrate(str_to_percent(m.group(3)))
+            move_list.append({
+                'pos': parse_position(self.board_size, m.group(1)),
+                'visits': int(m.group(2)),
+                'winrate': mc_winrate,
+                'mc_winrate': mc_winrate,
+                'r_winrate': self.flip_winrate(str_to_percent(m.group(4))),
+                'r_count': int(m.group(5)),
+                'policy_prob': str_to_percent(m.group(6)),
+                'pv': [parse_position(self.board_size, p) for p in m.group(7).split()],
+                'color': self.whose_turn()
+            })
+        return move_list
+
+    def parse_best(self, stats, line):
+        m = re.match(self.best_regex, line)
+        if m is not None:
+            stats['best'] = parse_position(self.board_size, m.group(3).split()[0])
+            stats['winrate'] = self.flip_winrate(str_to_percent(m.group(2)))
+        return stats
+
+    def parse_status(self, stats, summarized, line):
+        m = re.match(self.stats_regex, line)
+        if m is not None:
+            stats['visits'] = int(m.group(1))
+            summarized = True
+        return stats, summarized
+
+    def parse_finished(self, stats, stdout):
+        m = re.search(self.finished_regex, "".join(stdout))
+        if m is not None:
+            stats['chosen'] = "resign" if m.group(1) == "resign" else parse_position(
+                self.board_size, m.group(1))
+        return stats
+
+
+class ReferenceLeelaZeroCLI(ReferenceLeelaCLI):
+    status_regex = r'NN eval=([0-9]+\.[0-9]+)'
+    move_regex = r'\s*([A-Z][0-9]+) -> +([0-9]+) ' \
+                 r'\(V: +([0-9]+\.[0-9]+)\%\) .*' \
+                 r'\(N: +([0-9]+\.[0-9]+)\%\) ' \
+                 r'PV: (.*)$'
+    stats_regex = r'([0-9]+) visits, ' \
+                  r'([0-9]+) nodes(?:, ([0-9]+) playouts)(?:, ([0-9]+) n/s)'
+
+    def parse_analysis(self, stdout, stderr):
+        stats = {}
+        move_list = []
+
+        for line in stderr:
+            line = line.strip()
+            stats = self.parse_bookmove(stats, line)
+            stats.update(self.parse_move_status(line))
+            move_list = self.parse_move(move_list, line)
+            stats = self.parse_status(stats, None, line)
+
+        stats['best'] = move_list[0]['pos']
+        stats['winrate'] = move_list[0]['winrate']
+
+        stats = self.parse_finished(stats, stdout)
+
+        if stats['chosen'] == "resign":
+            stats['chosen'] = stats['best']
+
+        return stats, move_list
+
+    def parse_move_status(self, line):
+        m = re.match(self.status_regex, line)
+        if m is not None:
+            return {'winrate': self.flip_winrate(float(m.group(1)))}
+        return {}
+
+    def parse_move(self, move_list, line):
+        m = re.match(self.move_regex, line)
+        if m is not None:
+            move_list.append({
+                'pos': parse_position(self.board_size, m.group(1)),
+                'visits': int(m.group(2)),
+                'winrate': self.flip_winrate(str_to_percent(m.group(3))),
+                'policy_prob': str_to_percent(m.group(4)),
+                'pv': [parse_position(self.board_size, p) for p in m.group(5).split()],
+                'color': self.whose_turn()
+            })
+        return move_list
+
+    def parse_status(self, stats, summarized, line):
+        m = re.match(self.stats_regex, line)
+        if m is not None:
+            stats['visits'] = int(m.group(1))
+        return stats
+
+
+def measure(name, engine, samples, repeats):
+    lines = sum(len(stdout) + len(stderr) for stdout, stderr in samples) * repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for stdout, stderr in samples:
+            engine.parse_analysis(stdout, stderr)
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:<40} {lines / elapsed:12,.0f} lines/sec")
+    return lines / elapsed
+
+
+def compare(name, engine_class, reference_class, data_file, repeats):
+    samples = load_samples(os.path.join(DATA_DIR, data_file))
+
+    # Parse as black and as white, win rates of white are flipped
+    for history in ([], ["play black Q16"]):
+        engine = engine_class(name, name, '')
+        reference = reference_class(name, name, '')
+        engine.set_history(history)
+        reference.set_history(history)
+
+        for stdout, stderr in samples:
+            assert engine.parse_analysis(stdout, stderr) == reference.parse_analysis(stdout, stderr), \
+                f"{name}: results differ from reference parser"
+
+    before = measure(f"{name}, reference parser", reference, samples, repeats)
+    after = measure(f"{name}, single-pass parser", engine, samples, repeats)
+    print(f"{name:<40} {after / before:12.2f}x\n")
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    compare('leela', LeelaCLI, ReferenceLeelaCLI, 'leela.txt', repeats)
+    compare('leela-zero', LeelaZeroCLI, ReferenceLeelaZeroCLI, 'leela-zero.txt', repeats)
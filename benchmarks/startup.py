@@ -0,0 +1,50 @@
+"""
+Measures start up time of the script, run from repository root:
+
+    python benchmarks/startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = {
+    'import sgfanalyze': [sys.executable, '-c', 'import sgfanalyze'],
+    'sgfanalyze.py --help': [sys.executable, 'sgfanalyze.py', '--help'],
+}
+
+HEAVY_MODULES = ['numpy', 'yaml', 'matplotlib', 'pyarrow', 'http.server']
+
+
+def measure(command, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def imported_heavy_modules():
+    output = subprocess.check_output(
+        [sys.executable, '-c', f'import sys, sgfanalyze; print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])'],
+        cwd=REPO_DIR, universal_newlines=True)
+    return output.split()
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    baseline = measure([sys.executable, '-c', 'pass'], runs)
+    print(f"{'python -c pass':<24} median {statistics.median(baseline) * 1000:7.1f} ms")
+
+    for name, command in COMMANDS.items():
+        timings = measure(command, runs)
+        print(f"{name:<24} median {statistics.median(timings) * 1000:7.1f} ms, "
+              f"min {min(timings) * 1000:7.1f} ms, "
+              f"over interpreter {(statistics.median(timings) - statistics.median(baseline)) * 1000:7.1f} ms")
+
+    print("Heavy modules imported by sgfanalyze:", ", ".join(imported_heavy_modules()) or "none")
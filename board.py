@@ -0,0 +1,94 @@
+import hashlib
+
+from coords import SGF_POINTS
+from utils import is_pass, parse_position
+
+
+class Board:
+    """
+    Go board with captures. Identifies positions independently of the order of moves leading to them.
+    Points are (x, y) tuples of SGF coordinates indexes.
+    """
+
+    def __init__(self, board_size=19):
+        self.board_size = board_size
+        self.stones = {}
+        self.ko = None
+
+    @classmethod
+    def from_history(cls, board_size, history):
+        """ Returns board after given GTP commands, e.g. 'play black D4'."""
+        board = cls(board_size)
+
+        for command in history:
+            _, color, vertex = command.split()
+            board.play(color, parse_position(board_size, vertex))
+
+        return board
+
+    def copy(self):
+        board = Board(self.board_size)
+        board.stones = self.stones.copy()
+        board.ko = self.ko
+        return board
+
+    def neighbours(self, point):
+        x, y = point
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if 0 <= nx < self.board_size and 0 <= ny < self.board_size:
+                yield nx, ny
+
+    def group(self, point):
+        """ Returns stones of the group at given point and its liberties."""
+        color = self.stones[point]
+        stones = {point}
+        liberties = set()
+        to_visit = [point]
+
+        while to_visit:
+            for neighbour in self.neighbours(to_visit.pop()):
+                neighbour_color = self.stones.get(neighbour)
+                if neighbour_color is None:
+                    liberties.add(neighbour)
+                elif neighbour_color == color and neighbour not in stones:
+                    stones.add(neighbour)
+                    to_visit.append(neighbour)
+
+        return stones, liberties
+
+    def play(self, color, pos):
+        """ Places stone on given SGF coordinates and removes captured stones."""
+        self.ko = None
+
+        if is_pass(self.board_size, pos):
+            return
+
+        point = SGF_POINTS[pos]
+        self.stones[point] = color
+
+        captured = set()
+        for neighbour in self.neighbours(point):
+            if self.stones.get(neighbour, color) != color:
+                stones, liberties = self.group(neighbour)
+                if not liberties:
+                    captured |= stones
+
+        for stone in captured:
+            del self.stones[stone]
+
+        stones, liberties = self.group(point)
+        if not liberties:
+            for stone in stones:
+                del self.stones[stone]
+        elif len(captured) == 1 and len(stones) == 1 and len(liberties) == 1:
+            self.ko = next(iter(captured))
+
+    def key(self, to_play):
+        """ Returns hash of stones, player to move and ko point."""
+        position_hash = hashlib.md5()
+        position_hash.update(bytes(f"{self.board_size} {to_play} {self.ko}", 'utf-8'))
+
+        for (x, y), color in sorted(self.stones.items()):
+            position_hash.update(bytes(f" {color[0]}{x}:{y}", 'utf-8'))
+
+        return position_hash.hexdigest()
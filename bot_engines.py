@@ -1,35 +1,83 @@
 import hashlib
+import itertools
 import re
-from subprocess import Popen, PIPE
-from time import sleep
+from subprocess import Popen, PIPE, TimeoutExpired
+from time import sleep, monotonic
 
-from log import logger
-from readerthread import start_reader_thread
-from utils import convert_position, parse_position
+import metrics
+from engine_io import close_reader, open_reader
+from log import end_transcript, log_transcript, logger
+from utils import convert_position, parse_position, parse_positions
 
 
 def str_to_percent(value: str):
     return 0.01 * float(value.strip())
 
 
+def next_color(history: list, handicap=0) -> str:
+    """ Return color of next move for given history of GTP commands."""
+    if len(history) == 0:
+        return "white" if handicap else "black"
+    else:
+        return "black" if "white" in history[-1] else "white"
+
+
+def move_command(board_size: int, color: str, pos: str) -> str:
+    """ Returns GTP command playing given SGF coordinates"""
+    return f"play {color} {convert_position(board_size, pos)}"
+
+
+def history_hash(history: list) -> str:
+    """ Returns MD5 hash for given history of GTP commands."""
+    md5 = hashlib.md5()
+
+    for command in history:
+        md5.update(bytes(command, 'utf-8'))
+
+    return md5.hexdigest()
+
+
 class CLIException(Exception):
     pass
 
 
+class EngineFailure(CLIException):
+    """ GTP console exited or stopped replying in time, its state is unknown and it has to be restarted."""
+    pass
+
+
+# Numbers of started engines, used to name their transcripts
+engine_numbers = itertools.count(1)
+
+# Seconds to wait for reply to the first command of started GTP console, loading weights or tuning OpenCL takes a while
+STARTUP_TIMEOUT = 300
+
+# Seconds to wait for the summary of the search on stderr after the move is replied, streams are read separately
+STDERR_TIMEOUT = 1.0
+
+
 class BaseCLI:
     """ Command Line Interface designed to work with GTP protocol."""
 
     def __init__(self, bot_type, executable, arguments,
-                 board_size=19, komi=6.5, handicap=0, time_per_move=60):
+                 board_size=19, komi=6.5, handicap=0, time_per_move=60, session=None, startup_timeout=STARTUP_TIMEOUT):
         self._history = []
 
+        # Recorder or replay of GTP session, see gtp_session
+        self.session = session
+
         self.process = None
-        self.stdout_thread = None
-        self.stderr_thread = None
+        self.stdout_reader = None
+        self.stderr_reader = None
+        self.transcript = None
+
+        # Set when GTP console misses a deadline or closes its output, cleared by start
+        self.failed = False
 
         self.bot_type = bot_type
         self.executable = executable
         self.arguments = arguments.split()
+        self.startup_timeout = startup_timeout
 
         self.board_size = board_size
         self.komi = komi
@@ -38,18 +86,48 @@ class BaseCLI:
 
     def history_hash(self) -> str:
         """Returns MD5 hash for current history."""
-        history_hash = hashlib.md5()
+        return history_hash(self._history)
+
+    def position_key(self) -> str:
+        """ Returns key of searched position in recorded sessions, search time changes the analysis too"""
+        return f"{self.board_size} {self.komi} {self.handicap} {self.time_per_move} {self.history_hash()}"
+
+    @property
+    def replaying(self) -> bool:
+        return self.session is not None and self.session.replaying
+
+    @property
+    def alive(self) -> bool:
+        """ True if GTP console is running and has not failed, replayed session never fails."""
+        if self.replaying:
+            return True
+        return self.process is not None and self.process.poll() is None and not self.failed
 
-        for command in self._history:
-            history_hash.update(bytes(command, 'utf-8'))
+    def engine_failure(self, message) -> EngineFailure:
+        """ Marks GTP console as failed and returns exception to raise, exit status is added if it exited."""
+        self.failed = True
 
-        return history_hash.hexdigest()
+        exit_status = self.process.poll() if self.process is not None else None
+        if exit_status is not None:
+            message = f"{message} Exit status: {exit_status}."
+
+        return EngineFailure(message)
+
+    def read_reply_line(self, timeout):
+        """ Returns the next stdout line or "" after timeout, raises EngineFailure if GTP console closed stdout."""
+        line = self.stdout_reader.readline(timeout=timeout)
+
+        # Lines are queued before the reader is closed, so the last of them could arrive after the timeout
+        if not line and self.stdout_reader.closed:
+            line = self.stdout_reader.readline()
+            if not line:
+                raise self.engine_failure("GTP console closed its output.")
+
+        return line
 
     def add_move_to_history(self, color: str, pos: str):
         """ Convert given SGF coordinates to GTP console command"""
-        move = convert_position(self.board_size, pos)
-        command = f"play {color} {move}"
-        self._history.append(command)
+        self._history.append(move_command(self.board_size, color, pos))
 
     def pop_move_from_history(self, count=1):
         """ Removes given number of last commands from history"""
@@ -59,66 +137,108 @@ class BaseCLI:
     def clear_history(self):
         self._history.clear()
 
+    @property
+    def history(self) -> list:
+        return self._history[:]
+
+    def set_history(self, history: list):
+        """ Replaces history with given list of GTP commands"""
+        self._history = list(history)
+
     def whose_turn(self) -> str:
         """ Return color of next move, based on number of handicap stones and moves."""
-        if len(self._history) == 0:
-            return "white" if self.handicap else "black"
-        else:
-            return "black" if "white" in self._history[-1] else "white"
+        return next_color(self._history, self.handicap)
+
+    def log_transcript(self, prefix, lines):
+        """ Writes raw GTP communication to the transcript of this engine"""
+        log_transcript(self.transcript, prefix, lines)
+
+    def open_transcript(self):
+        """ Starts new transcript, every start of the engine gets its own number"""
+        self.transcript = f"{self.bot_type}-{next(engine_numbers)}"
+
+    def close_transcript(self):
+        if self.transcript is not None:
+            end_transcript(self.transcript)
+            self.transcript = None
 
     def drain(self):
         """ Drains all remaining stdout and stderr contents"""
-        return self.stdout_thread.read_all_lines(), self.stderr_thread.read_all_lines()
+        stdout, stderr = self.stdout_reader.read_all_lines(), self.stderr_reader.read_all_lines()
+        self.log_transcript("< ", stdout)
+        self.log_transcript("! ", stderr)
+        return stdout, stderr
 
+    @metrics.timed('gtp_command')
     def send_command(self, cmd, timeout=100, drain=True):
         """Send command to GTP console and drains stdout/stderr"""
+        # Nothing is replayed, empty list of commands has no replies to wait for
+        if self.replaying or cmd == []:
+            return
+
         if isinstance(cmd, list):
             commands_count = len(cmd)
             command = '\n'.join(cmd)
+            self.log_transcript("> ", cmd)
         else:
             commands_count = 1
             command = cmd
+            self.log_transcript("> ", [cmd])
 
         self.process.stdin.write(command + "\n")
         self.process.stdin.flush()
 
-        tries = 0
+        # Timeout is given in tenths of a second
+        deadline = monotonic() + timeout * 0.1
         success_count = 0
-        while tries <= timeout:
-            # Loop until reach given number of success
-            while True:
-                s = self.stdout_thread.readline()
-
-                # Break loop, sleep and wait for more
-                if s == "":
-                    break
-
-                # GTP prints a line starting with "=" upon success.
-                if '=' in s:
-                    success_count += 1
-                    if success_count >= commands_count:
-                        if drain:
-                            self.drain()
-                        return
-
-            tries += 1
-            sleep(0.1)
-
-        logger.warning(f"Failed to send command: {command}")
+        replies = []
+        while monotonic() < deadline:
+            # Wait for the next reply line, exit of GTP console is noticed within a second
+            s = self.read_reply_line(timeout=min(max(deadline - monotonic(), 0), 1))
+            if s == "":
+                continue
+
+            replies.append(s)
+
+            # GTP prints a line starting with "=" upon success and with "?" upon failure.
+            if s.startswith('?'):
+                logger.warning(f"Command failed: {command}: {s[1:].strip()}")
+
+            if '=' in s or s.startswith('?'):
+                success_count += 1
+                if success_count >= commands_count:
+                    self.log_transcript("< ", replies)
+                    if drain:
+                        self.drain()
+                    return
+
+        self.log_transcript("< ", replies)
+        # Late replies would be taken for replies of the next commands
+        raise self.engine_failure(f"GTP console did not reply to {command} in {timeout * 0.1:.1f} seconds.")
 
     def start(self):
         logger.info("Starting GTP...")
 
+        self.open_transcript()
+
+        if self.replaying:
+            logger.info("Replaying GTP session from %s.", self.session.path)
+            return
+
+        self.failed = False
         self.process = Popen([self.executable] + self.arguments,
                              stdout=PIPE,
                              stdin=PIPE,
                              stderr=PIPE,
                              universal_newlines=True)
-        sleep(2)
-        self.stdout_thread = start_reader_thread(self.process.stdout)
-        self.stderr_thread = start_reader_thread(self.process.stderr)
-
-        self.send_command(f'boardsize {self.board_size}')
+        with metrics.timer('startup_sleep'):
+            sleep(2)
+        self.stdout_reader = open_reader(self.process.stdout)
+        # Search progress is logged as soon as the engine reports it
+        self.stderr_reader = open_reader(self.process.stderr, on_line=self.parse_status_update)
+
+        # Deadlines of commands apply once GTP console is ready, timeout is given in tenths of a second
+        self.send_command(f'boardsize {self.board_size}', timeout=self.startup_timeout * 10)
         self.send_command(f'komi {self.komi}')
         self.send_command(f'time_settings 0 {self.time_per_move} 1')
         logger.info("GTP started successfully.")
@@ -128,14 +248,61 @@ class BaseCLI:
         logger.info("Stopping GTP...")
 
         if self.process is None:
+            self.close_transcript()
             return
 
-        self.stdout_thread.stop()
-        self.stderr_thread.stop()
-        self.send_command('quit')
+        if self.process.poll() is None and not self.failed:
+            try:
+                self.send_command('quit')
+            except (CLIException, OSError):
+                logger.warning("GTP console is not responding.")
+
+        if self.failed and self.process.poll() is None:
+            # Hung GTP console would not quit anyway
+            logger.warning("GTP console failed, killing it.")
+            self.process.kill()
+
+        close_reader(self.stdout_reader)
+        close_reader(self.stderr_reader)
+
+        try:
+            self.process.wait(timeout=5)
+        except TimeoutExpired:
+            logger.warning("GTP console did not quit, killing it.")
+            self.process.kill()
+            self.process.wait()
+
+        for pipe in (self.process.stdin, self.process.stdout, self.process.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        self.process = None
+        self.close_transcript()
 
         logger.info("GTP stopped successfully...")
 
+    def set_game(self, board_size, komi, handicap):
+        """ Changes game settings of running GTP console without restart"""
+        if self.process is not None:
+            if board_size != self.board_size:
+                self.send_command(f'boardsize {board_size}')
+            if komi != self.komi:
+                self.send_command(f'komi {komi}')
+
+        self.board_size = board_size
+        self.komi = komi
+        self.handicap = handicap
+
+    def set_time_per_move(self, time_per_move):
+        """ Changes search time of running GTP console without restart"""
+        if time_per_move == self.time_per_move:
+            return
+
+        self.time_per_move = time_per_move
+        if self.process is not None:
+            self.send_command(f'time_settings 0 {self.time_per_move} 1')
+
     def reset(self):
         self.clear_history()
         self.stop()
@@ -159,13 +326,34 @@ class BaseCLI:
     def flip_winrate(self, wr):
         return (1.0 - wr) if self.whose_turn() == "white" else wr
 
+    def search_commands(self) -> list:
+        """ Returns GTP commands searching current position, as they are recorded in sessions"""
+        return ['clear_board'] + self._history + [f'time_left black {self.time_per_move:d} 1',
+                                                  f'time_left white {self.time_per_move:d} 1',
+                                                  f'genmove {self.whose_turn()}']
+
+    def replay_search(self):
+        """ Returns recorded stdout and stderr of the search of current position"""
+        stdout, stderr = self.session.replay(self.position_key())
+        self.log_transcript("< ", stdout)
+        self.log_transcript("! ", stderr)
+        return stdout, stderr
+
+    def record_search(self, stdout, stderr):
+        """ Records output of the search of current position if session is recorded"""
+        if self.session is not None:
+            self.session.record(self.position_key(), self.search_commands(), stdout, stderr)
+
+    @metrics.timed('engine_search')
     def genmove(self):
+        if self.replaying:
+            return self.replay_search()
+
         self.send_command(f'time_left black {self.time_per_move:d} 1')
         self.send_command(f'time_left white {self.time_per_move:d} 1')
 
-        logger.debug("Board state: %s to play\n%s", self.whose_turn(), self.showboard())
-
-        # Generate next move
+        # Generate next move, position is recorded in the transcript by the sent commands
+        self.log_transcript("> ", [f"genmove {self.whose_turn()}"])
         self.process.stdin.write(f"genmove {self.whose_turn()}\n")
         self.process.stdin.flush()
 
@@ -173,60 +361,71 @@ class BaseCLI:
         stdout = []
         stderr = []
 
+        # Search progress is parsed from stderr by the reader, here only the move is waited for
         while updated < self.time_per_move * 2:
-            out, err = self.drain()
-            stdout.extend(out)
-            stderr.extend(err)
-
-            self.parse_status_update("".join(err))
+            line = self.read_reply_line(timeout=1)
 
-            if out:
+            if line:
+                self.log_transcript("< ", [line])
+                stdout.append(line)
                 break
 
             updated += 1
-            sleep(1)
+        else:
+            raise self.engine_failure(f"GTP console did not generate move in {updated} seconds.")
 
         # Confirm generated move with new line
+        self.log_transcript("> ", [""])
         self.process.stdin.write("\n")
         self.process.stdin.flush()
 
+        # Analysis is written before the move, but stderr is read by its own thread
+        deadline = monotonic() + STDERR_TIMEOUT
+        while True:
+            remaining = deadline - monotonic()
+            line = self.stderr_reader.readline(timeout=remaining) if remaining > 0 else ""
+            if not line:
+                logger.warning("GTP console did not summarize the search in %.1f seconds.", STDERR_TIMEOUT)
+                break
+
+            stderr.append(line)
+            if self.is_summary_line(line):
+                break
+        self.log_transcript("! ", stderr)
+
         # Drain the rest of output
         out, err = self.drain()
         stdout.extend(out)
         stderr.extend(err)
 
+        self.record_search(stdout, stderr)
         return stdout, stderr
 
     def parse_status_update(self, message):
         raise NotImplementedError("parse_status_update not implemented.")
 
-    def parse_analysis(self, stdout, stderr):
-        raise NotImplementedError("parse_analysis not implemented.")
-
-    def parse_bookmove(self, stats, line):
-        pass
-
-    def parse_move_status(self, line):
-        pass
+    def is_summary_line(self, line):
+        raise NotImplementedError("is_summary_line not implemented.")
 
-    def parse_move(self, move_list, line):
+    def parse_analysis(self, stdout, stderr):
         raise NotImplementedError("parse_analysis not implemented.")
 
-    def parse_best(self, stats, line):
-        pass
-
-    def parse_status(self, stats, summarized, line):
-        return None, None
-
     def parse_finished(self, stats, stdout):
         pass
 
+    def winrate_flipper(self):
+        """ Returns function converting win rate of the side to move to black win rate."""
+        if self.whose_turn() == "white":
+            return lambda wr: 1.0 - wr
+        return lambda wr: wr
+
     def analyze(self):
         """Analyze current position with given seconds per search."""
         stdout, stderr = self.genmove()
 
         # Drain and parse Leela stdout & stderr
-        stats, move_list = self.parse_analysis(stdout, stderr)
+        with metrics.timer('parse'):
+            stats, move_list = self.parse_analysis(stdout, stderr)
 
         if stats.get('winrate') and move_list:
             best_move = convert_position(self.board_size, move_list[0]['pos'])
@@ -243,58 +442,79 @@ class BaseCLI:
 
 
 class LeelaCLI(BaseCLI):
-    update_regex = r'Nodes: ([0-9]+), ' \
-                   r'Win: ([0-9]+\.[0-9]+)\% \(MC:[0-9]+\.[0-9]+\%\/VN:[0-9]+\.[0-9]+\%\), ' \
-                   r'PV:(( [A-Z][0-9]+)+)'
-    update_regex_no_vn = r'Nodes: ([0-9]+), ' \
-                         r'Win: ([0-9]+\.[0-9]+)\%, ' \
-                         r'PV:(( [A-Z][0-9]+)+)'
-    status_regex = r'MC winrate=([0-9]+\.[0-9]+), ' \
-                   r'NN eval=([0-9]+\.[0-9]+), ' \
-                   r'score=([BW]\+[0-9]+\.[0-9]+)'
-    status_regex_no_vn = r'MC winrate=([0-9]+\.[0-9]+), ' \
-                         r'score=([BW]\+[0-9]+\.[0-9]+)'
-    move_regex = r'^([A-Z][0-9]+) -> +([0-9]+) ' \
-                 r'\(W: +(\-?[0-9]+\.[0-9]+)\%\) ' \
-                 r'\(U: +(\-?[0-9]+\.[0-9]+)\%\) ' \
-                 r'\(V: +([0-9]+\.[0-9]+)\%: +([0-9]+)\) ' \
-                 r'\(N: +([0-9]+\.[0-9]+)\%\) ' \
-                 r'PV: (.*)$'
-    move_regex_no_vn = r'^([A-Z][0-9]+) -> +([0-9]+) ' \
-                       r'\(U: +(\-?[0-9]+\.[0-9]+)\%\) ' \
-                       r'\(R: +([0-9]+\.[0-9]+)\%: +([0-9]+)\) ' \
-                       r'\(N: +([0-9]+\.[0-9]+)\%\) ' \
-                       r'PV: (.*)$'
-    best_regex = r'([0-9]+) visits, ' \
-                 r'score (\-? ?[0-9]+\.[0-9]+)\% \(from \-? ?[0-9]+\.[0-9]+\%\) ' \
-                 r'PV: (.*)'
-    stats_regex = r'([0-9]+) visits, ' \
-                  r'([0-9]+) nodes(?:, ([0-9]+) playouts)(?:, ([0-9]+) p/s)'
-    bookmove_regex = r'([0-9]+) book moves, ([0-9]+) total positions'
-    finished_regex = r'= ([A-Z][0-9]+|resign|pass)'
+    update_regex = re.compile(r'Nodes: ([0-9]+), '
+                              r'Win: ([0-9]+\.[0-9]+)\% \(MC:[0-9]+\.[0-9]+\%\/VN:[0-9]+\.[0-9]+\%\), '
+                              r'PV:(( [A-Z][0-9]+)+)')
+    status_regex = re.compile(r'MC winrate=([0-9]+\.[0-9]+), '
+                              r'NN eval=([0-9]+\.[0-9]+), '
+                              r'score=([BW]\+[0-9]+\.[0-9]+)')
+    status_regex_no_vn = re.compile(r'MC winrate=([0-9]+\.[0-9]+), '
+                                    r'score=([BW]\+[0-9]+\.[0-9]+)')
+    move_regex = re.compile(r'([A-Z][0-9]+) -> +([0-9]+) '
+                            r'\(W: +(\-?[0-9]+\.[0-9]+)\%\) '
+                            r'\(U: +(\-?[0-9]+\.[0-9]+)\%\) '
+                            r'\(V: +([0-9]+\.[0-9]+)\%: +([0-9]+)\) '
+                            r'\(N: +([0-9]+\.[0-9]+)\%\) '
+                            r'PV: (.*)$')
+    move_regex_no_vn = re.compile(r'([A-Z][0-9]+) -> +([0-9]+) '
+                                  r'\(U: +(\-?[0-9]+\.[0-9]+)\%\) '
+                                  r'\(R: +([0-9]+\.[0-9]+)\%: +([0-9]+)\) '
+                                  r'\(N: +([0-9]+\.[0-9]+)\%\) '
+                                  r'PV: (.*)$')
+    best_regex = re.compile(r'([0-9]+) visits, '
+                            r'score (\-? ?[0-9]+\.[0-9]+)\% \(from \-? ?[0-9]+\.[0-9]+\%\) '
+                            r'PV: (.*)')
+    stats_regex = re.compile(r'([0-9]+) visits, '
+                             r'([0-9]+) nodes(?:, ([0-9]+) playouts)(?:, ([0-9]+) p/s)')
+    bookmove_regex = re.compile(r'([0-9]+) book moves, ([0-9]+) total positions')
+    finished_regex = re.compile(r'= ([A-Z][0-9]+|resign|pass)')
 
     def parse_analysis(self, stdout, stderr):
-        """Parse stdout & stderr."""
-        logger.debug(f"GTP stdout:\n%s", ''.join(stdout))
-        logger.debug(f"GTP stderr:\n%s", ''.join(stderr))
+        """
+        Parse stdout & stderr.
+        Every line is classified once by its prefix, so at most one pattern is matched against it.
+        """
         stats = {}
         move_list = []
 
         finished = False
         summarized = False
 
+        color = self.whose_turn()
+        flip = self.winrate_flipper()
+
         for line in stderr:
             line = line.strip()
-            if line.startswith('================'):
-                finished = True
 
-            stats = self.parse_bookmove(stats, line)
-            stats.update(self.parse_move_status(line))
-            move_list = self.parse_move(move_list, line)
+            if ' -> ' in line:
+                move = self.parse_move(line, color, flip)
+                if move is not None:
+                    move_list.append(move)
+
+            elif line.startswith('MC winrate='):
+                stats.update(self.parse_move_status(line, flip))
 
-            if finished and not summarized:
-                stats = self.parse_best(stats, line)
-                stats, summarized = self.parse_status(stats, summarized, line)
+            elif line.startswith('================'):
+                finished = True
+
+            elif line[:1].isdigit():
+                if 'book moves' in line:
+                    m = self.bookmove_regex.match(line)
+                    if m is not None:
+                        stats['bookmoves'] = int(m.group(1))
+                        stats['positions'] = int(m.group(2))
+
+                elif finished and not summarized and ' score ' in line:
+                    m = self.best_regex.match(line)
+                    if m is not None:
+                        stats['best'] = parse_position(self.board_size, m.group(3).split()[0])
+                        stats['winrate'] = flip(str_to_percent(m.group(2)))
+
+                elif finished and not summarized:
+                    m = self.stats_regex.match(line)
+                    if m is not None:
+                        stats['visits'] = int(m.group(1))
+                        summarized = True
 
         stats = self.parse_finished(stats, stdout)
 
@@ -320,8 +540,12 @@ class LeelaCLI(BaseCLI):
 
         return stats, move_list
 
+    def is_summary_line(self, line):
+        """ True for the last stderr line of a search, i.e. its statistics or book moves"""
+        return self.stats_regex.match(line) is not None or self.bookmove_regex.match(line) is not None
+
     def parse_status_update(self, message):
-        m = re.match(self.update_regex, message)
+        m = self.update_regex.match(message)
 
         if m is not None:
             visits = int(m.group(1))
@@ -330,92 +554,59 @@ class LeelaCLI(BaseCLI):
             logger.debug("Visited %s positions, black winrate %.2f%%, PV: %s", visits,
                          winrate * 100, pv)
 
-    def parse_bookmove(self, stats, line):
-        m = re.match(self.bookmove_regex, line)
+    def parse_move_status(self, line, flip):
+        m = self.status_regex.match(line)
         if m is not None:
-            stats['bookmoves'] = int(m.group(1))
-            stats['positions'] = int(m.group(2))
-        return stats
-
-    def parse_move_status(self, line):
-        m = re.match(self.status_regex, line)
-        if m is not None:
-            return {'mc_winrate': self.flip_winrate(float(m.group(1))),
-                    'nn_winrate': self.flip_winrate(float(m.group(2))),
+            return {'mc_winrate': flip(float(m.group(1))),
+                    'nn_winrate': flip(float(m.group(2))),
                     'margin': m.group(3)}
 
-        m = re.match(self.status_regex_no_vn, line)
+        m = self.status_regex_no_vn.match(line)
         if m is not None:
-            return {'mc_winrate': self.flip_winrate(float(m.group(1))),
+            return {'mc_winrate': flip(float(m.group(1))),
                     'margin': m.group(2)}
         return {}
 
-    def parse_move(self, move_list, line):
-        m = re.match(self.move_regex, line)
-        if m is not None:
-            pos = parse_position(self.board_size, m.group(1))
-            visits = int(m.group(2))
-            winrate = self.flip_winrate(str_to_percent(m.group(3)))
-            mc_winrate = self.flip_winrate(str_to_percent(m.group(4)))
-            nn_winrate = self.flip_winrate(str_to_percent(m.group(5)))
-            nn_count = int(m.group(6))
-            policy_prob = str_to_percent(m.group(7))
-            pv = [parse_position(self.board_size, p) for p in m.group(8).split()]
-
-            info = {
-                'pos': pos,
-                'visits': visits,
-                'winrate': winrate,
-                'mc_winrate': mc_winrate,
-                'nn_winrate': nn_winrate,
-                'nn_count': nn_count,
-                'policy_prob': policy_prob,
-                'pv': pv,
-                'color': self.whose_turn()
-            }
-            move_list.append(info)
+    def parse_move(self, line, color, flip):
+        """ Returns move of the analysis list with its principal variation, None if line doesn't match."""
+        if '(W:' in line:
+            m = self.move_regex.match(line)
+            if m is None:
+                return None
 
-        m = re.match(self.move_regex_no_vn, line)
-        if m is not None:
-            pos = parse_position(self.board_size, m.group(1))
-            visits = int(m.group(2))
-            mc_winrate = self.flip_winrate(str_to_percent(m.group(3)))
-            r_winrate = self.flip_winrate(str_to_percent(m.group(4)))
-            r_count = int(m.group(5))
-            policy_prob = str_to_percent(m.group(6))
-            pv = m.group(7)
-            pv = [parse_position(self.board_size, p) for p in pv.split()]
-
-            info = {
+            pos, *pv = parse_positions(self.board_size, [m.group(1)] + m.group(8).split())
+            return {
                 'pos': pos,
-                'visits': visits,
-                'winrate': mc_winrate,
-                'mc_winrate': mc_winrate,
-                'r_winrate': r_winrate,
-                'r_count': r_count,
-                'policy_prob': policy_prob,
+                'visits': int(m.group(2)),
+                'winrate': flip(str_to_percent(m.group(3))),
+                'mc_winrate': flip(str_to_percent(m.group(4))),
+                'nn_winrate': flip(str_to_percent(m.group(5))),
+                'nn_count': int(m.group(6)),
+                'policy_prob': str_to_percent(m.group(7)),
                 'pv': pv,
-                'color': self.whose_turn()
+                'color': color
             }
-            move_list.append(info)
-        return move_list
 
-    def parse_best(self, stats, line):
-        m = re.match(self.best_regex, line)
-        if m is not None:
-            stats['best'] = parse_position(self.board_size, m.group(3).split()[0])
-            stats['winrate'] = self.flip_winrate(str_to_percent(m.group(2)))
-        return stats
-
-    def parse_status(self, stats, summarized, line):
-        m = re.match(self.stats_regex, line)
-        if m is not None:
-            stats['visits'] = int(m.group(1))
-            summarized = True
-        return stats, summarized
+        m = self.move_regex_no_vn.match(line)
+        if m is None:
+            return None
+
+        pos, *pv = parse_positions(self.board_size, [m.group(1)] + m.group(7).split())
+        mc_winrate = flip(str_to_percent(m.group(3)))
+        return {
+            'pos': pos,
+            'visits': int(m.group(2)),
+            'winrate': mc_winrate,
+            'mc_winrate': mc_winrate,
+            'r_winrate': flip(str_to_percent(m.group(4))),
+            'r_count': int(m.group(5)),
+            'policy_prob': str_to_percent(m.group(6)),
+            'pv': pv,
+            'color': color
+        }
 
     def parse_finished(self, stats, stdout):
-        m = re.search(self.finished_regex, "".join(stdout))
+        m = self.finished_regex.search("".join(stdout))
         if m is not None:
             stats['chosen'] = "resign" if m.group(1) == "resign" else parse_position(
                 self.board_size, m.group(1))
@@ -423,30 +614,47 @@ class LeelaCLI(BaseCLI):
 
 
 class LeelaZeroCLI(LeelaCLI):
-    update_regex = r'Playouts: ([0-9]+), Win: ([0-9]+\.[0-9]+)\%, PV:(( [A-Z][0-9]+)+)'  # OK
-    status_regex = r'NN eval=([0-9]+\.[0-9]+)'  # OK
-    move_regex = r'\s*([A-Z][0-9]+) -> +([0-9]+) ' \
-                 r'\(V: +([0-9]+\.[0-9]+)\%\) .*' \
-                 r'\(N: +([0-9]+\.[0-9]+)\%\) ' \
-                 r'PV: (.*)$'  # OK
-    stats_regex = r'([0-9]+) visits, ' \
-                  r'([0-9]+) nodes(?:, ([0-9]+) playouts)(?:, ([0-9]+) n/s)'  # OK
-    finished_regex = r'= ([A-Z][0-9]+|resign|pass)'  # OK
+    update_regex = re.compile(r'Playouts: ([0-9]+), Win: ([0-9]+\.[0-9]+)\%, PV:(( [A-Z][0-9]+)+)')
+    status_regex = re.compile(r'NN eval=([0-9]+\.[0-9]+)')
+    move_regex = re.compile(r'([A-Z][0-9]+) -> +([0-9]+) '
+                            r'\(V: +([0-9]+\.[0-9]+)\%\) .*'
+                            r'\(N: +([0-9]+\.[0-9]+)\%\) '
+                            r'PV: (.*)$')
+    stats_regex = re.compile(r'([0-9]+) visits, '
+                             r'([0-9]+) nodes(?:, ([0-9]+) playouts)(?:, ([0-9]+) n/s)')
 
     def parse_analysis(self, stdout, stderr):
-        """Parse stdout & stderr."""
-        logger.debug(f"GTP stdout:\n%s", ''.join(stdout))
-        logger.debug(f"GTP stderr:\n%s", ''.join(stderr))
-
+        """
+        Parse stdout & stderr.
+        Every line is classified once by its prefix, so at most one pattern is matched against it.
+        """
         stats = {}
         move_list = []
 
+        color = self.whose_turn()
+        flip = self.winrate_flipper()
+
         for line in stderr:
             line = line.strip()
-            stats = self.parse_bookmove(stats, line)
-            stats.update(self.parse_move_status(line))
-            move_list = self.parse_move(move_list, line)
-            stats = self.parse_status(stats, None, line)
+
+            if ' -> ' in line:
+                move = self.parse_move(line, color, flip)
+                if move is not None:
+                    move_list.append(move)
+
+            elif line.startswith('NN eval='):
+                stats.update(self.parse_move_status(line, flip))
+
+            elif line[:1].isdigit():
+                if 'book moves' in line:
+                    m = self.bookmove_regex.match(line)
+                    if m is not None:
+                        stats['bookmoves'] = int(m.group(1))
+                        stats['positions'] = int(m.group(2))
+                else:
+                    m = self.stats_regex.match(line)
+                    if m is not None:
+                        stats['visits'] = int(m.group(1))
 
         stats['best'] = move_list[0]['pos']
         stats['winrate'] = move_list[0]['winrate']
@@ -466,35 +674,24 @@ class LeelaZeroCLI(LeelaCLI):
 
         return stats, move_list
 
-    def parse_move_status(self, line):
-        # Find status string
-        m = re.match(self.status_regex, line)
+    def parse_move_status(self, line, flip):
+        m = self.status_regex.match(line)
         if m is not None:
-            return {'winrate': self.flip_winrate(float(m.group(1)))}
+            return {'winrate': flip(float(m.group(1)))}
         return {}
 
-    def parse_move(self, move_list, line):
-        m = re.match(self.move_regex, line)
-        if m is not None:
-            pos = parse_position(self.board_size, m.group(1))
-            visits = int(m.group(2))
-            winrate = self.flip_winrate(str_to_percent(m.group(3)))
-            policy_prob = str_to_percent(m.group(4))
-            pv = [parse_position(self.board_size, p) for p in m.group(5).split()]
-
-            info = {
-                'pos': pos,
-                'visits': visits,
-                'winrate': winrate,
-                'policy_prob': policy_prob,
-                'pv': pv,
-                'color': self.whose_turn()
-            }
-            move_list.append(info)
-        return move_list
-
-    def parse_status(self, stats, summarized, line):
-        m = re.match(self.stats_regex, line)
-        if m is not None:
-            stats['visits'] = int(m.group(1))
-        return stats
+    def parse_move(self, line, color, flip):
+        """ Returns move of the analysis list with its principal variation, None if line doesn't match."""
+        m = self.move_regex.match(line)
+        if m is None:
+            return None
+
+        pos, *pv = parse_positions(self.board_size, [m.group(1)] + m.group(5).split())
+        return {
+            'pos': pos,
+            'visits': int(m.group(2)),
+            'winrate': flip(str_to_percent(m.group(3))),
+            'policy_prob': str_to_percent(m.group(4)),
+            'pv': pv,
+            'color': color
+        }
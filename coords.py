@@ -0,0 +1,94 @@
+from functools import lru_cache
+
+from utils import BRD_COORD, SGF_COORD, PointValueError
+
+# Codes of moves which are not points of the board
+PASS = 0xFFFF
+NO_MOVE = 0xFFFE
+RESIGN = 0xFFFD
+
+# Points are coded as x * 64 + y of SGF coordinates indexes, so codes don't depend on board size and fit uint16
+SGF_CODES = {f"{x_coord}{y_coord}": x * 64 + y
+             for x, x_coord in enumerate(SGF_COORD) for y, y_coord in enumerate(SGF_COORD)}
+SGF_CODES.update({"": PASS, "resign": RESIGN})
+
+SGF_BY_CODE = {code: pos for pos, code in SGF_CODES.items()}
+SGF_BY_CODE[NO_MOVE] = None
+
+# Indexes of SGF coordinates, points of Board
+SGF_POINTS = {pos: (code // 64, code % 64) for pos, code in SGF_CODES.items() if code < 64 * 64}
+
+
+def encode_move(pos):
+    """ Returns uint16 code of SGF coordinates, e.g. 'pd' -> 963, None is NO_MOVE"""
+    if pos is None:
+        return NO_MOVE
+    return SGF_CODES[pos]
+
+
+def decode_move(code):
+    return SGF_BY_CODE[int(code)]
+
+
+@lru_cache(maxsize=None)
+def sgf_array():
+    """ Returns SGF coordinates of every uint16 code, for conversion of whole arrays at once"""
+    import numpy as np
+
+    return np.array([SGF_BY_CODE.get(code) for code in range(1 << 16)], dtype=object)
+
+
+def encode_moves(positions):
+    """ Returns uint16 array of codes of SGF coordinates, e.g. principal variation"""
+    import numpy as np
+
+    return np.fromiter((NO_MOVE if pos is None else SGF_CODES[pos] for pos in positions), dtype=np.uint16,
+                       count=len(positions))
+
+
+def decode_moves(codes):
+    """ Returns list of SGF coordinates of uint16 codes"""
+    import numpy as np
+
+    return sgf_array()[np.asarray(codes, dtype=np.uint16)].tolist()
+
+
+@lru_cache(maxsize=None)
+def vertex_codes(board_size):
+    """ Returns code of every board position of given board size, e.g. 'A1' -> 18 on 19x19"""
+    codes = {'pass': PASS, 'resign': RESIGN}
+
+    for x in range(board_size):
+        for y in range(1, board_size + 1):
+            codes[f"{BRD_COORD[x]}{y}"] = x * 64 + board_size - y
+
+    return codes
+
+
+@lru_cache(maxsize=None)
+def vertex_array(board_size):
+    """ Returns board position of every uint16 code, None for codes out of the board"""
+    import numpy as np
+
+    vertices = np.full(1 << 16, None, dtype=object)
+    for vertex, code in vertex_codes(board_size).items():
+        vertices[code] = vertex
+    return vertices
+
+
+def encode_vertices(board_size, vertices):
+    """ Returns uint16 array of codes of board positions, e.g. principal variation reported by bot"""
+    import numpy as np
+
+    codes = vertex_codes(board_size)
+    try:
+        return np.fromiter((codes[vertex] for vertex in vertices), dtype=np.uint16, count=len(vertices))
+    except KeyError as e:
+        raise PointValueError(f'"{e.args[0]}" is not a valid point for board size = {board_size}.')
+
+
+def decode_vertices(board_size, codes):
+    """ Returns list of board positions of uint16 codes"""
+    import numpy as np
+
+    return vertex_array(board_size)[np.asarray(codes, dtype=np.uint16)].tolist()
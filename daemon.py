@@ -0,0 +1,355 @@
+import glob
+import itertools
+import json
+import os
+import re
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from queue import PriorityQueue
+from socketserver import ThreadingMixIn
+from threading import Condition, Lock, Thread
+
+from log import logger
+from sgflib import SGFParser
+
+
+# Number of finished jobs kept with their spool files
+MAX_FINISHED_JOBS = 100
+
+
+class DaemonException(Exception):
+    pass
+
+
+def check_setting(name, value, default):
+    """ Raises DaemonException if overridden value doesn't have the type of the default one, ints are floats too."""
+    if isinstance(default, float):
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    else:
+        valid = isinstance(value, type(default)) and isinstance(value, bool) == isinstance(default, bool)
+
+    if not valid:
+        raise DaemonException(f"Setting {name} must be {type(default).__name__}.")
+
+
+class Job:
+    """ Submitted game with its settings, status and progress events."""
+
+    def __init__(self, job_id, path_to_sgf, config, priority):
+        self.id = job_id
+        self.path_to_sgf = path_to_sgf
+        self.config = config
+        self.priority = priority
+
+        self.status = 'queued'
+        self.result_path = None
+        self.events = []
+
+        self._changed = Condition()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def add_event(self, event):
+        with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def set_status(self, status, only_from=None):
+        """ Sets new status, if only_from is given only while the job has that status. Returns whether it was set."""
+        with self._changed:
+            if only_from is not None and self.status != only_from:
+                return False
+
+            self.status = status
+            self.events.append({'status': status})
+            self._changed.notify_all()
+            return True
+
+    def wait_events(self, start, timeout=None):
+        """ Returns events after given index, waits for new ones if there are none yet."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > start or self.finished, timeout)
+            return self.events[start:]
+
+    def to_dict(self):
+        return {'id': self.id,
+                'status': self.status,
+                'priority': self.priority,
+                'config': self.config,
+                'events': self.events}
+
+
+class DaemonHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, analysis_daemon):
+        super().__init__(server_address, DaemonRequestHandler)
+        self.analysis_daemon = analysis_daemon
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """
+    Local HTTP API:
+      POST   /jobs              -- submit {"sgf": "...", "priority": 0, "config": {...}}, returns job
+      GET    /jobs              -- list of jobs
+      GET    /jobs/<id>         -- job status and progress events
+      GET    /jobs/<id>/events  -- stream of progress events (JSON lines) until job is finished
+      GET    /jobs/<id>/result  -- annotated SGF
+      DELETE /jobs/<id>         -- cancel queued job
+    """
+
+    route_regex = re.compile(r'^/jobs(?:/([0-9a-f]+))?(?:/(events|result))?/?$')
+
+    def log_message(self, fmt, *args):
+        logger.debug("HTTP %s: %s", self.address_string(), fmt % args)
+
+    def send_json(self, code, data):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, code, message):
+        self.send_json(code, {'error': message})
+
+    def route(self):
+        """ Returns (job, action) of requested path, sends error and returns None if route is unknown."""
+        match = self.route_regex.match(self.path)
+        if match is None:
+            self.send_error_json(404, "Unknown path.")
+            return None
+
+        job_id, action = match.groups()
+        job = None
+        if job_id is not None:
+            job = self.server.analysis_daemon.jobs.get(job_id)
+            if job is None:
+                self.send_error_json(404, "Unknown job.")
+                return None
+
+        return job, action
+
+    def do_GET(self):
+        route = self.route()
+        if route is None:
+            return
+
+        job, action = route
+
+        if job is None:
+            self.send_json(200, [job.to_dict() for job in self.server.analysis_daemon.list_jobs()])
+        elif action == 'events':
+            self.stream_events(job)
+        elif action == 'result':
+            if job.status != 'done':
+                self.send_error_json(409, f"Job is {job.status}.")
+                return
+
+            with open(job.result_path, 'rb') as result_file:
+                body = result_file.read()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-go-sgf')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_json(200, job.to_dict())
+
+    def stream_events(self, job):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+
+        sent = 0
+        while True:
+            events = job.wait_events(sent, timeout=30)
+            for event in events:
+                self.wfile.write((json.dumps(event) + '\n').encode())
+            self.wfile.flush()
+            sent += len(events)
+
+            if job.finished and sent == len(job.events):
+                break
+
+    def do_POST(self):
+        route = self.route()
+        if route is None:
+            return
+
+        job, action = route
+        if job is not None:
+            self.send_error_json(405, "Jobs can't be modified.")
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            if not isinstance(request, dict):
+                raise DaemonException("Request must be JSON object.")
+            job = self.server.analysis_daemon.submit(request.get('sgf'),
+                                                     request.get('config'),
+                                                     request.get('priority', 0))
+        except (ValueError, DaemonException) as e:
+            self.send_error_json(400, str(e))
+            return
+
+        self.send_json(201, job.to_dict())
+
+    def do_DELETE(self):
+        route = self.route()
+        if route is None:
+            return
+
+        job, action = route
+        if job is None or action is not None:
+            self.send_error_json(405, "Only jobs can be cancelled.")
+        elif self.server.analysis_daemon.cancel(job):
+            self.send_json(200, job.to_dict())
+        else:
+            self.send_error_json(409, f"Job is {job.status}.")
+
+
+class AnalysisDaemon:
+    """
+    Long-running service analyzing submitted games one by one with the same started bots.
+
+    analyze(path_to_sgf, config, progress) is called for every job and returns path of annotated SGF.
+    Jobs with higher priority are analyzed first, jobs with equal priority in order of submission.
+    Settings are default values of settings jobs can override, overrides must be of the same type.
+    Only the last max_finished jobs are kept when they are finished, spool files of older ones are removed.
+    """
+
+    def __init__(self, analyze, spool_dir, settings, host='127.0.0.1', port=8732, max_finished=MAX_FINISHED_JOBS):
+        self._analyze = analyze
+        self._queue = PriorityQueue()
+        self._counter = itertools.count()
+        self._worker = None
+        self._finished = OrderedDict()
+        self._jobs_lock = Lock()
+
+        self.spool_dir = spool_dir
+        self.settings = dict(settings)
+        self.max_finished = max_finished
+        self.jobs = {}
+
+        self.server = DaemonHTTPServer((host, port), self)
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def submit(self, sgf, config=None, priority=0):
+        if not isinstance(sgf, str) or not sgf.strip():
+            raise DaemonException("SGF data is required.")
+
+        try:
+            if not SGFParser(sgf).parse():
+                raise DaemonException("SGF data contains no games.")
+        except DaemonException:
+            raise
+        except Exception as e:
+            raise DaemonException(f"Invalid SGF data: {e!r}")
+
+        if config is None:
+            config = {}
+        if not isinstance(config, dict):
+            raise DaemonException("Config must be JSON object.")
+
+        unknown_settings = set(config) - set(self.settings)
+        if unknown_settings:
+            raise DaemonException(f"Unknown settings: {', '.join(sorted(unknown_settings))}")
+
+        for name, value in config.items():
+            check_setting(name, value, self.settings[name])
+
+        if isinstance(priority, bool) or not isinstance(priority, int):
+            raise DaemonException("Priority must be integer.")
+
+        job_id = uuid.uuid4().hex
+        path_to_sgf = os.path.join(self.spool_dir, f"{job_id}.sgf")
+        with open(path_to_sgf, mode='w', encoding='utf-8') as sgf_file:
+            sgf_file.write(sgf)
+
+        job = Job(job_id, path_to_sgf, config, priority)
+        with self._jobs_lock:
+            self.jobs[job_id] = job
+        self._queue.put((-priority, next(self._counter), job))
+        logger.info("Job %s queued with priority %d.", job_id, priority)
+
+        return job
+
+    def list_jobs(self):
+        with self._jobs_lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job):
+        if not job.set_status('cancelled', only_from='queued'):
+            return False
+
+        self._retire(job)
+        return True
+
+    def _retire(self, job):
+        """ Keeps finished job, forgets the oldest finished ones over the limit and removes their spool files."""
+        with self._jobs_lock:
+            self._finished[job.id] = job
+            expired = []
+            while len(self._finished) > self.max_finished:
+                job_id, _ = self._finished.popitem(last=False)
+                del self.jobs[job_id]
+                expired.append(job_id)
+
+        for job_id in expired:
+            for path in glob.glob(os.path.join(glob.escape(self.spool_dir), f"{job_id}*")):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning("Spool file %s of job %s can't be removed: %s", path, job_id, e)
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+
+            if job is None:
+                break
+
+            if not job.set_status('running', only_from='queued'):
+                continue
+
+            logger.info("Job %s started.", job.id)
+
+            try:
+                job.result_path = self._analyze(job.path_to_sgf, job.config, job.add_event)
+            except Exception as e:
+                logger.exception("Job %s failed.", job.id)
+                job.add_event({'error': repr(e)})
+                job.set_status('failed')
+            else:
+                logger.info("Job %s done.", job.id)
+                job.set_status('done')
+
+            self._retire(job)
+
+    def serve_forever(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        self._worker = Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+        logger.info("Listening on http://%s:%d", *self.address)
+        self.server.serve_forever()
+
+    def shutdown(self):
+        """ Stops accepting requests and waits for the running job to finish."""
+        self.server.shutdown()
+        self.server.server_close()
+
+        if self._worker is not None:
+            self._queue.put((float('-inf'), next(self._counter), None))
+            self._worker.join()
+            self._worker = None
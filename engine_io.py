@@ -0,0 +1,194 @@
+import os
+import selectors
+from queue import Queue, Empty
+from threading import Lock, Thread
+
+from log import logger
+
+READ_SIZE = 65536
+
+
+class PipeReader:
+    """
+    Lines of engine stdout or stderr, they are read by the multiplexer thread.
+    Optional on_line callback is called with every complete line in that thread, e.g. to parse search progress.
+    """
+
+    def __init__(self, pipe, on_line=None):
+        self.pipe = pipe
+        self.fd = pipe.fileno()
+        self.on_line = on_line
+        self.queue = Queue()
+        self.closed = False
+        self._buffer = b""
+
+    def feed(self, data):
+        """ Splits read data into complete lines, the rest waits for its newline. Empty data means closed pipe."""
+        if data:
+            *lines, self._buffer = (self._buffer + data).split(b"\n")
+            lines = [line.decode('utf-8', errors='replace').rstrip("\r") + "\n" for line in lines]
+        else:
+            lines = [self._buffer.decode('utf-8', errors='replace')] if self._buffer else []
+            self._buffer = b""
+
+        for line in lines:
+            self.queue.put(line)
+
+            if self.on_line is not None:
+                try:
+                    self.on_line(line)
+                except Exception:
+                    logger.exception("Failed to handle engine output line: %s", line.rstrip())
+
+        # Readers waiting for a line rely on the last lines being queued first
+        if not data:
+            self.closed = True
+
+    def readline(self, timeout=None):
+        """
+        Read single line from queue
+        :param timeout: seconds to wait for the line, doesn't wait if None
+        :return: output line or "" if there is none
+        """
+        try:
+            if timeout is None:
+                return self.queue.get_nowait()
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return ""
+
+    def read_all_lines(self):
+        """
+        Read all lines from queue.
+        :return: output lines
+        """
+        lines = []
+
+        while True:
+            try:
+                lines.append(self.queue.get_nowait())
+            except Empty:
+                break
+
+        return lines
+
+
+class PipeMultiplexer:
+    """
+    Reads pipes of every running engine in a single thread waiting on a selector.
+    The thread is started with the first registered pipe and exits when the last one is unregistered.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._selector = None
+        self._thread = None
+        self._readers = {}
+        self._wakeup_read, self._wakeup_write = None, None
+
+    def register(self, pipe, on_line=None) -> PipeReader:
+        reader = PipeReader(pipe, on_line)
+        os.set_blocking(reader.fd, False)
+
+        with self._lock:
+            if self._selector is None:
+                self._selector = selectors.DefaultSelector()
+                self._wakeup_read, self._wakeup_write = os.pipe()
+                os.set_blocking(self._wakeup_read, False)
+                os.set_blocking(self._wakeup_write, False)
+                self._selector.register(self._wakeup_read, selectors.EVENT_READ)
+
+            self._readers[reader.fd] = reader
+            self._selector.register(reader.fd, selectors.EVENT_READ, reader)
+
+            if self._thread is None:
+                self._thread = Thread(target=self._loop, name='engine-io', daemon=True)
+                self._thread.start()
+
+        self._wakeup()
+        return reader
+
+    def unregister(self, reader):
+        """ Stops reading given pipe, lines already read remain in the reader."""
+        with self._lock:
+            self._remove(reader)
+        self._wakeup()
+
+    def join(self, timeout=None):
+        """ Waits until the thread exits, i.e. all pipes are unregistered or closed."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _remove(self, reader):
+        if self._readers.pop(reader.fd, None) is not None:
+            self._selector.unregister(reader.fd)
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_write, b"\0")
+        except BlockingIOError:
+            pass
+
+    def _loop(self):
+        while True:
+            events = self._selector.select()
+            read = []
+
+            with self._lock:
+                for key, _ in events:
+                    reader = key.data
+
+                    if reader is None:
+                        try:
+                            os.read(self._wakeup_read, READ_SIZE)
+                        except BlockingIOError:
+                            pass
+                        continue
+
+                    # The pipe could be unregistered after select returned
+                    if self._readers.get(key.fd) is not reader:
+                        continue
+
+                    try:
+                        data = os.read(reader.fd, READ_SIZE)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        data = b""
+
+                    if not data:
+                        self._remove(reader)
+                    read.append((reader, data))
+
+                finished = not self._readers
+                if finished:
+                    self._thread = None
+
+            # Lines are dispatched without the lock, so callbacks are free to stop engines
+            for reader, data in read:
+                reader.feed(data)
+
+            if finished:
+                return
+
+
+multiplexer = PipeMultiplexer()
+
+
+def open_reader(pipe, on_line=None):
+    """ Starts reading engine stdout or stderr."""
+    if os.name == 'nt':
+        # Pipes can't be waited on by selectors on Windows, so they are read by a thread each
+        from readerthread import start_reader_thread
+        return start_reader_thread(pipe, on_line)
+
+    return multiplexer.register(pipe, on_line)
+
+
+def close_reader(reader):
+    """ Stops reading engine stdout or stderr."""
+    if isinstance(reader, PipeReader):
+        multiplexer.unregister(reader)
+    else:
+        reader.stop()
@@ -0,0 +1,172 @@
+import itertools
+from concurrent.futures import Future
+from queue import PriorityQueue
+from threading import Event, Lock, Thread
+
+from bot_engines import CLIException, EngineFailure
+from log import logger
+
+# Priorities of the jobs, lower value is taken first by an idle engine
+MAIN_LINE = 0
+VARIATIONS = 1
+
+# Job interrupted by engine failure is queued again at most this many times
+MAX_RETRIES = 2
+
+# Failed engine is restarted after a delay doubled with every consecutive failure, and given up after so many restarts
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+MAX_RESTARTS = 5
+
+
+class EnginePool:
+    """
+    Set of started GTP consoles, each of them analyzes a single position at a time.
+    Jobs are served by priority, so main line analysis runs first and variations use spare engines.
+    Engine which exits or misses a deadline is restarted with a backoff, only its interrupted job is queued again.
+    """
+
+    def __init__(self, factory, size=1):
+        self._factory = factory
+        self._engines = []
+        self._workers = []
+        self._jobs = PriorityQueue()
+        self._counter = itertools.count()
+        self._stopped = True
+        self._stopping = Event()
+        self._running_workers = 0
+        self._lock = Lock()
+
+        self.size = max(1, int(size))
+
+    def start(self):
+        logger.info("Starting %d bot instances...", self.size)
+
+        self._stopped = False
+        self._stopping.clear()
+        self._running_workers = self.size
+        for _ in range(self.size):
+            engine = self._factory()
+            failures = 0
+            try:
+                engine.start()
+            except (CLIException, OSError):
+                # Its worker restarts it with a backoff, as a failed one
+                logger.exception("Failed to start bot.")
+                failures = 1
+            self._engines.append(engine)
+
+            worker = Thread(target=self._work, args=(engine, failures), daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self):
+        """ Stops engines as soon as they finish current jobs, pending jobs are cancelled."""
+        with self._lock:
+            self._stopped = True
+            self._stopping.set()
+
+            for _ in self._workers:
+                self._jobs.put((float('-inf'), next(self._counter), None, None, None, 0))
+
+        for worker in self._workers:
+            worker.join()
+
+        self._cancel_jobs(CLIException("Engine pool is stopped."))
+
+        for engine in self._engines:
+            engine.stop()
+
+        self._engines.clear()
+        self._workers.clear()
+
+    def submit(self, fn, *args, priority=MAIN_LINE):
+        """ Schedules fn(engine, *args) on the first idle engine and returns its Future."""
+        future = Future()
+
+        with self._lock:
+            if self._stopped:
+                future.cancel()
+            else:
+                self._jobs.put((priority, next(self._counter), future, fn, args, 0))
+
+        return future
+
+    def _cancel_jobs(self, exception):
+        """ Cancels queued jobs, jobs queued again after engine failure are already running so they fail."""
+        while not self._jobs.empty():
+            _, _, future, _, _, _ = self._jobs.get_nowait()
+            if future is not None and not future.cancel():
+                future.set_exception(exception)
+
+    def _work(self, engine, failures=0):
+        # Engine failed to start takes jobs only once it is restarted
+        running = not failures or self._restart(engine, failures)
+
+        while running:
+            job = self._jobs.get()
+            _, _, future, fn, args, retries = job
+
+            if future is None:
+                break
+
+            if not retries and not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                if not engine.alive:
+                    raise EngineFailure("GTP console is not running.")
+                result = fn(engine, *args)
+            except (EngineFailure, OSError) as e:
+                failures += 1
+                logger.error("Bot failed: %s", e)
+                self._retry(job, e)
+
+                if not self._restart(engine, failures):
+                    break
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                failures = 0
+                future.set_result(result)
+
+        with self._lock:
+            self._running_workers -= 1
+            if self._running_workers or self._stopped:
+                return
+
+            # Nothing would ever take the queued jobs
+            self._stopped = True
+        self._cancel_jobs(EngineFailure("All bots failed."))
+
+    def _retry(self, job, exception):
+        """ Queues job interrupted by engine failure again with its original priority and order."""
+        priority, count, future, fn, args, retries = job
+
+        with self._lock:
+            if retries < MAX_RETRIES and not self._stopped:
+                logger.warning("Analyzing position again, retry %d of %d.", retries + 1, MAX_RETRIES)
+                self._jobs.put((priority, count, future, fn, args, retries + 1))
+                return
+
+        future.set_exception(exception)
+
+    def _restart(self, engine, failures):
+        """ Restarts failed engine after a backoff, returns False if the pool is stopped or engine can't start."""
+        for restart in range(MAX_RESTARTS):
+            engine.stop()
+
+            delay = min(RESTART_DELAY * 2 ** (failures + restart - 1), MAX_RESTART_DELAY)
+            logger.warning("Restarting bot in %.1f seconds...", delay)
+            if self._stopping.wait(delay):
+                return False
+
+            try:
+                engine.start()
+                return True
+            except (CLIException, OSError):
+                logger.exception("Failed to restart bot.")
+
+        logger.error("Bot failed to restart %d times, it is not used anymore.", MAX_RESTARTS)
+        engine.stop()
+        return False
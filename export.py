@@ -0,0 +1,120 @@
+import glob
+import os
+import uuid
+
+import numpy as np
+
+from coords import NO_MOVE, encode_move
+from log import logger
+from results_store import COLORS
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class ResultsExporter:
+    """
+    Writes results of analyzed moves to a directory of columnar chunk files while games are analyzed.
+    Chunks are Parquet files if pyarrow is installed, otherwise NPZ archives, each of them appears atomically.
+
+    Every row is a played move: black win rate after it, its win rate loss and the best move, visits and
+    top candidates of the position it was played in. Moves are uint16 codes of coords, colors are
+    indexes of results_store.COLORS.
+    """
+
+    def __init__(self, export_dir, top_n=3, chunk_size=10000):
+        self.export_dir = export_dir
+        self.top_n = top_n
+        self.chunk_size = chunk_size
+        self.format = 'parquet' if pyarrow is not None else 'npz'
+
+        self._rows = []
+
+    def add(self, game, black, white, move_num, color, move, stats, delta, prev_stats, prev_move_list):
+        row = {'game': game,
+               'black': black,
+               'white': white,
+               'move_num': move_num,
+               'color': COLORS.index(color),
+               'move': encode_move(move),
+               'winrate': stats.get('winrate', np.nan),
+               'delta': delta,
+               'best': encode_move(prev_move_list[0]['pos']) if prev_move_list else NO_MOVE,
+               'visits': prev_stats.get('visits', -1)}
+
+        for i in range(self.top_n):
+            candidate = prev_move_list[i] if i < len(prev_move_list) else {}
+            row[f'top{i}_pos'] = encode_move(candidate.get('pos'))
+            row[f'top{i}_winrate'] = candidate.get('winrate', np.nan)
+            row[f'top{i}_visits'] = candidate.get('visits', -1)
+
+        self._rows.append(row)
+
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def columns(self, rows):
+        columns = {'game': np.array([row['game'] for row in rows], dtype=str),
+                   'black': np.array([row['black'] for row in rows], dtype=str),
+                   'white': np.array([row['white'] for row in rows], dtype=str),
+                   'move_num': np.array([row['move_num'] for row in rows], dtype=np.int32),
+                   'color': np.array([row['color'] for row in rows], dtype=np.uint8),
+                   'move': np.array([row['move'] for row in rows], dtype=np.uint16),
+                   'winrate': np.array([row['winrate'] for row in rows], dtype=np.float64),
+                   'delta': np.array([row['delta'] for row in rows], dtype=np.float64),
+                   'best': np.array([row['best'] for row in rows], dtype=np.uint16),
+                   'visits': np.array([row['visits'] for row in rows], dtype=np.int64)}
+
+        for i in range(self.top_n):
+            columns[f'top{i}_pos'] = np.array([row[f'top{i}_pos'] for row in rows], dtype=np.uint16)
+            columns[f'top{i}_winrate'] = np.array([row[f'top{i}_winrate'] for row in rows], dtype=np.float64)
+            columns[f'top{i}_visits'] = np.array([row[f'top{i}_visits'] for row in rows], dtype=np.int64)
+
+        return columns
+
+    def flush(self):
+        """ Writes buffered rows to a new chunk file."""
+        if not self._rows:
+            return
+
+        os.makedirs(self.export_dir, exist_ok=True)
+        columns = self.columns(self._rows)
+        chunk_path = os.path.join(self.export_dir, f"{uuid.uuid4().hex}.{self.format}")
+        tmp_path = f"{chunk_path}.tmp"
+
+        if self.format == 'parquet':
+            table = pyarrow.table({name: pyarrow.array(column) for name, column in columns.items()})
+            pyarrow.parquet.write_table(table, tmp_path)
+        else:
+            with open(tmp_path, 'wb') as chunk_file:
+                np.savez(chunk_file, **columns)
+
+        # Readers never see partially written chunks
+        os.replace(tmp_path, chunk_path)
+        logger.debug("Exported %d moves to %s", len(self._rows), chunk_path)
+        self._rows = []
+
+
+def load_results(export_dir):
+    """ Returns columns of all exported chunks in given directory concatenated."""
+    chunks = []
+
+    for chunk_path in sorted(glob.glob(os.path.join(export_dir, '*.npz'))):
+        with np.load(chunk_path) as chunk:
+            chunks.append({name: chunk[name] for name in chunk.files})
+
+    parquet_paths = sorted(glob.glob(os.path.join(export_dir, '*.parquet')))
+    if parquet_paths and pyarrow is None:
+        raise ImportError("pyarrow is required to read Parquet chunks.")
+
+    for chunk_path in parquet_paths:
+        table = pyarrow.parquet.read_table(chunk_path)
+        chunks.append({name: table.column(name).to_numpy() for name in table.column_names})
+
+    if not chunks:
+        return {}
+
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
@@ -0,0 +1,88 @@
+from threading import Lock
+
+import numpy as np
+
+_graph = None
+_graph_lock = Lock()
+
+
+class WinrateGraph:
+    """ Matplotlib figure of win rates, it is drawn once and reused for every game."""
+
+    def __init__(self):
+        import matplotlib
+        matplotlib.use('Agg')
+
+        import matplotlib.pyplot as plt
+
+        self.figure = plt.figure()
+        self.axes = self.figure.add_subplot(111)
+
+        # fill graph with horizontal coordinate lines, step 0.025
+        self.axes.hlines(np.arange(0, 1, 0.025), 0, 1, transform=self.axes.get_yaxis_transform(),
+                         linewidth=0.04, color='0.7')
+
+        # add single central horizontal line
+        self.axes.axhline(0.50, linewidth=0.3, color='0.2')
+
+        # main graph of win rate changes
+        self.line, = self.axes.plot([], [], color='#ff0000', marker='.', markersize=2.5, linewidth=0.6)
+
+        # set range limit and size of numbers on y axis
+        self.axes.set_ylim(0, 1)
+        self.axes.set_yticks(np.arange(0, 1.05, 0.05))
+        self.axes.tick_params(axis='y', labelsize=6)
+
+        # add labels to axes
+        self.axes.set_xlabel("Move Number", fontsize=10)
+        self.axes.set_ylabel("Win Rate", fontsize=12)
+
+    def save(self, path, move_nums, winrates, last_move_num, graph_format='pdf'):
+        self.line.set_data(move_nums, winrates)
+        self.axes.set_xlim(0, last_move_num)
+        self.figure.savefig(path, dpi=200, format=graph_format, bbox_inches='tight')
+
+
+def write_svg(path, move_nums, winrates, last_move_num, width=800, height=400):
+    """ Writes win rate graph as plain SVG, it doesn't require matplotlib."""
+    margin = 40
+    plot_width, plot_height = width - 2 * margin, height - 2 * margin
+
+    def x(move_num):
+        return margin + plot_width * move_num / max(last_move_num, 1)
+
+    def y(winrate):
+        return margin + plot_height * (1 - winrate)
+
+    svg = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="sans-serif">',
+           f'<rect width="{width}" height="{height}" fill="white"/>']
+
+    for winrate in np.arange(0, 1.05, 0.05):
+        svg.append(f'<line x1="{margin}" y1="{y(winrate):.1f}" x2="{width - margin}" y2="{y(winrate):.1f}" '
+                   f'stroke="{"#333" if abs(winrate - 0.5) < 1e-9 else "#ccc"}" stroke-width="0.5"/>')
+        svg.append(f'<text x="{margin - 4}" y="{y(winrate) + 3:.1f}" font-size="8" text-anchor="end">'
+                   f'{winrate:.2f}</text>')
+
+    points = " ".join(f"{x(move_num):.1f},{y(winrate):.1f}" for move_num, winrate in zip(move_nums, winrates))
+    svg.append(f'<polyline points="{points}" fill="none" stroke="#ff0000" stroke-width="1"/>')
+    svg.append(f'<text x="{width / 2}" y="{height - 8}" font-size="12" text-anchor="middle">Move Number</text>')
+    svg.append(f'<text x="12" y="{height / 2}" font-size="12" text-anchor="middle" '
+               f'transform="rotate(-90 12 {height / 2})">Win Rate</text>')
+    svg.append('</svg>')
+
+    with open(path, mode='w', encoding='utf-8') as svg_file:
+        svg_file.write("\n".join(svg))
+
+
+def save_winrate_graph(path, move_nums, winrates, last_move_num, graph_format='pdf'):
+    """ Saves win rate graph, all graphs of the process are drawn on the same matplotlib figure."""
+    global _graph
+
+    if graph_format == 'svg':
+        write_svg(path, move_nums, winrates, last_move_num)
+        return
+
+    with _graph_lock:
+        if _graph is None:
+            _graph = WinrateGraph()
+        _graph.save(path, move_nums, winrates, last_move_num, graph_format)
@@ -0,0 +1,60 @@
+import json
+from threading import Lock
+
+from bot_engines import CLIException
+
+
+class SessionRecorder:
+    """ Appends commands and raw output of every search to a JSON lines file, keyed by position."""
+    replaying = False
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, mode='a', encoding='utf-8')
+        self._lock = Lock()
+
+    def record(self, key, commands, stdout, stderr):
+        line = json.dumps({'key': key, 'commands': commands, 'stdout': stdout, 'stderr': stderr})
+
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class SessionReplay:
+    """ Serves recorded output of searches back instead of starting engines, the last record of position wins."""
+    replaying = True
+
+    def __init__(self, path):
+        self.path = path
+        self.responses = {}
+
+        with open(path, encoding='utf-8') as session_file:
+            for line in session_file:
+                if line.strip():
+                    record = json.loads(line)
+                    self.responses[record['key']] = (record['stdout'], record['stderr'])
+
+    def replay(self, key):
+        """ Returns recorded stdout and stderr lines of the position."""
+        if key not in self.responses:
+            raise CLIException(f"Position {key} is not recorded in session {self.path}.")
+
+        stdout, stderr = self.responses[key]
+        return list(stdout), list(stderr)
+
+    def close(self):
+        pass
+
+
+def open_session(record_path=None, replay_path=None):
+    """ Returns session for --record or --replay option, None if neither is given."""
+    if record_path is not None:
+        return SessionRecorder(record_path)
+    if replay_path is not None:
+        return SessionReplay(replay_path)
+    return None
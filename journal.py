@@ -0,0 +1,89 @@
+import json
+import os
+from threading import Lock
+
+from log import logger
+
+
+class Journal:
+    """
+    Append-only log of finished analysis jobs, one JSON record per line.
+    Every record belongs to a game and a phase: 'screen' and 'main' records are keyed by move number,
+    'variations' records by position key and 'done' marks a finished game.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        self._games = {}
+        self._file = None
+        self._lock = Lock()
+
+    def open(self):
+        if os.path.exists(self.path):
+            self.load()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, mode='a', encoding='utf-8')
+
+        # Don't glue new records to partially written one
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write('\n')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _ends_with_newline(self):
+        with open(self.path, mode='rb') as journal_file:
+            journal_file.seek(-1, os.SEEK_END)
+            return journal_file.read(1) == b'\n'
+
+    def load(self):
+        records = 0
+
+        with open(self.path, encoding='utf-8') as journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Last line could be partially written if process was killed
+                    logger.warning("Skipping corrupted journal record: %s", line.strip())
+                    continue
+
+                self._apply(record)
+                records += 1
+
+        logger.info("Loaded %d records for %d games from journal.", records, len(self._games))
+
+    def _game(self, game):
+        if game not in self._games:
+            self._games[game] = {'done': False, 'screen': {}, 'main': {}, 'variations': {}}
+        return self._games[game]
+
+    def _apply(self, record):
+        game = self._game(record['game'])
+
+        if record['phase'] == 'done':
+            # Finished game is skipped, so its results aren't needed anymore
+            game.update(done=True, screen={}, main={}, variations={})
+        else:
+            game[record['phase']][record['key']] = (record['stats'], record['move_list'])
+
+    def is_done(self, game):
+        return game in self._games and self._games[game]['done']
+
+    def results(self, game, phase, key):
+        """ Returns stored (stats, move_list) for given job or None."""
+        if game not in self._games:
+            return None
+        return self._games[game][phase].get(key)
+
+    def record(self, game, phase, key=None, stats=None, move_list=None):
+        record = {'game': game, 'phase': phase, 'key': key, 'stats': stats, 'move_list': move_list}
+
+        with self._lock:
+            self._apply(record)
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
@@ -1,20 +1,120 @@
+import atexit
 import logging
 import os
 import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import Queue
 
 from settings import LOGS_DIR
 
+# Size and number of rotated GTP transcript files of every engine
+TRANSCRIPT_MAX_BYTES = 10 * 1024 * 1024
+TRANSCRIPT_BACKUPS = 3
+
 fmt = logging.Formatter('%(asctime)-15s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 logger = logging.getLogger('logs')
 logger.setLevel(logging.DEBUG)
 
-log_file = logging.FileHandler(os.path.join(LOGS_DIR, 'sgf-analyze.log'))
-log_file.setLevel(logging.DEBUG)
-log_stream = logging.StreamHandler(sys.stdout)
-log_stream.setLevel(logging.INFO)
+# Raw GTP communication, records of every engine carry name of its transcript, e.g. 'leela-zero-1'
+transcript_logger = logging.getLogger('gtp')
+transcript_logger.propagate = False
+
+
+class LazyLines:
+    """ Joins lines only when the record is written, i.e. in the listener thread."""
+
+    def __init__(self, prefix, lines):
+        self.prefix = prefix
+        # Callers go on changing their lists, e.g. history of played moves, before the record is written
+        self.lines = tuple(lines)
+
+    def __str__(self):
+        return "".join(f"{self.prefix}{line}" if line.endswith("\n") else f"{self.prefix}{line}\n"
+                       for line in self.lines).rstrip("\n")
+
+
+class DeferredQueueHandler(QueueHandler):
+    """ Puts records to the queue as they are, messages are formatted by the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+
+class TranscriptHandler(logging.Handler):
+    """
+    Writes records of every engine transcript to its own rotated file, e.g. gtp.leela-zero-1.log.
+    File is closed by end_transcript record, which the engine logs when it stops.
+    """
+
+    def __init__(self, logs_dir):
+        super().__init__()
+        self.logs_dir = logs_dir
+        self._files = {}
+
+    def emit(self, record):
+        name = f"{record.name}.{record.transcript}" if hasattr(record, 'transcript') else record.name
+
+        if getattr(record, 'end_transcript', False):
+            handler = self._files.pop(name, None)
+            if handler is not None:
+                handler.close()
+            return
+
+        handler = self._files.get(name)
+        if handler is None:
+            handler = RotatingFileHandler(os.path.join(self.logs_dir, f"{name}.log"),
+                                          maxBytes=TRANSCRIPT_MAX_BYTES, backupCount=TRANSCRIPT_BACKUPS)
+            handler.setFormatter(self.formatter)
+            self._files[name] = handler
+
+        handler.handle(record)
+
+    def close(self):
+        for handler in self._files.values():
+            handler.close()
+        self._files.clear()
+        super().close()
+
+
+def log_transcript(transcript, prefix, lines):
+    """ Writes raw GTP lines to given transcript, they are joined only if transcripts are written."""
+    if lines and transcript_logger.isEnabledFor(logging.DEBUG):
+        transcript_logger.debug("%s", LazyLines(prefix, lines), extra={'transcript': transcript})
+
+
+def end_transcript(transcript):
+    """ Closes file of given transcript after its records logged so far are written."""
+    transcript_logger.debug("", extra={'transcript': transcript, 'end_transcript': True})
+
+
+def init_logging(stream_level=logging.INFO):
+    """
+    Attaches log file, console and GTP transcript handlers, it is called once by the entry point.
+    Records are written by a listener thread, so analysis threads only put them to a queue.
+    """
+    if logger.handlers:
+        return
+
+    os.makedirs(LOGS_DIR, exist_ok=True)
+
+    log_file = logging.FileHandler(os.path.join(LOGS_DIR, 'sgf-analyze.log'))
+    log_file.setLevel(logging.DEBUG)
+    log_file.addFilter(logging.Filter(logger.name))
+    log_stream = logging.StreamHandler(sys.stdout)
+    log_stream.setLevel(stream_level)
+    log_stream.addFilter(logging.Filter(logger.name))
+    transcripts = TranscriptHandler(LOGS_DIR)
+    transcripts.addFilter(logging.Filter(transcript_logger.name))
+
+    log_file.setFormatter(fmt)
+    log_stream.setFormatter(fmt)
+    transcripts.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
 
-log_file.setFormatter(fmt)
-log_stream.setFormatter(fmt)
+    records = Queue()
+    listener = QueueListener(records, log_file, log_stream, transcripts, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
-logger.addHandler(log_file)
-logger.addHandler(log_stream)
+    logger.addHandler(DeferredQueueHandler(records))
+    transcript_logger.addHandler(DeferredQueueHandler(records))
+    transcript_logger.setLevel(logging.DEBUG)
@@ -0,0 +1,163 @@
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+
+import profiling
+
+# Percentiles are computed from this many most recent samples of every phase
+RESERVOIR_SIZE = 10000
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Summaries of this many most recent games are written to JSON
+MAX_GAMES = 100
+
+
+class PhaseTimings:
+    """ Count, total, maximum and recent samples of durations of a single phase."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def quantile(self, q):
+        """ Nearest-rank quantile of recent samples, i.e. the smallest one not below q of them"""
+        if not self.samples:
+            return 0.0
+
+        samples = sorted(self.samples)
+        # Rounding keeps e.g. 0.9 * 100 from ranking the 91st sample
+        rank = math.ceil(round(q * len(samples), 9))
+        return samples[max(rank - 1, 0)]
+
+    def summary(self):
+        summary = {'count': self.count, 'total': self.total, 'mean': self.total / self.count if self.count else 0.0,
+                   'max': self.max}
+        summary.update((f"p{int(q * 100)}", self.quantile(q)) for q in QUANTILES)
+        return summary
+
+
+class Timings:
+    """ Durations of analysis phases, e.g. of a single game or of the whole run. Phases nest, game includes all."""
+
+    def __init__(self):
+        self.phases = {}
+        self._lock = Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            if phase not in self.phases:
+                self.phases[phase] = PhaseTimings()
+            self.phases[phase].add(seconds)
+
+    def summary(self):
+        with self._lock:
+            return {phase: timings.summary() for phase, timings in sorted(self.phases.items())}
+
+
+# Timings of the whole run, it collects all the time
+run_timings = Timings()
+
+# Timings collecting recorded durations, games are analyzed one at a time, so it is the run and the current game
+_collecting = [run_timings]
+
+
+def record(phase, seconds):
+    for timings in tuple(_collecting):
+        timings.add(phase, seconds)
+
+
+@contextmanager
+def collecting(timings):
+    """ Adds durations recorded in the block to given timings as well."""
+    _collecting.append(timings)
+    try:
+        yield timings
+    finally:
+        _collecting.remove(timings)
+
+
+@contextmanager
+def timer(phase):
+    """ Records duration of the block as given phase, the block is profiled as well if --profile selects it."""
+    start = time.perf_counter()
+    try:
+        with profiling.profile(phase):
+            yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def timed(phase):
+    """ Records duration of every call of decorated function as given phase."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(phase):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def prometheus_text(timings, prefix='sgf_analyzer'):
+    """ Returns timings in Prometheus text format as summary metric labelled by phase."""
+    name = f"{prefix}_phase_seconds"
+    lines = [f"# HELP {name} Wall time spent in analysis phases.", f"# TYPE {name} summary"]
+
+    for phase, summary in timings.summary().items():
+        for q in QUANTILES:
+            lines.append(f'{name}{{phase="{phase}",quantile="{q}"}} {summary[f"p{int(q * 100)}"]:.6f}')
+        lines.append(f'{name}_sum{{phase="{phase}"}} {summary["total"]:.6f}')
+        lines.append(f'{name}_count{{phase="{phase}"}} {summary["count"]}')
+
+    return "\n".join(lines) + "\n"
+
+
+def write_atomic(path, text):
+    """ Replaces file at once, so readers like node exporter never see it half-written."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, mode='w', encoding='utf-8') as tmp_file:
+        tmp_file.write(text)
+    os.replace(tmp_path, path)
+
+
+class MetricsWriter:
+    """
+    Writes run and per game timings as JSON summary and Prometheus text file after every game.
+    Only summaries of the last max_games games are kept, so a long running service doesn't grow.
+    """
+
+    def __init__(self, json_path=None, textfile_path=None, max_games=MAX_GAMES):
+        self.json_path = json_path
+        self.textfile_path = textfile_path
+        self.max_games = max_games
+        self.games = OrderedDict()
+
+    def add_game(self, game, timings):
+        self.games.pop(game, None)
+        self.games[game] = timings.summary()
+        while len(self.games) > self.max_games:
+            self.games.popitem(last=False)
+        self.write()
+
+    def write(self):
+        if self.json_path:
+            summary = {'run': run_timings.summary(), 'games': self.games}
+            write_atomic(self.json_path, json.dumps(summary, indent=2))
+
+        if self.textfile_path:
+            write_atomic(self.textfile_path, prometheus_text(run_timings))
@@ -0,0 +1,175 @@
+import atexit
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from log import logger
+
+# Phases profiled by default, names are the same as in metrics. Main line only waits for positions analyzed in pool
+# threads, so their work is profiled as 'position', parsing of bot output is a part of it
+PHASES = ('position', 'variation_tree', 'save_sgf', 'graph')
+
+# Profiler of phases and stack sampler, set by configure
+profiler = None
+sampler = None
+
+
+class PhaseProfiler:
+    """
+    Profiles selected phases with cProfile, profiles of a phase are merged until the game is dumped.
+    Profile covers only the thread running the phase, phases waiting for other threads show just the waiting.
+    """
+
+    def __init__(self, directory, phases=PHASES, top=25):
+        self.directory = directory
+        self.phases = set(phases)
+        self.top = top
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def profile(self, phase):
+        # Nested phase is a part of the outer profile, only one profiler can be active in a thread
+        if phase not in self.phases or getattr(self._local, 'active', False):
+            yield
+            return
+
+        import cProfile
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Since Python 3.12 a single profiler can be active in the whole interpreter
+            yield
+            return
+
+        self._local.active = True
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._local.active = False
+            self.add(phase, profile)
+
+    def add(self, phase, profile):
+        import pstats
+
+        with self._lock:
+            if phase in self.stats:
+                self.stats[phase].add(profile)
+            else:
+                self.stats[phase] = pstats.Stats(profile)
+
+    def dump_game(self, game):
+        """ Writes .prof file of every profiled phase and top functions of all phases as text, starts over."""
+        name = os.path.splitext(os.path.basename(game))[0]
+
+        import io
+
+        with self._lock:
+            stats, self.stats = self.stats, {}
+
+        summary = io.StringIO()
+        for phase, phase_stats in sorted(stats.items()):
+            phase_stats.dump_stats(os.path.join(self.directory, f"{name}.{phase}.prof"))
+
+            summary.write(f"=== {phase} ===\n")
+            phase_stats.stream = summary
+            phase_stats.sort_stats('cumulative').print_stats(self.top)
+
+        with open(os.path.join(self.directory, f"{name}.profile.txt"), mode='w', encoding='utf-8') as summary_file:
+            summary_file.write(summary.getvalue())
+
+        logger.info("Profiles of %d phases of %s are written to %s.", len(stats), name, self.directory)
+
+
+class IntervalSampler:
+    """
+    Takes stacks of all threads every interval, cheap enough to stay on in long running service.
+    Stacks are written in folded format, i.e. one stack with its number of samples per line, as flame graphs expect.
+    """
+
+    def __init__(self, path, interval=0.01):
+        self.path = path
+        self.interval = interval
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+            self.write()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own_ident = threading.get_ident()
+        stacks = []
+
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+
+            functions = []
+            while frame is not None:
+                functions.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+
+            stacks.append(";".join([names.get(ident, str(ident))] + functions[::-1]))
+
+        with self._lock:
+            self.stacks.update(stacks)
+
+    def write(self):
+        with self._lock:
+            lines = [f"{stack} {count}\n" for stack, count in self.stacks.most_common()]
+
+        with open(self.path, mode='w', encoding='utf-8') as stacks_file:
+            stacks_file.writelines(lines)
+
+
+@contextmanager
+def profile(phase):
+    """ Profiles the block as given phase if --profile is on and the phase is selected."""
+    if profiler is None:
+        yield
+    else:
+        with profiler.profile(phase):
+            yield
+
+
+def configure(directory, phases=PHASES, top=25, interval=0):
+    """ Turns profiling of phases on, and sampling of stacks as well if interval is given."""
+    global profiler, sampler
+
+    profiler = PhaseProfiler(directory, phases, top)
+
+    if interval:
+        sampler = IntervalSampler(os.path.join(directory, 'samples.folded'), interval)
+        sampler.start()
+        atexit.register(sampler.stop)
+
+
+def dump_game(game):
+    """ Writes profiles of the analyzed game, and stacks sampled so far."""
+    if profiler is not None:
+        profiler.dump_game(game)
+    if sampler is not None:
+        sampler.write()
@@ -9,10 +9,12 @@ class ReaderThread:
     ReaderThread perpetually reads from the given file descriptor and pushes the result to a queue.
     """
 
-    def __init__(self, fd):
+    def __init__(self, fd, on_line=None):
         self.queue = Queue()
         self.fd = fd  # stdout or stderr is given
+        self.on_line = on_line
         self.stopped = False
+        self.closed = False
 
     def stop(self):
         """
@@ -29,18 +31,26 @@ class ReaderThread:
                 line = self.fd.readline()
                 if len(line) > 0:
                     self.queue.put(line)
+                    if self.on_line is not None:
+                        self.on_line(line)
+                else:
+                    # Empty line is returned only when process closed its output
+                    self.closed = True
+                    break
             except IOError:
                 time.sleep(0.2)
                 pass
 
-    def readline(self):
+    def readline(self, timeout=None):
         """
         Read single line from queue
+        :param timeout: seconds to wait for the line, doesn't wait if None
         :return: output line
         """
         try:
-            line = self.queue.get_nowait()
-            return line
+            if timeout is None:
+                return self.queue.get_nowait()
+            return self.queue.get(timeout=timeout)
         except Empty:
             return ""
 
@@ -61,18 +71,19 @@ class ReaderThread:
         return lines
 
 
-def start_reader_thread(fd):
+def start_reader_thread(fd, on_line=None):
     """
     Start file descriptor loop thread
     :param fd: stdout | stderr
+    :param on_line: called with every read line
     :return: ReaderThread
     """
-    reader_thread = ReaderThread(fd)
+    reader_thread = ReaderThread(fd, on_line)
 
     def begin_loop():
         reader_thread.loop()
 
-    t = Thread(target=begin_loop)
+    t = Thread(target=begin_loop, daemon=True)
     t.start()
 
     return reader_thread
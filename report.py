@@ -0,0 +1,85 @@
+import numpy as np
+
+from annotations import MISTAKE_LEVELS
+from results_store import NO_MOVE
+
+# Game phases by move number, each of them lasts until given move
+PHASES = (('opening', 50), ('middlegame', 150), ('endgame', np.inf))
+
+
+def player_report(results, player=None):
+    """
+    Returns statistics of exported results per player and game phase: number of games and moves, mean win rate loss,
+    counts of mistakes by severity of annotations.MISTAKE_LEVELS and rate of moves matching the best move.
+    """
+    if not results:
+        return []
+
+    # The same move could be exported by several runs, e.g. analysis and rendering
+    move_keys = np.char.add(np.char.add(results['game'], ':'), results['move_num'].astype(str))
+    _, unique_rows = np.unique(move_keys, return_index=True)
+    columns = {name: column[unique_rows] for name, column in results.items()}
+
+    players = np.where(columns['color'] == 1, columns['black'], columns['white'])
+    if player is not None:
+        selected = players == player
+        players = players[selected]
+        columns = {name: column[selected] for name, column in columns.items()}
+
+    if not len(players):
+        return []
+
+    phase_ends = np.array([end for _, end in PHASES])
+    phases = np.searchsorted(phase_ends, columns['move_num'] + 1)
+
+    player_names, player_index = np.unique(players, return_inverse=True)
+    groups = player_index * len(PHASES) + phases
+    groups_count = len(player_names) * len(PHASES)
+
+    loss = -columns['delta']
+    moves = np.bincount(groups, minlength=groups_count)
+    loss_sum = np.bincount(groups, weights=loss, minlength=groups_count)
+
+    # Severity is the worst level reached by the loss, levels are checked from the smallest one
+    level_losses = np.array([level_loss for _, level_loss in reversed(MISTAKE_LEVELS)])
+    severities = np.searchsorted(level_losses, loss, side='right')
+    mistakes = np.zeros((len(MISTAKE_LEVELS) + 1, groups_count), dtype=np.int64)
+    np.add.at(mistakes, (severities, groups), 1)
+
+    known_best = columns['best'] != NO_MOVE
+    matched = np.bincount(groups, weights=known_best & (columns['move'] == columns['best']), minlength=groups_count)
+    compared = np.bincount(groups, weights=known_best, minlength=groups_count)
+
+    _, game_index = np.unique(columns['game'], return_inverse=True)
+    game_groups = np.unique(groups * (game_index.max() + 1) + game_index) // (game_index.max() + 1)
+    games = np.bincount(game_groups, minlength=groups_count)
+
+    report = []
+    for group in np.flatnonzero(moves):
+        row = {'player': str(player_names[group // len(PHASES)]),
+               'phase': PHASES[group % len(PHASES)][0],
+               'games': int(games[group]),
+               'moves': int(moves[group]),
+               'mean_loss': float(loss_sum[group] / moves[group]),
+               'match_rate': float(matched[group] / compared[group]) if compared[group] else float('nan')}
+
+        for level, (name, _) in enumerate(reversed(MISTAKE_LEVELS), 1):
+            row[name] = int(mistakes[level, group])
+
+        report.append(row)
+
+    return report
+
+
+def format_report(report):
+    names = [name for name, _ in MISTAKE_LEVELS]
+    lines = ["%-24s %-10s %6s %6s %9s %10s " % ('player', 'phase', 'games', 'moves', 'mean loss', 'match rate')
+             + " ".join("%12s" % name for name in names)]
+
+    for row in report:
+        lines.append("%-24s %-10s %6d %6d %8.2f%% %9.2f%% " % (row['player'][:24], row['phase'], row['games'],
+                                                              row['moves'], row['mean_loss'] * 100,
+                                                              row['match_rate'] * 100)
+                     + " ".join("%12d" % row[name] for name in names))
+
+    return "\n".join(lines)
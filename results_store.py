@@ -0,0 +1,246 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+from coords import NO_MOVE, decode_move, decode_moves, encode_move, encode_moves
+
+COLORS = (None, 'black', 'white')
+
+
+class Table:
+    """ Equally sized numpy columns growing by doubling their capacity."""
+
+    def __init__(self, dtypes, capacity=64):
+        self.size = 0
+        self._fills = {name: fill for name, (dtype, fill) in dtypes.items()}
+        self.columns = {name: np.full(capacity, fill, dtype=dtype) for name, (dtype, fill) in dtypes.items()}
+
+    @property
+    def capacity(self):
+        return len(next(iter(self.columns.values())))
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def reserve(self, size):
+        capacity = self.capacity
+        if size <= capacity:
+            return
+
+        capacity = max(size, capacity * 2)
+        for name, column in self.columns.items():
+            grown = np.full(capacity, self._fills[name], dtype=column.dtype)
+            grown[:len(column)] = column
+            self.columns[name] = grown
+
+    def extend(self, count):
+        """ Adds given number of rows, returns index of the first one."""
+        start = self.size
+        self.reserve(start + count)
+        self.size += count
+        return start
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+class ResultsView(Mapping):
+    """ Read-only dict of one kind of stored results by move number."""
+
+    def __init__(self, mask, get):
+        self._mask = mask
+        self._get = get
+
+    def __getitem__(self, move_num):
+        if move_num not in self:
+            raise KeyError(move_num)
+        return self._get(move_num)
+
+    def __contains__(self, move_num):
+        mask = self._mask()
+        return isinstance(move_num, (int, np.integer)) and 0 <= move_num < len(mask) and bool(mask[move_num])
+
+    def __iter__(self):
+        return (int(move_num) for move_num in np.flatnonzero(self._mask()))
+
+    def __len__(self):
+        return int(np.count_nonzero(self._mask()))
+
+
+class ResultsStore:
+    """
+    Analysis results of main line positions kept as struct of arrays indexed by move number.
+    Moves are stored as uint16 codes, candidate moves and their variations in ragged arrays.
+    all_stats, all_move_lists and best_moves return the same dicts as bots do.
+    """
+
+    STATS_COLUMNS = ('winrate', 'visits', 'best', 'chosen')
+    MOVE_COLUMNS = ('pos', 'visits', 'winrate', 'policy_prob', 'pv', 'color')
+
+    def __init__(self):
+        self.positions = Table({'present': (bool, False),
+                                'winrate': (np.float64, np.nan),
+                                'visits': (np.int64, -1),
+                                'best': (np.uint16, NO_MOVE),
+                                'chosen': (np.uint16, NO_MOVE),
+                                'has_best_move': (bool, False),
+                                'moves_start': (np.int64, 0),
+                                'moves_count': (np.int32, 0)})
+
+        self.moves = Table({'pos': (np.uint16, NO_MOVE),
+                            'visits': (np.int64, -1),
+                            'winrate': (np.float64, np.nan),
+                            'policy_prob': (np.float64, np.nan),
+                            'color': (np.uint8, 0),
+                            'pv_start': (np.int64, 0),
+                            'pv_count': (np.int32, -1)})
+
+        self.pvs = Table({'pos': (np.uint16, NO_MOVE)}, capacity=1024)
+
+        # Rarely present values (Leela's book moves and statistics) stay in dicts
+        self._stats_extra = {}
+        self._moves_extra = {}
+
+        # Rows of results replaced by results added again for the same position
+        self._orphaned_moves = 0
+        self._orphaned_pvs = 0
+
+        self.all_stats = ResultsView(self._present, self.stats)
+        self.all_move_lists = ResultsView(self._present, self.move_list)
+        self.best_moves = ResultsView(self._has_best_move, lambda move_num: self.move(
+            int(self.positions['moves_start'][move_num])))
+
+    def _present(self):
+        return self.positions['present'][:self.positions.size]
+
+    def _has_best_move(self):
+        return self.positions['has_best_move'][:self.positions.size]
+
+    @property
+    def nbytes(self):
+        return self.positions.nbytes + self.moves.nbytes + self.pvs.nbytes
+
+    def add(self, move_num, stats, move_list):
+        """ Stores results of position, rows of results added before for it are reused if they are big enough."""
+        positions = self.positions
+        positions.reserve(move_num + 1)
+        positions.size = max(positions.size, move_num + 1)
+
+        # Candidate moves of the previous results are overwritten, or left unused for compact
+        old_start, old_count = int(positions['moves_start'][move_num]), int(positions['moves_count'][move_num])
+        if len(move_list) <= old_count:
+            start = old_start
+            self._release_moves(start + len(move_list), start + old_count)
+        else:
+            self._release_moves(old_start, old_start + old_count)
+            start = self.moves.extend(len(move_list))
+
+        positions['present'][move_num] = True
+        positions['winrate'][move_num] = stats.get('winrate', np.nan)
+        positions['visits'][move_num] = stats.get('visits', -1)
+        positions['best'][move_num] = encode_move(stats.get('best'))
+        positions['chosen'][move_num] = encode_move(stats.get('chosen'))
+        positions['has_best_move'][move_num] = bool(move_list) and 'winrate' in move_list[0]
+
+        stats_extra = {key: value for key, value in stats.items() if key not in self.STATS_COLUMNS}
+        if stats_extra:
+            self._stats_extra[move_num] = stats_extra
+        else:
+            self._stats_extra.pop(move_num, None)
+
+        positions['moves_start'][move_num] = start
+        positions['moves_count'][move_num] = len(move_list)
+
+        for index, move in enumerate(move_list, start):
+            self.moves['pos'][index] = encode_move(move['pos'])
+            self.moves['visits'][index] = move.get('visits', -1)
+            self.moves['winrate'][index] = move.get('winrate', np.nan)
+            self.moves['policy_prob'][index] = move.get('policy_prob', np.nan)
+            self.moves['color'][index] = COLORS.index(move.get('color'))
+
+            pv = move.get('pv')
+            old_pv_start, old_pv_count = int(self.moves['pv_start'][index]), int(self.moves['pv_count'][index])
+            if pv is not None and len(pv) <= old_pv_count:
+                pv_start = old_pv_start
+                self._orphaned_pvs += old_pv_count - len(pv)
+            else:
+                self._orphaned_pvs += max(old_pv_count, 0)
+                pv_start = self.pvs.extend(len(pv)) if pv is not None else 0
+
+            if pv is not None:
+                self.pvs['pos'][pv_start:pv_start + len(pv)] = encode_moves(pv)
+            self.moves['pv_start'][index] = pv_start
+            self.moves['pv_count'][index] = len(pv) if pv is not None else -1
+
+            move_extra = {key: value for key, value in move.items() if key not in self.MOVE_COLUMNS}
+            if move_extra:
+                self._moves_extra[index] = move_extra
+            else:
+                self._moves_extra.pop(index, None)
+
+        if self._orphaned_moves * 2 > self.moves.size or self._orphaned_pvs * 2 > self.pvs.size:
+            self.compact()
+
+    def _release_moves(self, start, end):
+        """ Marks candidate move rows as unused, they are dropped by compact."""
+        for index in range(start, end):
+            self._orphaned_pvs += max(int(self.moves['pv_count'][index]), 0)
+            self.moves['pv_count'][index] = -1
+            self._moves_extra.pop(index, None)
+        self._orphaned_moves += end - start
+
+    def compact(self):
+        """ Copies results to new tables without rows left unused by positions added again."""
+        store = ResultsStore()
+        store.positions.reserve(self.positions.size)
+        store.positions.size = self.positions.size
+        for move_num in self.all_stats:
+            store.add(move_num, self.stats(move_num), self.move_list(move_num))
+
+        self.positions, self.moves, self.pvs = store.positions, store.moves, store.pvs
+        self._stats_extra, self._moves_extra = store._stats_extra, store._moves_extra
+        self._orphaned_moves = self._orphaned_pvs = 0
+
+    def stats(self, move_num):
+        positions = self.positions
+        stats = dict(self._stats_extra.get(move_num, {}))
+
+        if not np.isnan(positions['winrate'][move_num]):
+            stats['winrate'] = float(positions['winrate'][move_num])
+        if positions['visits'][move_num] >= 0:
+            stats['visits'] = int(positions['visits'][move_num])
+        for key in ('best', 'chosen'):
+            if positions[key][move_num] != NO_MOVE:
+                stats[key] = decode_move(positions[key][move_num])
+
+        return stats
+
+    def move(self, index):
+        moves = self.moves
+        move = {'pos': decode_move(moves['pos'][index])}
+
+        if moves['visits'][index] >= 0:
+            move['visits'] = int(moves['visits'][index])
+        if not np.isnan(moves['winrate'][index]):
+            move['winrate'] = float(moves['winrate'][index])
+        if not np.isnan(moves['policy_prob'][index]):
+            move['policy_prob'] = float(moves['policy_prob'][index])
+        if moves['pv_count'][index] >= 0:
+            pv_start = int(moves['pv_start'][index])
+            move['pv'] = decode_moves(self.pvs['pos'][pv_start:pv_start + moves['pv_count'][index]])
+        if moves['color'][index]:
+            move['color'] = COLORS[moves['color'][index]]
+
+        move.update(self._moves_extra.get(index, {}))
+        return move
+
+    def move_list(self, move_num):
+        start = int(self.positions['moves_start'][move_num])
+        return [self.move(index) for index in range(start, start + int(self.positions['moves_count'][move_num]))]
+
+    def winrates(self):
+        """ Returns move numbers and win rates of positions with known win rate."""
+        winrates = self.positions['winrate'][:self.positions.size]
+        move_nums = np.flatnonzero(self._present() & ~np.isnan(winrates))
+        return move_nums, winrates[move_nums]
@@ -4,5 +4,6 @@ BASE_DIR = os.path.abspath(os.path.curdir)
 BOTS_DIR = os.path.join(BASE_DIR, 'bots')
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
 CHECKPOINTS_DIR = os.path.join(BASE_DIR, '.checkpoints', '{}')
+SPOOL_DIR = os.path.join(BASE_DIR, '.spool')
 
 PATH_TO_CONFIG = os.path.abspath(os.path.join(BASE_DIR, 'config.yaml'))
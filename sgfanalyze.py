@@ -1,59 +1,216 @@
 import argparse
 import hashlib
+import heapq
+import itertools
 import os
 import pickle
-
-import numpy as np
-from yaml import load
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from threading import Lock
 
 import annotations
+import engine_pool
+import metrics
+import profiling
 import settings
-from bot_engines import LeelaCLI, LeelaZeroCLI
-from log import logger, log_stream
+from board import Board
+from bot_engines import EngineFailure, LeelaCLI, LeelaZeroCLI, history_hash, move_command, next_color
+from engine_pool import EnginePool
+from journal import Journal
+from log import logger, init_logging
 from sgflib import SGFParser, Node, Property
 from utils import convert_position
+from watcher import FolderWatcher
+from work_queue import WorkQueue, job_id
+
+# Heavy modules (numpy, yaml, matplotlib, http.server) are imported where they are used, so that short jobs,
+# --help and tests start fast
+
+# Filled from config.yaml by init()
+CONFIG = {}
+BOTS = {}
+
+# Recorder or replay of GTP sessions given by --record or --replay, it is shared by all bots
+SESSION = None
+METRICS = None
+
+
+def init(path_to_config=settings.PATH_TO_CONFIG):
+    """ Loads config.yaml and sets up logging."""
+    import yaml
+
+    with open(path_to_config) as yaml_stream:
+        yaml_data = yaml.safe_load(yaml_stream)
+
+    CONFIG.update(yaml_data['config'])
+    BOTS.update(yaml_data['bots'])
+
+    init_logging(yaml_data['log_level'])
+
+
+class ResultsCache:
+    """ Results of recently used checkpoints, the least recently used ones are evicted over maxsize."""
 
-with open(settings.PATH_TO_CONFIG) as yaml_stream:
-    yaml_data = load(yaml_stream)
+    # Enough for main line and variation trees of a few long games
+    MAX_SIZE = 4096
 
-CONFIG = yaml_data['config']
-BOTS = yaml_data['bots']
+    def __init__(self, maxsize=MAX_SIZE):
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._lock = Lock()
 
-log_stream.setLevel(yaml_data['log_level'])
+    def __contains__(self, ckpt_fn):
+        return ckpt_fn in self._results
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, ckpt_fn):
+        with self._lock:
+            results = self._results.get(ckpt_fn)
+            if results is not None:
+                self._results.move_to_end(ckpt_fn)
+            return results
+
+    def put(self, ckpt_fn, results):
+        with self._lock:
+            self._results[ckpt_fn] = results
+            self._results.move_to_end(ckpt_fn)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
 
 
 def retry_analysis(restarts):
+    """ Calls decorated function again after engine failure at most restarts times, then the failure is raised."""
     def wrapper(fn):
         def try_analysis(*args, **kwargs):
-            if not isinstance(restarts, int) or not restarts:
-                return fn(*args, **kwargs)
-            for i in range(restarts):
+            for i in range(restarts + 1):
                 try:
                     return fn(*args, **kwargs)
-                except Exception:
-                    if restarts < i:
+                except (EngineFailure, OSError):
+                    if i >= restarts:
                         raise
-                    logger.error("Exception during analysis, retrying analysis...")
+                    logger.exception("Exception during analysis, retrying analysis...")
 
         return try_analysis
 
     return wrapper
 
 
+def collect_timings(fn):
+    """ Collects durations of phases during the call to timings of the analyzer as well, see metrics."""
+    def with_timings(self, *args, **kwargs):
+        with metrics.collecting(self.timings), metrics.timer('game'):
+            return fn(self, *args, **kwargs)
+
+    return with_timings
+
+
 def parse_cmd_line():
     parser = argparse.ArgumentParser(argument_default=None)
 
-    parser.add_argument("path_to_sgf", nargs='+', help="List of SGF-files to analyze.")
-    parser.add_argument('-b', '--bot', default=BOTS['default'],
-                        dest='bot', help="Settings from config.yaml to use.")
+    parser.add_argument("path_to_sgf", nargs='*', help="List of SGF-files to analyze.")
+    parser.add_argument('-b', '--bot', default=None,
+                        dest='bot', help="Settings from config.yaml to use, default is set in config.yaml.")
+    parser.add_argument('-s', '--screen-bot', default=None, dest='screen_bot',
+                        help="Settings from config.yaml to screen moves with, only suspicious moves "
+                             "are analyzed by --bot.")
+    parser.add_argument('-j', '--journal', default=None, dest='journal',
+                        help="Journal file to record finished jobs in and to resume interrupted runs from.")
+    parser.add_argument('-q', '--queue', default=None, dest='queue',
+                        help="Shared directory to coordinate several workers analyzing the same files.")
+    parser.add_argument('--worker-id', default=None, dest='worker_id',
+                        help="Name of this worker in the queue, default is hostname and process id.")
+    parser.add_argument('--lease-time', default=300, type=int, dest='lease_time',
+                        help="Seconds after which a job of unresponsive worker is taken over.")
+    parser.add_argument('--serve', dest='serve', action='store_true',
+                        help="Run as a service analyzing SGF-files submitted through local HTTP API.")
+    parser.add_argument('--port', default=8732, type=int, dest='port', help="Port of the service.")
+    parser.add_argument('-w', '--watch', dest='watch', action='store_true',
+                        help="Keep polling given files and directories, re-analyze games when moves are added.")
+    parser.add_argument('--interval', default=5.0, type=float, dest='interval',
+                        help="Seconds between polls in watch mode.")
+    parser.add_argument('--render', dest='render', action='store_true',
+                        help="Annotate games again from stored analysis with current thresholds, bots are not started.")
+    parser.add_argument('-e', '--export', default=None, dest='export',
+                        help="Directory to export results of analyzed moves to as columnar chunk files.")
+    parser.add_argument('--report', default=None, dest='report',
+                        help="Print statistics of players from results exported to given directory.")
+    parser.add_argument('--player', default=None, dest='player', help="Report only statistics of given player.")
     parser.add_argument('--no-vars', dest='no_variations', action='store_true', help="Skip variations analysis.")
 
-    return parser.parse_args()
+    session = parser.add_mutually_exclusive_group()
+    session.add_argument('--record', default=None, dest='record',
+                         help="Append raw output of every bot search to given session file.")
+    session.add_argument('--replay', default=None, dest='replay',
+                         help="Serve bot searches from given recorded session file, bots are not started.")
+
+    parser.add_argument('--metrics', default=None, dest='metrics',
+                        help="Write timings of analysis phases per game and per run to given JSON file.")
+    parser.add_argument('--metrics-textfile', default=None, dest='metrics_textfile',
+                        help="Write timings of analysis phases to given file in Prometheus text format.")
+
+    parser.add_argument('--profile', default=None, dest='profile',
+                        help="Write cProfile dumps and top functions of analysis phases per game to given directory.")
+    parser.add_argument('--profile-phases', default=",".join(profiling.PHASES), dest='profile_phases',
+                        help="Comma separated phases to profile.")
+    parser.add_argument('--profile-top', default=25, type=int, dest='profile_top',
+                        help="Number of functions in text summary of every profiled phase.")
+    parser.add_argument('--profile-interval', default=0, type=float, dest='profile_interval',
+                        help="Also sample stacks of all threads every given seconds, e.g. 0.01 for service mode.")
+
+    args = parser.parse_args()
+    if not args.path_to_sgf and not args.serve and not args.report:
+        parser.error("path_to_sgf is required unless --serve or --report is used.")
+
+    return args
+
 
+def report_game(game, analyzer):
+    """ Adds timings of analyzed game to metrics files and writes its profiles, if options ask for them."""
+    if METRICS is not None:
+        METRICS.add_game(game, analyzer.timings)
+    profiling.dump_game(game)
 
-def filter_move_list(move_list):
+
+def filter_move_list(move_list, threshold):
     visit_sums = sum([move['visits'] for move in move_list])
-    return [move for move in move_list if move['visits'] / visit_sums > CONFIG['move_list_threshold']]
+    return [move for move in move_list if move['visits'] / visit_sums > threshold]
+
+
+def create_bot(bot_config, **kwargs):
+    """ Returns bot for given configuration from config.yaml"""
+    bot_settings = BOTS[bot_config]
+    kwargs.update(bot_settings)
+    kwargs.setdefault('session', SESSION)
+
+    if bot_settings['bot_type'] == 'leela':
+        return LeelaCLI(**kwargs)
+
+    elif bot_settings['bot_type'] == 'leela-zero':
+        return LeelaZeroCLI(**kwargs)
+
+
+def calculate_delta(stats, best_move, this_move, next_player):
+    """ Returns win rate drop of played move compared to the best move (always non-positive)."""
+    if this_move == best_move['pos']:
+        return 0.0
+
+    delta = stats['winrate'] - best_move['winrate']
+    return min(0.0, (-delta if next_player == "black" else delta))
+
+
+def calculate_deltas(winrates, prev_best_winrates, played_best, black_next):
+    """ Vectorized calculate_delta for the whole main line, positions without win rates get zero delta."""
+    import numpy as np
+
+    deltas = winrates - prev_best_winrates
+    deltas = np.minimum(0.0, np.where(black_next, -deltas, deltas))
+    deltas[played_best | np.isnan(deltas)] = 0.0
+    return deltas
 
 
 class BotException(Exception):
@@ -61,44 +218,76 @@ class BotException(Exception):
 
 
 class BotAnalyzer:
-    def __init__(self, path_to_sgf, bot_config):
+    def __init__(self, path_to_sgf, bot_config, screen_config=None, journal=None,
+                 config=None, pool=None, progress=None, cache=None, exporter=None):
         self._path_to_sgf = path_to_sgf
         self._bot_config = bot_config
+        self._screen_config = screen_config
+
+        # Settings from config.yaml overridden for this game
+        self.config = dict(CONFIG, **(config or {}))
+        self.progress = progress
+        self._own_pool = pool is None
+
+        # Recently used results by checkpoint path, only where positions are analyzed again, i.e. watch and service
+        # modes. Otherwise every position is looked up once and its results are kept only by the store
+        self.cache = cache
+
+        self.journal = journal
+        self.game_key = None
+        self.exporter = exporter
 
         self.sgf_data = None
         self.cursor = None
         self.analyzer = None
         self.bot = None
+        self.pool = pool
+        self.explorers = None
         self.base_dir = None
+        self.base_hash = None
 
         self.moves_to_analyze = {}
         self.moves_to_variations = {}
+        self.variation_trees = {}
+
+        # Results attached to nodes, rendered to comments and markers on save, and nodes of analyzed moves
+        self.annotations = None
+        self.move_nodes = {}
+
+        # Variation positions by board state, shared between move orders and variation trees
+        self.transpositions = {}
+        self.transpositions_lock = Lock()
 
-        self.best_moves = {}
-        self.all_stats = {}
-        self.all_move_lists = {}
+        # Main line results, dict-like views of the store are used by annotations
+        from results_store import ResultsStore
 
-    def factory(self):
+        self.results = ResultsStore()
+        self.best_moves = self.results.best_moves
+        self.all_stats = self.results.all_stats
+        self.all_move_lists = self.results.all_move_lists
+        self.screen_stats = {}
 
-        kwargs = {'board_size': self.board_size,
-                  'komi': self.komi,
-                  'handicap': self.handicap}
-        bot_settings = BOTS[self._bot_config]
-        kwargs.update(bot_settings)
+        # Durations of phases of this game, see metrics
+        self.timings = metrics.Timings()
 
-        if bot_settings['bot_type'] == 'leela':
-            return LeelaCLI(**kwargs)
+    def factory(self, bot_config=None):
+        return create_bot(bot_config or self._bot_config,
+                          board_size=self.board_size,
+                          komi=self.komi,
+                          handicap=self.handicap)
 
-        elif bot_settings['bot_type'] == 'leela-zero':
-            return LeelaZeroCLI(**kwargs)
+    def filter_move_list(self, move_list):
+        return filter_move_list(move_list, self.config['move_list_threshold'])
+
+    @property
+    def root_node(self):
+        return self.cursor.game[0]
 
     @property
     def board_size(self):
-        node_boardsize = self.cursor.node.get('SZ')
+        node_boardsize = self.root_node.get('SZ')
         if node_boardsize:
             board_size = int(node_boardsize.data[0])
-            if board_size != 19:
-                logger.warning("Board size is not 19 so analysis could be very inaccurate.")
         else:
             board_size = 19
 
@@ -106,7 +295,7 @@ class BotAnalyzer:
 
     @property
     def handicap(self):
-        node_handicap = self.cursor.node.get('HA')
+        node_handicap = self.root_node.get('HA')
         if node_handicap:
             return int(node_handicap.data[0])
         else:
@@ -114,13 +303,13 @@ class BotAnalyzer:
 
     @property
     def japanese_rules(self):
-        node_rules = self.cursor.node.get('RU')
+        node_rules = self.root_node.get('RU')
         return node_rules and node_rules.data[0].lower() in ['jp', 'japanese', 'japan']
 
     @property
     def komi(self):
         """ Returns adjusted komi."""
-        node_komi = self.cursor.node.get('KM')
+        node_komi = self.root_node.get('KM')
 
         if node_komi:
             komi = round(float(node_komi.data[0]), 1)
@@ -136,86 +325,63 @@ class BotAnalyzer:
 
         return komi
 
+    @property
+    def players(self):
+        """ Returns names of black and white players."""
+        return tuple(self.root_node[prop].data[0] if prop in self.root_node else "" for prop in ('PB', 'PW'))
+
     def parse_sgf_file(self):
         """ Returns parsed Collection from sgf"""
         with open(self._path_to_sgf, 'r', encoding="utf-8") as sgf_file:
             data = "".join([line for line in sgf_file])
         self.sgf_data = SGFParser(data).parse()
 
-    def save_to_file(self):
+    @property
+    def output_path(self):
         file_name, file_ext = os.path.splitext(self._path_to_sgf)
-        path_to_save = f"{file_name}_{self._bot_config}{file_ext}"
-        with open(path_to_save, mode='w', encoding='utf-8') as f:
+        return f"{file_name}_{self._bot_config}{file_ext}"
+
+    @metrics.timed('save_sgf')
+    def save_to_file(self):
+        self.annotations.render()
+        with open(self.output_path, mode='w', encoding='utf-8') as f:
             f.write(str(self.sgf_data))
 
+    @metrics.timed('graph')
     def graph_winrates(self):
-        import matplotlib
-        matplotlib.use('Agg')
-
-        import matplotlib.pyplot as plt
+        import graphs
 
         if len(self.all_stats) <= 2:
             return
 
-        first_move_num = min(self.all_stats.keys())
-        last_move_num = max(self.all_stats.keys())
-        x = []
-        y = []
-        for move_num in sorted(self.all_stats.keys()):
-            if 'winrate' not in self.all_stats[move_num]:
-                continue
-            x.append(move_num)
-            y.append(self.all_stats[move_num]['winrate'])
-
-        plt.figure()
-
-        # fill graph with horizontal coordinate lines, step 0.25
-        for xc in np.arange(0, 1, 0.025):
-            plt.axhline(xc, first_move_num, last_move_num, linewidth=0.04, color='0.7')
-
-        # add single central horizontal line
-        plt.axhline(0.50, first_move_num, last_move_num, linewidth=0.3, color='0.2')
-
-        # main graph of win rate changes
-        plt.plot(x, y, color='#ff0000', marker='.', markersize=2.5, linewidth=0.6)
-
-        # set range limits for x and y axes
-        plt.xlim(0, last_move_num)
-        plt.ylim(0, 1)
-
-        # set size of numbers on axes
-        plt.yticks(np.arange(0, 1.05, 0.05), fontsize=6)
-        plt.yticks(fontsize=6)
-
-        # add labels to axes
-        plt.xlabel("Move Number", fontsize=10)
-        plt.ylabel("Win Rate", fontsize=12)
-
-        # in this script for pdf it use the same file name as provided sgf file to avoid extra parameters
+        # in this script for graph it use the same file name as provided sgf file to avoid extra parameters
         file_name = os.path.splitext(self._path_to_sgf)[0]
-        file_name = f"{file_name}_{self._bot_config}.pdf"
-        plt.savefig(file_name, dpi=200, format='pdf', bbox_inches='tight')
-        plt.close()
+        graph_format = self.config['graph_format']
+        move_nums, winrates = self.results.winrates()
+
+        graphs.save_winrate_graph(f"{file_name}_{self._bot_config}.{graph_format}", move_nums, winrates,
+                                  max(self.all_stats), graph_format)
 
-    def add_moves_to_bot(self):
+    def add_moves_to_bot(self, bot=None):
+        bot = bot or self.bot
         this_move = None
 
         if 'W' in self.cursor.node.keys():
             this_move = self.cursor.node['W'].data[0]
-            self.bot.add_move_to_history('white', this_move)
+            bot.add_move_to_history('white', this_move)
 
         if 'B' in self.cursor.node.keys():
             this_move = self.cursor.node['B'].data[0]
-            self.bot.add_move_to_history('black', this_move)
+            bot.add_move_to_history('black', this_move)
 
         # SGF commands to add black or white stones, often used for setting up handicap and such
         if 'AB' in self.cursor.node.keys():
             for move in self.cursor.node['AB'].data:
-                self.bot.add_move_to_history('black', move)
+                bot.add_move_to_history('black', move)
 
         if 'AW' in self.cursor.node.keys():
             for move in self.cursor.node['AW'].data:
-                self.bot.add_move_to_history('white', move)
+                bot.add_move_to_history('white', move)
 
         return this_move
 
@@ -232,29 +398,71 @@ class BotAnalyzer:
 
         return mv
 
-    def do_analyze(self):
-        ckpt_hash = f"{self.bot.history_hash()}_{self.bot.time_per_move}_sec"
-        ckpt_fn = os.path.join(self.base_dir, ckpt_hash)
+    def checkpoints_dir(self, bot_config):
+        return os.path.join(settings.CHECKPOINTS_DIR.format(bot_config), self.base_hash)
+
+    def checkpoint_path(self, history, time_per_move, base_dir=None):
+        ckpt_hash = f"{history_hash(history)}_{time_per_move}_sec"
+        return os.path.join(base_dir or self.base_dir, ckpt_hash)
+
+    def stored_results(self, history, time_per_move, base_dir=None):
+        """ Returns results of already analyzed position from memory or checkpoint file, otherwise None."""
+        ckpt_fn = self.checkpoint_path(history, time_per_move, base_dir)
+
+        results = self.cache.get(ckpt_fn) if self.cache is not None else None
+        if results is None:
+            if not os.path.exists(ckpt_fn):
+                return None
 
-        if os.path.exists(ckpt_fn):
             logger.debug("Loading checkpoint file: %s", ckpt_fn)
             with open(ckpt_fn, 'rb') as ckpt_file:
-                stats, move_list = pickle.load(ckpt_file)
-        else:
-            self.bot.clear_board()
-            self.bot.go_to_position()
-            stats, move_list = self.bot.analyze()
-            with open(ckpt_fn, 'wb') as ckpt_file:
+                with metrics.timer('checkpoint_read'):
+                    results = pickle.load(ckpt_file)
+            if self.cache is not None:
+                self.cache.put(ckpt_fn, results)
+
+        return results
+
+    def stored_results_of(self, histories, time_per_move, base_dir=None):
+        """
+        Returns results of given positions or None. Checkpoint directory is shared by all games with the same settings,
+        so only files of these positions are looked up instead of listing it.
+        """
+        return [self.stored_results(history, time_per_move, base_dir) for history in histories]
+
+    def do_analyze(self, bot=None, base_dir=None):
+        bot = bot or self.bot
+
+        results = self.stored_results(bot.history, bot.time_per_move, base_dir)
+        if results is not None:
+            return results
+
+        bot.clear_board()
+        bot.go_to_position()
+        stats, move_list = bot.analyze()
+
+        ckpt_fn = self.checkpoint_path(bot.history, bot.time_per_move, base_dir)
+        with open(ckpt_fn, 'wb') as ckpt_file:
+            with metrics.timer('checkpoint_write'):
                 pickle.dump((stats, move_list), ckpt_file)
 
+        if self.cache is not None:
+            self.cache.put(ckpt_fn, (stats, move_list))
         return stats, move_list
 
     def prepare(self):
         """ Stores moves to analyze and wipes comments if needed"""
-        base_hash = hashlib.md5(str(self.sgf_data).encode()).hexdigest()
-        self.base_dir = os.path.join(settings.CHECKPOINTS_DIR.format(self._bot_config), base_hash)
+        # Checkpoints depend only on game settings and history, so they are reused when game grows
+        game_settings = f"{self.board_size} {self.komi} {self.handicap}"
+        # Older configs have no bot_name
+        self.annotations = annotations.Annotations(self.board_size, self.config.get('bot_name', annotations.BOT_NAME))
+        self.base_hash = hashlib.md5(game_settings.encode()).hexdigest()
+        self.base_dir = self.checkpoints_dir(self._bot_config)
         os.makedirs(self.base_dir, exist_ok=True)
 
+        if self.board_size != 19:
+            logger.warning("Board size is not 19 so analysis could be very inaccurate.")
+
         move_num = -1
 
         while not self.cursor.atEnd:
@@ -262,29 +470,88 @@ class BotAnalyzer:
             self.cursor.next()
             move_num += 1
 
-            if CONFIG['move_from'] <= move_num + 1 <= CONFIG['move_till']:
+            if self.config['move_from'] <= move_num + 1 <= self.config['move_till']:
                 self.moves_to_analyze[move_num] = True
 
             node_comment = self.cursor.node.get('C')
-            if node_comment and CONFIG['wipe_comments']:
+            if node_comment and self.config['wipe_comments']:
                 node_comment.data[0] = ""
 
+    def screen_main_line(self):
+        """ Screens main line with a cheap bot and leaves only suspicious moves to analyze."""
+        logger.info("Started screening main line with %s.", self._screen_config)
+
+        screen_dir = self.checkpoints_dir(self._screen_config)
+        os.makedirs(screen_dir, exist_ok=True)
+
+        bot = self.factory(self._screen_config)
+        bot.time_per_move = self.config['screen_time']
+        bot.start()
+
+        move_num = -1
+        prev_best = None
+        moves_to_analyze = {}
+
+        self.cursor.reset()
+        try:
+            while not self.cursor.atEnd:
+                self.cursor.next()
+                move_num += 1
+                this_move = self.add_moves_to_bot(bot)
+
+                if move_num not in self.moves_to_analyze:
+                    prev_best = None
+                    continue
+
+                stats, move_list = self.analyze_journaled('screen', move_num,
+                                                          lambda: self.screen_position(bot, screen_dir))
+                self.screen_stats[move_num] = stats
+
+                if 'winrate' in stats and prev_best is not None:
+                    delta = calculate_delta(stats, prev_best, this_move, bot.whose_turn())
+
+                    # Both positions are required to calculate delta for the move
+                    if -delta > self.config['cascade_threshold']:
+                        moves_to_analyze[move_num - 1] = True
+                        moves_to_analyze[move_num] = True
+
+                prev_best = move_list[0] if move_list and 'winrate' in move_list[0] else None
+
+                if 'winrate' in stats \
+                        and (1 - self.config['stop_on_winrate'] > stats['winrate']
+                             or stats['winrate'] > self.config['stop_on_winrate']):
+                    break
+        finally:
+            bot.stop()
+
+        logger.info("Screening flagged %d of %d moves for analysis.", len(moves_to_analyze),
+                    len(self.moves_to_analyze))
+        self.moves_to_analyze = moves_to_analyze
+
+    @retry_analysis(engine_pool.MAX_RETRIES)
+    def screen_position(self, bot, screen_dir):
+        """ Analyzes position with screening bot, which is outside of the pool, so it is restarted here."""
+        if not bot.alive:
+            bot.stop()
+            bot.start()
+
+        return self.do_analyze(bot, screen_dir)
+
+    @metrics.timed('main_line')
     def analyze_main_line(self):
         logger.info("Started analyzing main line.")
 
         move_num = -1
-        prev_stats = {}
-        prev_move_list = []
+        prev_history = []
         has_prev = False
         previous_player = None
 
         logger.info(f"Executing analysis for %d moves", len(self.moves_to_analyze))
         moves_count = 0
         self.cursor.reset()
+        # bot is used only to keep history, positions are analyzed by bots from the pool
         self.bot = self.factory()
-        self.bot.time_per_move = CONFIG['analyze_time']
-        self.bot.start()
-        # analyze main line, without variations
+        # analyze main line, variations are explored on spare bots as soon as mistake is found
         while not self.cursor.atEnd:
             self.cursor.next()
             move_num += 1
@@ -296,90 +563,164 @@ class BotAnalyzer:
                 raise BotException('Two consecutive moves.')
 
             if move_num in self.moves_to_analyze:
-                stats, move_list = self.do_analyze()
-
-                # Here we store ALL statistics
-                self.all_stats[move_num] = stats
-                self.all_move_lists[move_num] = move_list
-
-                if move_list and 'winrate' in move_list[0]:
-                    self.best_moves[move_num] = move_list[0]
+                stats, move_list = self.analyze_journaled('main', move_num,
+                                                          partial(self.analyze_main_position, self.bot.history))
+                self.store_results(move_num, stats, move_list)
 
                 delta = 0.0
 
                 if 'winrate' in stats and (move_num - 1) in self.best_moves:
-                    if this_move != self.best_moves[move_num - 1]['pos']:
-                        delta = stats['winrate'] - self.best_moves[move_num - 1]['winrate']
-                        delta = min(0.0, (-delta if self.bot.whose_turn() == "black" else delta))
+                    delta = calculate_delta(stats, self.best_moves[move_num - 1], this_move, self.bot.whose_turn())
 
-                    if -delta > CONFIG['analyze_threshold']:
-                        (delta_comment, delta_lb_values) = annotations.format_delta_info(delta, this_move,
-                                                                                         self.board_size)
-                        annotations.annotate_sgf(self.cursor, delta_comment, delta_lb_values, [])
-
-                if has_prev and delta <= -CONFIG['variations_threshold']:
+                if has_prev and delta <= -self.config['variations_threshold']:
                     self.moves_to_variations[move_num - 1] = True
+                    self.submit_variations(move_num - 1, prev_history, this_move)
 
-                if -delta > CONFIG['analyze_threshold']:
-                    logger.warning("Move %d: %s %s is a mistake (winrate dropped by %.2f%%)", move_num + 1,
-                                   previous_player, convert_position(self.board_size, this_move), -delta * 100)
-
-                next_game_move = self.next_move_pos()
-
-                annotations.annotate_sgf(self.cursor,
-                                         annotations.format_winrate(stats, move_list, self.board_size, next_game_move),
-                                         [], [])
+                self.annotate_move(move_num, this_move, delta, has_prev, previous_player)
+                self.export_move(move_num, this_move, delta)
 
-                if has_prev and ((move_num - 1) in self.moves_to_analyze and -delta > CONFIG['analyze_threshold'] or (
-                        move_num - 1) in self.moves_to_variations):
-                    (analysis_comment, lb_values, tr_values) = annotations.format_analysis(
-                        prev_stats, filter_move_list(prev_move_list), this_move, self.board_size)
-                    self.cursor.previous()
-                    # adding comment to sgf with suggested alternative variations
-                    annotations.annotate_sgf(self.cursor, analysis_comment, lb_values, tr_values)
-                    self.cursor.next()
-
-                prev_stats = stats
-                prev_move_list = move_list
+                prev_history = self.bot.history
                 has_prev = True
 
                 self.save_to_file()
-                self.graph_winrates()
+                if self.config['graph_interval'] and len(self.all_stats) % self.config['graph_interval'] == 0:
+                    self.graph_winrates()
 
-                if 'winrate' in stats \
-                        and (1 - CONFIG['stop_on_winrate'] > stats['winrate']
-                             or stats['winrate'] > CONFIG['stop_on_winrate']):
+                if self.is_decided(stats):
                     break
 
                 moves_count += 1
                 logger.info("Analysis done for %d/%d move.", moves_count, len(self.moves_to_analyze))
+                self.notify(phase='main', done=moves_count, total=len(self.moves_to_analyze))
             else:
-                prev_stats = {}
-                prev_move_list = []
                 has_prev = False
 
             previous_player = current_player
 
         logger.info("Finished analyzing main line.")
 
-    def do_variations(self, move_num):
+    def store_results(self, move_num, stats, move_list):
+        # Here we store ALL statistics
+        self.results.add(move_num, stats, move_list)
+
+    def is_decided(self, stats):
+        """ Returns True if game is considered decided at this position, so analysis stops"""
+        return 'winrate' in stats and (1 - self.config['stop_on_winrate'] > stats['winrate']
+                                       or stats['winrate'] > self.config['stop_on_winrate'])
+
+    def annotate_move(self, move_num, this_move, delta, has_prev, player):
+        """ Attaches results of main line move at the cursor and suggested alternatives to the previous move."""
+        stats, move_list = self.all_stats[move_num], self.all_move_lists[move_num]
+        node = self.move_nodes[move_num] = self.cursor.node
+
+        if -delta > self.config['analyze_threshold']:
+            self.annotations.add(node, annotations.DeltaRecord(delta, this_move))
+
+            logger.warning("Move %d: %s %s is a mistake (winrate dropped by %.2f%%)", move_num + 1,
+                           player, convert_position(self.board_size, this_move), -delta * 100)
+
+        self.annotations.add(node, annotations.WinrateRecord(stats, move_list, self.next_move_pos()))
+
+        if has_prev and ((move_num - 1) in self.moves_to_analyze and -delta > self.config['analyze_threshold']
+                         or (move_num - 1) in self.moves_to_variations):
+            # suggested alternative variations are shown at the previous move
+            self.annotations.add(self.move_nodes[move_num - 1], annotations.AnalysisRecord(
+                self.all_stats[move_num - 1], self.filter_move_list(self.all_move_lists[move_num - 1]), this_move))
+
+    def export_move(self, move_num, this_move, delta):
+        """ Passes results of main line move at the cursor to the exporter"""
+        if self.exporter is None:
+            return
+
+        prev_analyzed = (move_num - 1) in self.all_stats
+        self.exporter.add(job_id(self._path_to_sgf), *self.players, move_num,
+                          'white' if 'W' in self.cursor.node else 'black', this_move, self.all_stats[move_num], delta,
+                          self.all_stats[move_num - 1] if prev_analyzed else {},
+                          self.all_move_lists[move_num - 1] if prev_analyzed else [])
+
+    def analyze_main_position(self, history):
+        """ Returns stored results of main line position, otherwise analyzes it on the first idle bot."""
+        results = self.stored_results(history, self.config['analyze_time'])
+        if results is not None:
+            return results
+
+        return self.pool.submit(self.analyze_position, history, self.config['analyze_time']).result()
+
+    @metrics.timed('position')
+    def analyze_position(self, engine, history, time_per_move, moves=()):
+        """ Analyzes position after history and given moves. Runs in engine pool thread."""
+        engine.set_game(self.board_size, self.komi, self.handicap)
+        engine.set_time_per_move(time_per_move)
+        engine.set_history(history)
+        for color, move in moves:
+            engine.add_move_to_history(color, move)
+
+        return self.do_analyze(engine)
+
+    def notify(self, **event):
+        """ Reports analysis progress to the caller"""
+        if self.progress is not None:
+            self.progress(event)
+
+    def calculate_game_key(self):
+        """ Returns key identifying game file and analysis settings, it does not require to read the file."""
+        sgf_stat = os.stat(self._path_to_sgf)
+        game_key = [os.path.abspath(self._path_to_sgf), sgf_stat.st_size, sgf_stat.st_mtime,
+                    self._bot_config, self._screen_config, self.config['analyze_time'], self.config['variations_time']]
+        return hashlib.md5(str(game_key).encode()).hexdigest()
+
+    def analyze_journaled(self, phase, key, analyze):
+        """ Returns results stored in the journal, otherwise calls analyze and stores its results."""
+        if self.journal is None:
+            return analyze()
+
+        results = self.journal.results(self.game_key, phase, key)
+        if results is not None:
+            return results
+
+        stats, move_list = analyze()
+        self.journal.record(self.game_key, phase, key, stats, move_list)
+        return stats, move_list
+
+    def journal_variation(self, position_key, future):
+        if not future.cancelled() and future.exception() is None:
+            stats, move_list = future.result()
+            self.journal.record(self.game_key, 'variations', position_key, stats, move_list)
+
+    def submit_variations(self, move_num, history, game_move):
+        """ Schedules variation tree exploration for given move, it runs while main line is analyzed."""
+        stats, move_list = self.all_stats[move_num], self.all_move_lists[move_num]
+
+        if 'bookmoves' in stats or len(move_list) <= 0:
+            return
+
+        self.variation_trees[move_num] = self.explorers.submit(self.explore_variations, move_num, history, game_move)
+
+    @metrics.timed('variation_tree')
+    def explore_variations(self, move_num, history, game_move):
         stats = self.all_stats[move_num]
-        move_list = filter_move_list(self.all_move_lists[move_num])
-        game_move = self.next_move_pos()
+        move_list = self.filter_move_list(self.all_move_lists[move_num])
+
+        rootcolor = next_color(history, self.handicap)
 
-        rootcolor = self.bot.whose_turn()
-        leaves = []
         tree = {"children": [],
                 "is_root": True,
                 "history": [],
                 "explored": False,
                 "stats": stats,
                 "move_list": move_list,
-                "color": rootcolor}
+                "color": rootcolor,
+                "probability": 1.0}
+
+        # Leaves ordered by probability of the line to be played, most promising are explored first
+        frontier = []
+        counter = itertools.count()
 
         def expand(node, stats, move_list):
             assert node["color"] in ['white', 'black']
 
+            visit_sums = sum([move['visits'] for move in move_list]) or 1
+
             for move in move_list:
                 # Don't expand on the actual game line as a variation!
                 if node["is_root"] and move["pos"] == game_move:
@@ -394,37 +735,118 @@ class BotAnalyzer:
                          "explored": False,
                          "stats": {},
                          "move_list": [],
-                         "color": clr}
+                         "color": clr,
+                         "move": move,
+                         "probability": node["probability"] * move['visits'] / visit_sums}
                 node["children"].append(child)
-                leaves.append(child)
+
+                if len(subhistory) <= self.config['variations_depth']:
+                    heapq.heappush(frontier, (-child["probability"], next(counter), child))
 
             node["stats"] = stats
             node["move_list"] = move_list
             node["explored"] = True
 
-            for leaf_idx in range(len(leaves)):
-                if leaves[leaf_idx] is node:
-                    del leaves[leaf_idx]
-                    break
+        root_board = Board.from_history(self.board_size, history)
 
-        def analyze_and_expand(node):
+        # Positions of this tree, other trees could reach them first, so they are counted per tree
+        tree_positions = set()
 
+        def submit(node):
+            """
+            Returns analysis of node position and whether it is new in this tree,
+            analysis is shared with every identical position already submitted.
+            """
+            board = root_board.copy()
+            color = rootcolor
+            moves = []
             for mv in node["history"]:
-                self.bot.add_move_to_history(self.bot.whose_turn(), mv)
-            stats, move_list = self.do_analyze()
-
-            expand(node, stats, filter_move_list(move_list))
-            self.bot.pop_move_from_history(len(node['history']))
-            self.save_to_file()
+                moves.append((color, mv))
+                board.play(color, mv)
+                color = "white" if color == "black" else "black"
+
+            position_key = board.key(color)
+            is_new = position_key not in tree_positions
+            tree_positions.add(position_key)
+
+            with self.transpositions_lock:
+                if position_key in self.transpositions:
+                    return self.transpositions[position_key], is_new
+
+                results = self.journal.results(self.game_key, 'variations', position_key) if self.journal else None
+                if results is None:
+                    results = self.stored_results(history + [move_command(self.board_size, *move) for move in moves],
+                                                  self.config['variations_time'])
+
+                    # Journal records every explored position, as analyze_journaled does for the main line
+                    if results is not None and self.journal:
+                        self.journal.record(self.game_key, 'variations', position_key, *results)
+
+                if results is not None:
+                    future = Future()
+                    future.set_result(results)
+                elif self.pool is None:
+                    # Rendering from stored analysis, position stays unexplored
+                    future = Future()
+                    future.set_exception(BotException("Position was not analyzed."))
+                else:
+                    future = self.pool.submit(self.analyze_position, history, self.config['variations_time'], moves,
+                                              priority=engine_pool.VARIATIONS)
+                    if self.journal:
+                        future.add_done_callback(partial(self.journal_variation, position_key))
+
+                self.transpositions[position_key] = future
+
+            return future, is_new
 
         expand(tree, stats, move_list)
 
-        for i in range(CONFIG['variations_depth']):
-            if len(leaves) > 0:
+        deadline = time.time() + self.config['variations_budget'] if self.config['variations_budget'] else None
+        analyzed = 0
+        transposed = 0
+        pending = {}
+
+        # Without bots stored analysis is explored in the same order as it was analyzed
+        parallel = self.pool.size if self.pool is not None else self.config['engines']
+
+        while frontier or pending:
+            while frontier and len(pending) < parallel and analyzed < self.config['variations_nodes'] \
+                    and (deadline is None or time.time() < deadline):
+                _, _, leaf = heapq.heappop(frontier)
+                future, is_new = submit(leaf)
+                pending.setdefault(future, []).append(leaf)
+
+                if is_new:
+                    analyzed += 1
+                else:
+                    transposed += 1
+
+            if not pending:
+                break
+
+            # Recorded and replayed sessions must explore the same positions, and rendering follows stored analysis,
+            # so there the tree depends only on analysis results: expansion waits for the first submitted position
+            waiting = [next(iter(pending))] if SESSION is not None or self.pool is None else list(pending)
+            done, _ = wait(waiting, return_when=FIRST_COMPLETED)
+
+            # Finished positions are expanded in order of submission, so ties of probability are broken by it
+            for future in [future for future in pending if future in done]:
+                leaves = pending.pop(future)
+                if future.exception() is not None:
+                    logger.debug("Variation left unexplored: %s", future.exception())
+                    continue
+
+                leaf_stats, leaf_move_list = future.result()
                 for leaf in leaves:
-                    if not len(leaf['history']) > CONFIG['variations_depth']:
-                        analyze_and_expand(leaf)
+                    expand(leaf, leaf_stats, self.filter_move_list(leaf_move_list))
+
+        logger.debug("Explored %d positions (%d transpositions) in variation tree for move %d.",
+                     analyzed + transposed, transposed, move_num + 1)
 
+        return tree
+
+    def record_variations(self, tree):
+        """ Adds explored variation tree to sgf at the current cursor position"""
         def advance(color, mv):
             found_child_idx = None
             clr = 'W' if color == 'white' else 'B'
@@ -443,11 +865,7 @@ class BotAnalyzer:
 
         def record(node):
             if not node["is_root"]:
-                annotations.annotate_sgf(self.cursor,
-                                         annotations.format_winrate(node["stats"],
-                                                                    node["move_list"],
-                                                                    self.board_size, None),
-                                         [], [])
+                self.annotations.add(self.cursor.node, annotations.WinrateRecord(node["stats"], node["move_list"], None))
                 move_list_to_display = []
 
                 # Only display info for the principal variation or for lines that have been explored
@@ -455,12 +873,10 @@ class BotAnalyzer:
                     child = node["children"][i]
 
                     if child is not None and (i == 0 or child["explored"]):
-                        move_list_to_display.append(node["move_list"][i])
-
-                (comment, lb_values, tr_values) = annotations.format_analysis(
-                    node["stats"], move_list_to_display, None, self.board_size)
+                        move_list_to_display.append(child["move"])
 
-                annotations.annotate_sgf(self.cursor, comment, lb_values, tr_values)
+                self.annotations.add(self.cursor.node,
+                                     annotations.AnalysisRecord(node["stats"], move_list_to_display, None))
 
             for i in range(len(node["children"])):
                 child = node["children"][i]
@@ -472,11 +888,11 @@ class BotAnalyzer:
                         self.cursor.previous()
                     # Only show variations for the principal line, to prevent info overload
                     elif i == 0:
-                        pv = node["move_list"][i]["pv"]
+                        pv = child["move"]["pv"]
                         color = node["color"]
 
-                        if CONFIG['num_to_show']:
-                            num_to_show = min(len(pv), CONFIG['num_to_show'])
+                        if self.config['num_to_show']:
+                            num_to_show = min(len(pv), self.config['num_to_show'])
                         else:
                             num_to_show = len(pv)
 
@@ -489,61 +905,170 @@ class BotAnalyzer:
 
         record(tree)
 
+    @metrics.timed('variations')
     def analyze_variations(self):
         logger.info("Started deep analysis of mistakes.")
 
+        logger.info("Exploring variations for %d moves with %d depth.",
+                    len(self.variation_trees),
+                    self.config['variations_depth'])
+
         move_num = -1
         self.cursor.reset()
-        self.bot.reset()
-        self.bot.time_per_move = CONFIG['variations_time']
-        self.add_moves_to_bot()
-
-        logger.info("Exploring variations for %d moves with %d depth.",
-                    len(self.moves_to_variations),
-                    CONFIG['variations_depth'])
 
         moves_count = 0
         while not self.cursor.atEnd:
             self.cursor.next()
             move_num += 1
-            self.add_moves_to_bot()
-
-            if move_num not in self.moves_to_variations:
-                continue
-
-            stats, move_list = self.all_stats[move_num], self.all_move_lists[move_num]
 
-            if 'bookmoves' in stats or len(move_list) <= 0:
+            if move_num not in self.variation_trees:
                 continue
 
-            self.do_variations(move_num)
+            self.record_variations(self.variation_trees[move_num].result())
             moves_count += 1
-            logger.info("Analyzed %d/%d mistakes.", moves_count, len(self.moves_to_variations))
+            logger.info("Analyzed %d/%d mistakes.", moves_count, len(self.variation_trees))
+            self.notify(phase='variations', done=moves_count, total=len(self.variation_trees))
 
             self.save_to_file()
 
+        # All trees are explored, results are kept in annotations
+        with self.transpositions_lock:
+            self.transpositions.clear()
+
         logger.info("Finished deep analysis of mistakes.")
 
+    @collect_timings
+    def render(self):
+        """ Annotates game again from stored analysis with current settings, bots are not started."""
+        import numpy as np
+
+        logger.info("Rendering file: %s", os.path.basename(self._path_to_sgf))
+
+        self.parse_sgf_file()
+        self.cursor = self.sgf_data.cursor()
+        self.prepare()
+
+        # Load results of every main line position at once, bot only keeps history
+        bot = self.factory()
+        histories, moves, players = [], [], []
+        self.cursor.reset()
+
+        while not self.cursor.atEnd:
+            self.cursor.next()
+            moves.append(self.add_moves_to_bot(bot))
+            players.append('white' if 'W' in self.cursor.node else 'black')
+            histories.append(bot.history)
+
+        analyzed = [move_num for move_num in range(len(histories)) if move_num in self.moves_to_analyze]
+        results = [None] * len(histories)
+        stored = self.stored_results_of([histories[move_num] for move_num in analyzed], self.config['analyze_time'])
+        for move_num, move_results in zip(analyzed, stored):
+            results[move_num] = move_results
+
+        def best_move(move_num):
+            if move_num >= 0 and results[move_num] and results[move_num][1] \
+                    and 'winrate' in results[move_num][1][0]:
+                return results[move_num][1][0]
+
+        winrates = np.array([r[0].get('winrate', np.nan) if r else np.nan for r in results], dtype=float)
+        prev_best_winrates = np.array([best_move(n - 1)['winrate'] if best_move(n - 1) else np.nan
+                                       for n in range(len(results))], dtype=float)
+        played_best = np.array([best_move(n - 1) is not None and best_move(n - 1)['pos'] == moves[n]
+                                for n in range(len(results))], dtype=bool)
+        black_next = np.array([next_color(history, self.handicap) == 'black' for history in histories], dtype=bool)
+
+        deltas = calculate_deltas(winrates, prev_best_winrates, played_best, black_next)
+
+        self.explorers = ThreadPoolExecutor(max_workers=1)
+        try:
+            move_num = -1
+            has_prev = False
+            self.cursor.reset()
+
+            while not self.cursor.atEnd:
+                self.cursor.next()
+                move_num += 1
+
+                if results[move_num] is None:
+                    has_prev = False
+                    continue
+
+                stats, move_list = results[move_num]
+                self.store_results(move_num, stats, move_list)
+
+                delta = float(deltas[move_num])
+                if has_prev and delta <= -self.config['variations_threshold']:
+                    self.moves_to_variations[move_num - 1] = True
+                    self.submit_variations(move_num - 1, histories[move_num - 1], moves[move_num])
+
+                self.annotate_move(move_num, moves[move_num], delta, has_prev, players[move_num])
+                self.export_move(move_num, moves[move_num], delta)
+                has_prev = True
+
+                if self.is_decided(stats):
+                    break
+
+            self.analyze_variations()
+        finally:
+            self.explorers.shutdown(wait=True)
+
+        self.save_to_file()
+        self.graph_winrates()
+        if self.exporter is not None:
+            self.exporter.flush()
+
+        logger.info("Rendered %d analyzed moves of file: %s", len(self.all_stats), os.path.basename(self._path_to_sgf))
+
+    @collect_timings
     def run(self):
+        if self.journal is not None:
+            self.game_key = self.calculate_game_key()
+
+            if self.journal.is_done(self.game_key):
+                logger.info("Skipping already analyzed file: %s", os.path.basename(self._path_to_sgf))
+                return True
+
         logger.info("Started analyzing file: %s", os.path.basename(self._path_to_sgf))
 
         self.parse_sgf_file()
         self.cursor = self.sgf_data.cursor()
+        finished = False
 
         try:
             self.prepare()
+            if self._screen_config:
+                self.screen_main_line()
+
+            if self._own_pool:
+                self.pool = EnginePool(self.factory, self.config['engines'])
+                self.pool.start()
+            self.explorers = ThreadPoolExecutor(max_workers=self.pool.size)
+
             self.analyze_main_line()
+            self.graph_winrates()
             self.analyze_variations()
 
+            if self.journal is not None:
+                self.journal.record(self.game_key, 'done')
+            finished = True
+
         except KeyboardInterrupt:
-            pass
+            # Stop the whole run, finished jobs are kept in the journal and checkpoints
+            logger.info("Analysis interrupted: %s", os.path.basename(self._path_to_sgf))
+            raise
 
         except:
             logger.exception("Exception during analysis.")
         finally:
-            self.bot.stop()
+            if self._own_pool and self.pool is not None:
+                self.pool.stop()
+            if self.explorers is not None:
+                self.explorers.shutdown(wait=True)
+            if self.exporter is not None:
+                self.exporter.flush()
 
         logger.info("Finished analyzing file: %s", os.path.basename(self._path_to_sgf))
+        return finished
 
 
 def process_path(path_string):
@@ -560,18 +1085,145 @@ def process_path(path_string):
     return games
 
 
+def daemon_analyze(pool, bot_config, screen_config=None, cache=None):
+    """ Returns function analyzing jobs of the service with bots of the pool, see AnalysisDaemon."""
+    def analyze(path_to_sgf, config, progress):
+        analyzer = BotAnalyzer(path_to_sgf, bot_config, screen_config, config=config, pool=pool, progress=progress,
+                               cache=cache)
+        finished = analyzer.run()
+        report_game(path_to_sgf, analyzer)
+        if not finished:
+            raise BotException("Analysis failed, see log for details.")
+        return analyzer.output_path
+
+    return analyze
+
+
+def serve(cmd_args):
+    """ Keeps bots started and analyzes games submitted to the local HTTP API one by one."""
+    from daemon import AnalysisDaemon
+
+    pool = EnginePool(partial(create_bot, cmd_args.bot), CONFIG['engines'])
+    # The same games are often submitted again, e.g. with other settings of comments
+    analysis_daemon = AnalysisDaemon(daemon_analyze(pool, cmd_args.bot, cmd_args.screen_bot, ResultsCache()),
+                                     settings.SPOOL_DIR, CONFIG, port=cmd_args.port)
+    pool.start()
+
+    try:
+        analysis_daemon.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping service...")
+    finally:
+        analysis_daemon.shutdown()
+        pool.stop()
+
+
+def watch(cmd_args):
+    """ Analyzes games again whenever they change, only positions added since the previous run hit the bots."""
+    pool = EnginePool(partial(create_bot, cmd_args.bot), CONFIG['engines'])
+    watcher = FolderWatcher(cmd_args.path_to_sgf, cmd_args.interval, ignore_suffix=f"_{cmd_args.bot}.sgf")
+    cache = ResultsCache()
+
+    pool.start()
+    logger.info("Watching %d paths for changes...", len(watcher.paths))
+
+    try:
+        for game in watcher.watch():
+            analyzer = BotAnalyzer(game, cmd_args.bot, cmd_args.screen_bot, pool=pool, cache=cache)
+            try:
+                analyzer.run()
+            except KeyboardInterrupt:
+                raise
+            except Exception:
+                # File could be caught in the middle of writing, it is analyzed again after the next change
+                logger.exception("Failed to analyze file: %s", game)
+            report_game(game, analyzer)
+    except KeyboardInterrupt:
+        logger.info("Stopping watch...")
+    finally:
+        pool.stop()
+
+
 if __name__ == '__main__':
     cmd_args = parse_cmd_line()
+    init()
+    cmd_args.bot = cmd_args.bot or BOTS['default']
 
-    game_list = process_path(cmd_args.path_to_sgf)
+    if cmd_args.record or cmd_args.replay:
+        import tempfile
+        from gtp_session import open_session
 
-    logger.info('Found %s sgf-files to analyze.', len(game_list))
+        SESSION = open_session(cmd_args.record, cmd_args.replay)
+
+        # Every search has to reach the session, so checkpoints of previous runs are not used
+        session_checkpoints = tempfile.TemporaryDirectory()
+        settings.CHECKPOINTS_DIR = os.path.join(session_checkpoints.name, '{}')
+
+    if cmd_args.metrics or cmd_args.metrics_textfile:
+        METRICS = metrics.MetricsWriter(cmd_args.metrics, cmd_args.metrics_textfile)
+
+    if cmd_args.profile:
+        profiling.configure(cmd_args.profile, [phase for phase in cmd_args.profile_phases.split(',') if phase],
+                            cmd_args.profile_top, cmd_args.profile_interval)
+
+    if cmd_args.serve:
+        serve(cmd_args)
+        sys.exit()
 
-    queue = []
-    for game in game_list:
-        queue.append(BotAnalyzer(game, cmd_args.bot))
+    if cmd_args.report:
+        from export import load_results
+        from report import format_report, player_report
 
-    for game in queue:
-        game.run()
+        print(format_report(player_report(load_results(cmd_args.report), cmd_args.player)))
+        sys.exit()
+
+    if cmd_args.watch:
+        watch(cmd_args)
+        sys.exit()
+
+    game_list = process_path(cmd_args.path_to_sgf)
+
+    logger.info('Found %s sgf-files to analyze.', len(game_list))
 
-    logger.info('Analysis done for %s sgf-files.', len(game_list))
+    exporter = None
+    if cmd_args.export:
+        from export import ResultsExporter
+        exporter = ResultsExporter(cmd_args.export)
+
+    if cmd_args.render:
+        for game in game_list:
+            BotAnalyzer(game, cmd_args.bot, exporter=exporter).render()
+        sys.exit()
+
+    journal = None
+    if cmd_args.journal:
+        journal = Journal(cmd_args.journal)
+        journal.open()
+
+    work_queue = None
+    games = game_list
+    if cmd_args.queue:
+        work_queue = WorkQueue(cmd_args.queue, cmd_args.worker_id, cmd_args.lease_time)
+        work_queue.start()
+        games = work_queue.jobs(game_list)
+
+    try:
+        for game in games:
+            analyzer = BotAnalyzer(game, cmd_args.bot, cmd_args.screen_bot, journal, exporter=exporter)
+            finished = analyzer.run()
+            report_game(game, analyzer)
+
+            if work_queue is not None:
+                if finished:
+                    work_queue.complete(job_id(game))
+                else:
+                    work_queue.release(job_id(game))
+    except KeyboardInterrupt:
+        logger.info('Analysis interrupted, run again with the same journal to resume.')
+    else:
+        logger.info('Analysis done for %s sgf-files.', len(game_list))
+    finally:
+        if work_queue is not None:
+            work_queue.stop()
+        if journal is not None:
+            journal.close()
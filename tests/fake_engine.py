@@ -0,0 +1,138 @@
+"""
+Fake Leela or Leela Zero GTP engine for tests and benchmarks, analysis is derived from the hash of played moves:
+
+    python tests/fake_engine.py [--format leela|leela-zero] [--delay SECONDS] [--jitter SECONDS] [--moves COUNT]
+                                [--crash-once PATH] [--hang-once PATH] [--startup-delay SECONDS]
+
+The same position always gets the same analysis and the same search latency, i.e. delay plus its share of jitter.
+Engine faults are simulated by the first search of any started engine, the given file marks that it has happened.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+LETTERS = 'ABCDEFGHJKLMNOPQRST'
+
+
+def candidates(board_size, played, count=3):
+    """ Returns distinct vertices not played yet and the seed of the position, the same for the same moves."""
+    seed = int(hashlib.md5(' '.join(played).encode()).hexdigest(), 16)
+    moves = []
+
+    for i in range(count * 4):
+        bits = seed >> (i * 8 % 120)
+        move = f"{LETTERS[(bits + i) % board_size]}{(bits >> 4) % board_size + 1}"
+        if move not in played and move not in moves:
+            moves.append(move)
+
+    # Nearly full board, the first empty vertex is taken
+    if not moves:
+        moves = [f"{x}{y}" for x in LETTERS[:board_size] for y in range(1, board_size + 1)
+                 if f"{x}{y}" not in played][:1] or ["pass"]
+
+    return moves[:count], seed
+
+
+def leela_zero_output(moves, winrate):
+    lines = [f"NN eval={winrate / 100:.6f}"]
+    lines += [f"Playouts: {500 * (i + 1)}, Win: {winrate:.2f}%, PV: {' '.join(moves)}" for i in range(3)]
+    lines += [""]
+    lines += [f" {move:>3} -> {1000 // (i + 1):7d} (V: {winrate - i * 3:5.2f}%) (LCB: {winrate - i * 3 - 2:5.2f}%) "
+              f"(N: {30 - i:5.2f}%) PV: {move} {' '.join(moves[:i] + moves[i + 1:])}" for i, move in enumerate(moves)]
+    lines += ["", "1833 visits, 1833 nodes, 1800 playouts, 500 n/s", ""]
+    return lines
+
+
+def leela_output(moves, winrate):
+    lines = ["Thinking at most 1.0 seconds..."]
+    lines += [f"Nodes: {500 * (i + 1)}, Win: {winrate:.2f}% (MC:{winrate - 1:.2f}%/VN:{winrate + 1:.2f}%), "
+              f"PV: {' '.join(moves)}" for i in range(3)]
+    lines += [""]
+    lines += [f"{move:>3} -> {1000 // (i + 1):7d} (W: {winrate - i * 3:5.2f}%) (U: {winrate - i * 3 - 1:5.2f}%) "
+              f"(V: {winrate - i * 3 + 1:5.2f}%: {500 // (i + 1):6d}) (N: {30 - i:4.1f}%) "
+              f"PV: {move} {' '.join(moves[:i] + moves[i + 1:])}" for i, move in enumerate(moves)]
+    lines += ["", "================",
+              f"1833 visits, score {winrate:5.2f}% (from {winrate - 2:5.2f}%) PV: {' '.join(moves)}", "",
+              f"MC winrate={(winrate - 1) / 100:.6f}, NN eval={(winrate + 1) / 100:.6f}, score=B+{winrate / 10:.1f}",
+              "1833 visits, 1833 nodes, 1800 playouts, 500 p/s", ""]
+    return lines
+
+
+def first_time(path):
+    """ Returns True only for the first caller of all processes given the same path."""
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL))
+        return True
+    except FileExistsError:
+        return False
+
+
+def genmove(args, board_size, played):
+    if args.crash_once and first_time(args.crash_once):
+        os._exit(3)
+    if args.hang_once and first_time(args.hang_once):
+        while True:
+            time.sleep(60)
+
+    moves, seed = candidates(board_size, played, args.moves)
+    winrate = 30 + (seed % 4000) / 100
+
+    time.sleep(args.delay + args.jitter * (seed % 1000) / 1000)
+
+    output = leela_output if args.format == 'leela' else leela_zero_output
+    sys.stderr.write("".join(f"{line}\n" for line in output(moves, winrate)))
+    sys.stderr.flush()
+
+    return moves[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--format', default='leela-zero', choices=['leela', 'leela-zero'],
+                        help="Format of analysis written to stderr")
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds of every search")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Maximum seconds added to search of a position")
+    parser.add_argument('--moves', type=int, default=3, help="Number of candidate moves")
+    parser.add_argument('--crash-once', default=None, help="Exit during the first search, if given file is missing")
+    parser.add_argument('--hang-once', default=None, help="Hang in the first search, if given file is missing")
+    parser.add_argument('--startup-delay', type=float, default=0.0, help="Seconds of loading before reading commands")
+    args = parser.parse_args()
+
+    time.sleep(args.startup_delay)
+
+    board_size = 19
+    played = []
+
+    for line in sys.stdin:
+        command = line.split()
+        if not command:
+            continue
+
+        reply = ""
+        if command[0] == 'boardsize':
+            board_size = int(command[1])
+        elif command[0] == 'clear_board':
+            played = []
+        elif command[0] == 'play':
+            played.append(command[2])
+        elif command[0] == 'genmove':
+            reply = genmove(args, board_size, played)
+            played.append(reply)
+        elif command[0] == 'name':
+            reply = "Fake Leela" if args.format == 'leela' else "Fake Leela Zero"
+        elif command[0] not in ('komi', 'time_settings', 'time_left', 'quit'):
+            sys.stdout.write("? unknown command\n\n")
+            sys.stdout.flush()
+            continue
+
+        sys.stdout.write(f"= {reply}\n\n")
+        sys.stdout.flush()
+
+        if command[0] == 'quit':
+            break
+
+
+if __name__ == '__main__':
+    main()
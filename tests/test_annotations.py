@@ -0,0 +1,51 @@
+from annotations import AnalysisRecord, Annotations, DeltaRecord, WinrateRecord, render_records
+from sgflib import Node, Property
+
+
+def test_records_are_rendered_in_order():
+    move_list = [{'pos': 'pd', 'winrate': 0.6, 'visits': 900, 'color': 'white'},
+                 {'pos': '', 'winrate': 0.5, 'visits': 100, 'color': 'white'}]
+    records = [DeltaRecord(-0.12, 'dd'), WinrateRecord({'winrate': 0.455}, move_list, 'dd'),
+               AnalysisRecord({'visits': 1000}, move_list, 'dd')]
+
+    comment, labels, triangles = render_records(records, 19, bot="Leela Zero")
+
+    assert comment == ("=================================\n"
+                       "Leela Zero thinks D16 is a mistake!\n"
+                       "Winning percentage drops by 12.00%\n"
+                       "=================================\n"
+                       "\n"
+                       "Overall black win%: 45.50%\n"
+                       "Leela Zero's preferred next move: Q16\n"
+                       "==========================\n"
+                       "Visited 1000 nodes\n"
+                       "\n"
+                       "A -> Win%: 40.00% (900 visits) \n"
+                       "B -> Win%: 50.00% (100 visits) \n")
+    assert labels == ['dd:?', 'pd:A']
+    assert triangles == ['dd']
+
+    comment, _, _ = render_records([WinrateRecord({}, [], None), AnalysisRecord({'bookmoves': 3, 'positions': 10},
+                                                                                 [], None)], 19)
+    assert comment == ("Overall black win%: not computed (Leela still in opening book)\n\n"
+                       "==========================\nConsidered 3/10 bookmoves\n")
+
+
+def test_annotations_keep_original_properties():
+    node = Node()
+    node.add_property(Property('C', ["Game comment\n"]))
+    node.add_property(Property('LB', ["aa:X"]))
+    move_list = [{'pos': 'pd', 'winrate': 0.6, 'visits': 900, 'color': 'black'}]
+
+    annotations = Annotations(19)
+    annotations.add(node, WinrateRecord({'winrate': 0.5}, move_list, 'pd'))
+    annotations.render()
+    annotations.add(node, AnalysisRecord({'visits': 900}, move_list, 'pd'))
+    annotations.render()
+    # Nothing changed, so nothing is rendered again
+    annotations.render()
+
+    assert node['C'].data == ["Game comment\nOverall black win%: 50.00%\n\n"
+                              "==========================\nVisited 900 nodes\n\nA -> Win%: 60.00% (900 visits) \n"]
+    assert node['LB'].data == ["aa:X", "pd:A"]
+    assert 'TR' not in node
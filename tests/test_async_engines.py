@@ -0,0 +1,102 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+from async_engines import AsyncEnginePool, Position
+from bot_engines import LeelaZeroCLI
+from gtp_session import SessionRecorder, SessionReplay
+
+FAKE_ENGINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_engine.py')
+
+
+def fake_bot(delay, arguments="", session=None):
+    return lambda: LeelaZeroCLI('leela-zero', sys.executable, f"{FAKE_ENGINE} --delay {delay} {arguments}",
+                                time_per_move=1, session=session)
+
+
+def analyze_with(pool, positions):
+    async def analyze():
+        await pool.start()
+        try:
+            return await pool.analyze_all(positions, 1)
+        finally:
+            await pool.stop()
+
+    return run(analyze())
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def test_async_pool_analyzes_positions_concurrently():
+    pool = AsyncEnginePool(fake_bot(0.3), 3)
+    moves = ["play black Q16", "play white D4", "play black Q3", "play white D16", "play black R5"]
+    positions = [Position(moves[:i]) for i in range(6)]
+
+    async def analyze():
+        await pool.start()
+        try:
+            start = time.monotonic()
+            results = await pool.analyze_all(positions, 1)
+            return results, time.monotonic() - start
+        finally:
+            await pool.stop()
+
+    results, elapsed = run(analyze())
+
+    # Six searches of 0.3 seconds on three engines
+    assert elapsed < 1.5
+    for position, (stats, move_list) in zip(positions, results):
+        assert stats['best'] == move_list[0]['pos'] == stats['chosen']
+        assert stats['visits'] == 1833
+        assert move_list[0]['color'] == ('white' if len(position.history) % 2 else 'black')
+
+
+def test_async_pool_restarts_engine_after_timeout():
+    pool = AsyncEnginePool(fake_bot(0.5), 1)
+
+    async def analyze():
+        await pool.start()
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.analyze(Position([]), 1, timeout=0.1)
+
+            return await pool.analyze(Position([]), 1, timeout=5)
+        finally:
+            await pool.stop()
+
+    stats, move_list = run(analyze())
+    assert stats['visits'] == 1833 and len(move_list) == 3
+
+
+def test_async_pool_records_and_replays_session(tmpdir):
+    path = str(tmpdir.join('session.jsonl'))
+    positions = [Position([]), Position(["play black Q16"])]
+
+    recorder = SessionRecorder(path)
+    recorded = analyze_with(AsyncEnginePool(fake_bot(0, session=recorder), 2), positions)
+    recorder.close()
+
+    # Replayed session doesn't start engines
+    replay = SessionReplay(path)
+    replayed = analyze_with(AsyncEnginePool(lambda: LeelaZeroCLI('leela-zero', 'missing-engine', '', time_per_move=1,
+                                                                 session=replay), 2), positions)
+    assert replayed == recorded
+
+
+def test_async_pool_retries_failed_engine(tmpdir):
+    crashed = tmpdir.join('crashed')
+    (stats, move_list), = analyze_with(AsyncEnginePool(fake_bot(0, f"--crash-once {crashed}"), 1), [Position([])])
+
+    assert crashed.check()
+    assert stats['visits'] == 1833 and len(move_list) == 3
@@ -0,0 +1,42 @@
+from board import Board
+
+
+def test_board_capture():
+    board = Board(9)
+    for color, pos in [('black', 'ba'), ('white', 'aa'), ('black', 'ab')]:
+        board.play(color, pos)
+
+    assert (0, 0) not in board.stones
+    assert board.stones == {(1, 0): 'black', (0, 1): 'black'}
+
+
+def test_board_ko():
+    board = Board(9)
+    for color, pos in [('black', 'bb'), ('white', 'cb'), ('black', 'ac'), ('white', 'dc'),
+                       ('black', 'bd'), ('white', 'cd'), ('black', 'cc'), ('white', 'bc')]:
+        board.play(color, pos)
+
+    assert (2, 2) not in board.stones
+    assert board.ko == (2, 2)
+
+    board.play('black', 'ii')
+    assert board.ko is None
+
+
+def test_board_key_ignores_move_order():
+    first = Board(19)
+    second = Board(19)
+
+    for color, pos in [('black', 'pd'), ('white', 'dd'), ('black', 'pp'), ('white', 'dp')]:
+        first.play(color, pos)
+
+    for color, pos in [('black', 'pp'), ('white', 'dp'), ('black', 'pd'), ('white', 'dd')]:
+        second.play(color, pos)
+
+    assert first.key('black') == second.key('black')
+    assert first.key('black') != first.key('white')
+
+
+def test_board_from_history():
+    board = Board.from_history(19, ['play black D4', 'play white Q16', 'play black pass'])
+    assert board.stones == {(3, 15): 'black', (15, 3): 'white'}
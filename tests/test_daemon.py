@@ -0,0 +1,152 @@
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+import yaml
+
+import settings
+import sgfanalyze
+from daemon import AnalysisDaemon
+from engine_pool import EnginePool
+
+FAKE_ENGINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_engine.py')
+
+SGF = "(;GM[1]FF[4]SZ[19];B[pd];W[dd])"
+
+
+@pytest.fixture
+def analysis_daemon(tmpdir):
+    started = threading.Event()
+    release = threading.Event()
+    analyzed = []
+
+    def analyze(path_to_sgf, config, progress):
+        started.set()
+        release.wait(5)
+        analyzed.append(config.get('name'))
+        progress({'phase': 'main', 'done': 1, 'total': 1})
+
+        result_path = path_to_sgf + '.result'
+        with open(result_path, 'w') as result_file:
+            result_file.write(SGF)
+        return result_path
+
+    analysis_daemon = AnalysisDaemon(analyze, str(tmpdir), {'name': '', 'analyze_time': 60}, port=0)
+    analysis_daemon.started = started
+    analysis_daemon.release = release
+    analysis_daemon.analyzed = analyzed
+
+    thread = threading.Thread(target=analysis_daemon.serve_forever, daemon=True)
+    thread.start()
+    yield analysis_daemon
+
+    release.set()
+    analysis_daemon.shutdown()
+
+
+def request(analysis_daemon, method, path, data=None):
+    url = 'http://%s:%d%s' % (analysis_daemon.address + (path,))
+    body = json.dumps(data).encode() if data is not None else None
+    return urllib.request.urlopen(urllib.request.Request(url, data=body, method=method), timeout=10)
+
+
+def test_daemon_runs_jobs_by_priority(analysis_daemon):
+    first = json.load(request(analysis_daemon, 'POST', '/jobs', {'sgf': SGF, 'config': {'name': 'first'}}))
+    analysis_daemon.started.wait(5)
+
+    low = json.load(request(analysis_daemon, 'POST', '/jobs', {'sgf': SGF, 'config': {'name': 'low'}}))
+    high = json.load(request(analysis_daemon, 'POST', '/jobs', {'sgf': SGF, 'config': {'name': 'high'},
+                                                                'priority': 10}))
+    analysis_daemon.release.set()
+
+    events = [json.loads(line) for line in request(analysis_daemon, 'GET', f"/jobs/{low['id']}/events")]
+    assert events[-1] == {'status': 'done'}
+    assert {'phase': 'main', 'done': 1, 'total': 1} in events
+
+    assert analysis_daemon.analyzed == ['first', 'high', 'low']
+    assert request(analysis_daemon, 'GET', f"/jobs/{first['id']}/result").read().decode() == SGF
+    assert json.load(request(analysis_daemon, 'GET', f"/jobs/{high['id']}"))['status'] == 'done'
+
+
+def test_daemon_cancels_queued_job(analysis_daemon):
+    request(analysis_daemon, 'POST', '/jobs', {'sgf': SGF})
+    analysis_daemon.started.wait(5)
+    queued = json.load(request(analysis_daemon, 'POST', '/jobs', {'sgf': SGF, 'config': {'name': 'cancelled'}}))
+
+    assert json.load(request(analysis_daemon, 'DELETE', f"/jobs/{queued['id']}"))['status'] == 'cancelled'
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        request(analysis_daemon, 'GET', f"/jobs/{queued['id']}/result")
+    assert error.value.code == 409
+
+
+def test_daemon_rejects_invalid_jobs(analysis_daemon):
+    for data in [{}, [SGF], {'sgf': 'not sgf'}, {'sgf': SGF, 'config': {'unknown': 1}}, {'sgf': SGF, 'config': []},
+                 {'sgf': SGF, 'config': {'analyze_time': '10'}}, {'sgf': SGF, 'config': {'analyze_time': 0.5}},
+                 {'sgf': SGF, 'config': {'name': 1}},
+                 {'sgf': SGF, 'priority': 'high'}]:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            request(analysis_daemon, 'POST', '/jobs', data)
+        assert error.value.code == 400
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        request(analysis_daemon, 'GET', '/jobs/abc')
+    assert error.value.code == 404
+
+
+def test_daemon_keeps_last_finished_jobs(analysis_daemon, tmpdir):
+    analysis_daemon.max_finished = 2
+    analysis_daemon.release.set()
+    jobs = [json.load(request(analysis_daemon, 'POST', '/jobs', {'sgf': SGF, 'config': {'analyze_time': 1}}))
+            for _ in range(3)]
+    list(request(analysis_daemon, 'GET', f"/jobs/{jobs[2]['id']}/events"))
+
+    # Job is retired right after its last event is sent
+    for _ in range(50):
+        listed = [job['id'] for job in json.load(request(analysis_daemon, 'GET', '/jobs'))]
+        if len(listed) == 2:
+            break
+        time.sleep(0.01)
+    assert listed == [jobs[1]['id'], jobs[2]['id']]
+    assert not [path for path in tmpdir.listdir() if path.basename.startswith(jobs[0]['id'])]
+    assert tmpdir.join(f"{jobs[2]['id']}.sgf.result").check()
+
+
+def test_daemon_does_not_cancel_started_job(analysis_daemon):
+    job = analysis_daemon.submit(SGF)
+    analysis_daemon.started.wait(5)
+
+    assert not analysis_daemon.cancel(job)
+    assert job.status == 'running'
+
+
+def test_daemon_analyzes_job_with_bots(tmpdir, monkeypatch):
+    with open(settings.PATH_TO_CONFIG) as config_file:
+        config = yaml.safe_load(config_file)['config']
+    monkeypatch.setattr(sgfanalyze, 'CONFIG', config)
+    monkeypatch.setattr(sgfanalyze, 'BOTS', {'fake': {'bot_type': 'leela-zero', 'executable': sys.executable,
+                                                      'arguments': FAKE_ENGINE}})
+    monkeypatch.setattr(settings, 'CHECKPOINTS_DIR', str(tmpdir.join('checkpoints', '{}')))
+
+    pool = EnginePool(lambda: sgfanalyze.create_bot('fake'), 1)
+    analysis_daemon = AnalysisDaemon(sgfanalyze.daemon_analyze(pool, 'fake'), str(tmpdir), config, port=0)
+    thread = threading.Thread(target=analysis_daemon.serve_forever, daemon=True)
+    pool.start()
+    thread.start()
+
+    try:
+        job = json.load(request(analysis_daemon, 'POST', '/jobs', {'sgf': SGF, 'config': {
+            'analyze_time': 2, 'variations_time': 1, 'variations_threshold': 1.0, 'graph_format': 'svg'}}))
+        events = [json.loads(line) for line in request(analysis_daemon, 'GET', f"/jobs/{job['id']}/events")]
+        result = request(analysis_daemon, 'GET', f"/jobs/{job['id']}/result").read().decode()
+    finally:
+        analysis_daemon.shutdown()
+        pool.stop()
+
+    assert events[-1] == {'status': 'done'}
+    assert "Overall black win%" in result
@@ -0,0 +1,24 @@
+import numpy as np
+
+from sgfanalyze import calculate_delta, calculate_deltas
+
+
+def test_calculate_deltas_matches_calculate_delta():
+    # (winrate, previous best move, played move, next player)
+    positions = [(0.5, None, 'pd', 'white'),
+                 (0.45, {'pos': 'dd', 'winrate': 0.52}, 'dp', 'black'),
+                 (0.60, {'pos': 'qq', 'winrate': 0.58}, 'qq', 'white'),
+                 (0.40, {'pos': 'cc', 'winrate': 0.55}, 'cd', 'white'),
+                 (0.70, {'pos': 'cc', 'winrate': 0.55}, 'cd', 'black'),
+                 (np.nan, {'pos': 'cc', 'winrate': 0.55}, 'cd', 'black')]
+
+    deltas = calculate_deltas(np.array([winrate for winrate, _, _, _ in positions]),
+                              np.array([best['winrate'] if best else np.nan for _, best, _, _ in positions]),
+                              np.array([best is not None and best['pos'] == move for _, best, move, _ in positions]),
+                              np.array([player == 'black' for _, _, _, player in positions]))
+
+    for delta, (winrate, best, move, player) in zip(deltas, positions):
+        if best is None or np.isnan(winrate):
+            assert delta == 0.0
+        else:
+            assert np.isclose(delta, calculate_delta({'winrate': winrate}, best, move, player))
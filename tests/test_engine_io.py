@@ -0,0 +1,55 @@
+import sys
+import threading
+from subprocess import Popen, PIPE
+
+from engine_io import close_reader, multiplexer, open_reader
+
+# Writes partial lines to stdout and stderr, then waits for stdin to close
+SCRIPT = """
+import sys, time
+for i in range(3):
+    sys.stdout.write(f"= line {i}")
+    sys.stdout.flush()
+    time.sleep(0.01)
+    sys.stdout.write("\\n")
+    sys.stdout.flush()
+    sys.stderr.write(f"Playouts: {i}\\n")
+    sys.stderr.flush()
+sys.stdin.read()
+"""
+
+
+def read_lines(reader, count):
+    lines = []
+    while len(lines) < count:
+        line = reader.readline(timeout=5)
+        assert line, "engine output was not read"
+        lines.append(line)
+    return lines
+
+
+def test_engines_are_read_by_one_thread():
+    processes = [Popen([sys.executable, '-c', SCRIPT], stdin=PIPE, stdout=PIPE, stderr=PIPE) for _ in range(4)]
+    progress = []
+
+    readers = [(open_reader(process.stdout), open_reader(process.stderr, on_line=progress.append))
+               for process in processes]
+
+    for stdout, stderr in readers:
+        assert read_lines(stdout, 3) == ["= line 0\n", "= line 1\n", "= line 2\n"]
+        assert read_lines(stderr, 3) == ["Playouts: 0\n", "Playouts: 1\n", "Playouts: 2\n"]
+
+    assert [thread.name for thread in threading.enumerate()].count('engine-io') == 1
+    assert sorted(progress) == sorted(["Playouts: 0\n", "Playouts: 1\n", "Playouts: 2\n"] * 4)
+
+    for process, (stdout, stderr) in zip(processes, readers):
+        close_reader(stdout)
+        close_reader(stderr)
+        process.stdin.close()
+        process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+    # Thread exits with the last unregistered pipe
+    multiplexer.join(timeout=5)
+    assert multiplexer._thread is None
@@ -0,0 +1,56 @@
+from bot_engines import LeelaCLI, LeelaZeroCLI
+from utils import parse_position, parse_positions
+
+LEELA_STDERR = [
+    "Nodes: 1000, Win: 46.48% (MC:43.02%/VN:53.02%), PV: D4 Q16\n",
+    "\n",
+    "Q16 ->    1200 (W: 52.31%) (U: 51.31%) (V: 53.31%:    598) (N: 32.4%) PV: Q16 D4 Q3\n",
+    " D4 ->    1500 (W: 51.00%) (U: 50.00%) (V: 52.00%:    711) (N: 23.7%) PV: D4 Q16\n",
+    "\n",
+    "================\n",
+    "3000 visits, score 52.31% (from 50.00%) PV: Q16 D4 Q3\n",
+    "\n",
+    "MC winrate=0.510000, NN eval=0.530000, score=B+3.5\n",
+    "3000 visits, 2800 nodes, 2700 playouts, 1200 p/s\n",
+]
+
+LEELA_ZERO_STDERR = [
+    "NN eval=0.480000\n",
+    "Playouts: 500, Win: 51.00%, PV: Q16 D4\n",
+    " Q16 ->     900 (V: 55.00%) (LCB: 53.00%) (N: 30.00%) PV: Q16 D4 pass\n",
+    "  D4 ->     400 (V: 50.00%) (LCB: 48.00%) (N: 20.00%) PV: D4\n",
+    "\n",
+    "1300 visits, 1200 nodes, 1100 playouts, 500 n/s\n",
+]
+
+
+def test_parse_positions_matches_parse_position():
+    positions = ["A1", "T19", "Q16", "D4", "K10", "pass"]
+    assert parse_positions(19, positions) == [parse_position(19, pos) for pos in positions]
+    assert parse_positions(9, ["J9", "A1"]) == [parse_position(9, "J9"), parse_position(9, "A1")]
+
+
+def test_leela_analysis_is_parsed_in_single_pass():
+    engine = LeelaCLI('leela', 'leela', '')
+    stats, move_list = engine.parse_analysis(["= Q16\n", "\n"], LEELA_STDERR)
+
+    assert stats == {'best': 'pd', 'winrate': 0.5231, 'mc_winrate': 0.51, 'nn_winrate': 0.53, 'margin': 'B+3.5',
+                     'visits': 3000, 'chosen': 'pd'}
+    # Best move goes first even with fewer visits
+    assert [move['pos'] for move in move_list] == ['pd', 'dp']
+    assert move_list[0]['pv'] == ['pd', 'dp', 'pq']
+    assert move_list[0]['nn_count'] == 598
+    assert move_list[1]['color'] == 'black'
+
+
+def test_leela_zero_winrates_are_flipped_for_white():
+    engine = LeelaZeroCLI('leela-zero', 'leela-zero', '')
+    engine.set_history(["play black Q16"])
+    stats, move_list = engine.parse_analysis(["= resign\n"], LEELA_ZERO_STDERR)
+
+    assert stats['visits'] == 1300
+    assert stats['best'] == stats['chosen'] == 'pd'
+    assert abs(stats['winrate'] - 0.45) < 1e-9
+    assert move_list[0]['pv'] == ['pd', 'dp', '']
+    assert move_list[1]['color'] == 'white'
+    assert abs(move_list[1]['winrate'] - 0.5) < 1e-9
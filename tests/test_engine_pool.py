@@ -0,0 +1,186 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+import engine_pool
+from bot_engines import EngineFailure, LeelaZeroCLI
+from engine_pool import EnginePool
+
+FAKE_ENGINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_engine.py')
+
+
+class DummyEngine:
+    def __init__(self):
+        self.started = False
+        self.busy = False
+        self.starts = 0
+
+    @property
+    def alive(self):
+        return self.started
+
+    def start(self):
+        self.started = True
+        self.starts += 1
+
+    def stop(self):
+        self.started = False
+
+
+def test_engine_pool_runs_jobs_concurrently():
+    engines = []
+
+    def factory():
+        engine = DummyEngine()
+        engines.append(engine)
+        return engine
+
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def job(engine, value):
+        assert engine.started and not engine.busy
+        engine.busy = True
+        with lock:
+            running.append(value)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(value)
+        engine.busy = False
+        return value * 2
+
+    pool = EnginePool(factory, 3)
+    pool.start()
+    futures = [pool.submit(job, i) for i in range(9)]
+
+    assert [future.result() for future in futures] == [i * 2 for i in range(9)]
+    assert max(peak) == 3
+
+    pool.stop()
+    assert len(engines) == 3
+    assert not any(engine.started for engine in engines)
+
+
+def test_engine_pool_prefers_main_line_jobs():
+    pool = EnginePool(DummyEngine, 1)
+    pool.start()
+
+    release = threading.Event()
+    order = []
+
+    def job(engine, name):
+        order.append(name)
+
+    blocker = pool.submit(lambda engine: release.wait(1))
+    futures = [pool.submit(job, 'variation', priority=engine_pool.VARIATIONS),
+               pool.submit(job, 'main', priority=engine_pool.MAIN_LINE)]
+    release.set()
+
+    blocker.result()
+    for future in futures:
+        future.result()
+    assert order == ['main', 'variation']
+
+    pool.stop()
+    assert pool.submit(job, 'late').cancelled()
+
+
+def test_engine_pool_restarts_failed_engine_and_retries_its_job(monkeypatch):
+    monkeypatch.setattr(engine_pool, 'RESTART_DELAY', 0.01)
+    engine = DummyEngine()
+    pool = EnginePool(lambda: engine, 1)
+    pool.start()
+
+    def job(engine, value):
+        if engine.starts == 1:
+            raise EngineFailure("GTP console closed its output.")
+        return value
+
+    def always_failing(engine):
+        raise EngineFailure("GTP console closed its output.")
+
+    try:
+        assert pool.submit(job, 'retried').result(5) == 'retried'
+        assert engine.starts == 2
+
+        with pytest.raises(EngineFailure):
+            pool.submit(always_failing).result(5)
+
+        # Only jobs interrupted by engine failure are retried, other errors are raised at once
+        with pytest.raises(ZeroDivisionError):
+            pool.submit(lambda engine: 1 / 0).result(5)
+        assert engine.starts == 2 + 1 + engine_pool.MAX_RETRIES
+    finally:
+        pool.stop()
+
+
+def test_engine_pool_restarts_engine_failed_to_start(monkeypatch):
+    monkeypatch.setattr(engine_pool, 'RESTART_DELAY', 0.01)
+
+    class FailingStart(DummyEngine):
+        def start(self):
+            super().start()
+            if self.starts == 1:
+                self.started = False
+                raise EngineFailure("GTP console did not reply to boardsize 19 in 10.0 seconds.")
+
+    engine = FailingStart()
+    pool = EnginePool(lambda: engine, 1)
+    pool.start()
+
+    try:
+        assert pool.submit(lambda engine: engine.starts).result(5) == 2
+    finally:
+        pool.stop()
+
+
+def test_engine_start_waits_for_slow_startup_only_until_its_deadline():
+    engine = LeelaZeroCLI('leela-zero', sys.executable, f"{FAKE_ENGINE} --startup-delay 3", startup_timeout=0.5)
+
+    try:
+        with pytest.raises(EngineFailure):
+            engine.start()
+    finally:
+        engine.stop()
+
+
+def test_engine_genmove_returns_summary_of_search():
+    engine = LeelaZeroCLI('leela-zero', sys.executable, FAKE_ENGINE, time_per_move=1)
+    engine.start()
+
+    try:
+        engine.set_history(["play black Q16"])
+        engine.go_to_position()
+        stdout, stderr = engine.genmove()
+    finally:
+        engine.stop()
+
+    # Whole analysis is returned with the move, even if its reader thread lags behind
+    assert any(engine.is_summary_line(line) for line in stderr)
+    assert engine.parse_analysis(stdout, stderr)[0]['visits'] == 1833
+
+
+@pytest.mark.parametrize('fault', ['--crash-once', '--hang-once'])
+def test_engine_pool_survives_engine_fault(tmpdir, monkeypatch, fault):
+    monkeypatch.setattr(engine_pool, 'RESTART_DELAY', 0.01)
+    arguments = f"{FAKE_ENGINE} {fault} {tmpdir.join('fault')}"
+    pool = EnginePool(lambda: LeelaZeroCLI('leela-zero', sys.executable, arguments, time_per_move=1), 1)
+    pool.start()
+
+    def analyze(engine):
+        engine.set_history(["play black Q16"])
+        engine.go_to_position()
+        return engine.analyze()
+
+    try:
+        stats, move_list = pool.submit(analyze).result(30)
+    finally:
+        pool.stop()
+
+    assert tmpdir.join('fault').exists()
+    assert stats['visits'] == 1833 and len(move_list) == 3
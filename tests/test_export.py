@@ -0,0 +1,29 @@
+import numpy as np
+
+from export import ResultsExporter, load_results
+from results_store import NO_MOVE, encode_move
+
+
+def test_export_chunks(tmpdir):
+    export_dir = str(tmpdir.join('export'))
+    exporter = ResultsExporter(export_dir, top_n=2, chunk_size=2)
+    move_list = [{'pos': 'pd', 'visits': 900, 'winrate': 0.5}]
+
+    exporter.add('game', 'Alice', 'Bob', 0, 'black', 'dd', {'winrate': 0.45, 'visits': 1000}, -0.05, {}, [])
+    exporter.add('game', 'Alice', 'Bob', 1, 'white', 'pd', {'winrate': 0.45}, 0.0, {'visits': 1000}, move_list)
+    assert len(tmpdir.join('export').listdir()) == 1
+
+    exporter.add('other', 'Carol', 'Dave', 5, 'black', '', {}, 0.0, {}, [])
+    exporter.flush()
+
+    results = load_results(export_dir)
+    order = np.argsort(results['move_num'])
+
+    assert list(results['game'][order]) == ['game', 'game', 'other']
+    assert list(results['black'][order]) == ['Alice', 'Alice', 'Carol']
+    assert list(results['move'][order]) == [encode_move('dd'), encode_move('pd'), encode_move('')]
+    assert list(results['best'][order]) == [NO_MOVE, encode_move('pd'), NO_MOVE]
+    assert list(results['delta'][order]) == [-0.05, 0.0, 0.0]
+    assert list(results['top0_visits'][order]) == [-1, 900, -1]
+    assert list(results['top1_pos'][order]) == [NO_MOVE] * 3
+    assert np.isnan(results['winrate'][order][2])
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bot_engines import LeelaCLI, LeelaZeroCLI
+
+FAKE_ENGINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_engine.py')
+
+
+@pytest.mark.parametrize('engine_format, cli_class', [('leela', LeelaCLI), ('leela-zero', LeelaZeroCLI)])
+def test_fake_engine_output_is_parsed(engine_format, cli_class):
+    commands = "boardsize 19\nclear_board\nplay black Q16\ngenmove white\nquit\n"
+    result = subprocess.run([sys.executable, FAKE_ENGINE, '--format', engine_format], input=commands,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    cli = cli_class(engine_format, FAKE_ENGINE, '')
+    cli.set_history(["play black Q16"])
+    stats, move_list = cli.parse_analysis(result.stdout.splitlines(keepends=True),
+                                          result.stderr.splitlines(keepends=True))
+
+    assert stats['visits'] == 1833
+    assert stats['chosen'] == stats['best'] == move_list[0]['pos']
+    assert len(move_list) == 3 and all(move['color'] == 'white' for move in move_list)
+
+    # Analysis depends only on the position
+    assert subprocess.run([sys.executable, FAKE_ENGINE, '--format', engine_format], input=commands,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True).stderr == result.stderr
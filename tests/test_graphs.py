@@ -0,0 +1,16 @@
+import xml.etree.ElementTree as ElementTree
+
+from graphs import write_svg
+
+
+def test_write_svg(tmpdir):
+    path = str(tmpdir.join('graph.svg'))
+    write_svg(path, [0, 1, 5], [0.5, 0.25, 1.0], 10)
+
+    root = ElementTree.parse(path).getroot()
+    polyline = root.find('{http://www.w3.org/2000/svg}polyline')
+    points = [tuple(map(float, point.split(','))) for point in polyline.get('points').split()]
+
+    assert len(points) == 3
+    assert points[0][1] == 200.0 and points[2][1] == 40.0
+    assert points[0][0] < points[1][0] < points[2][0]
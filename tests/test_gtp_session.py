@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+from bot_engines import CLIException, LeelaZeroCLI
+from gtp_session import SessionRecorder, SessionReplay
+
+FAKE_ENGINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_engine.py')
+HISTORIES = [[], ["play black Q16"], ["play black Q16", "play white D4"]]
+
+
+def analyze_all(bot):
+    results = []
+    for history in HISTORIES:
+        bot.set_history(history)
+        bot.go_to_position()
+        results.append(bot.analyze())
+    return results
+
+
+def test_replayed_session_gives_recorded_results(tmpdir):
+    path = str(tmpdir.join('session.jsonl'))
+
+    recorder = SessionRecorder(path)
+    bot = LeelaZeroCLI('leela-zero', sys.executable, FAKE_ENGINE, time_per_move=1, session=recorder)
+    bot.start()
+    try:
+        recorded = analyze_all(bot)
+    finally:
+        bot.stop()
+        recorder.close()
+
+    replayed_bot = LeelaZeroCLI('leela-zero', 'missing-executable', '', time_per_move=1, session=SessionReplay(path))
+    replayed_bot.start()
+    assert replayed_bot.process is None
+    assert analyze_all(replayed_bot) == recorded
+
+    # Search time is a part of the position key
+    replayed_bot.set_time_per_move(2)
+    with pytest.raises(CLIException):
+        replayed_bot.analyze()
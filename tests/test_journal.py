@@ -0,0 +1,35 @@
+from journal import Journal
+
+
+def test_journal_resume(tmpdir):
+    path = str(tmpdir.join('journal.jsonl'))
+    stats = {'winrate': 0.55, 'visits': 1000}
+    move_list = [{'pos': 'pd', 'visits': 1000, 'winrate': 0.55, 'pv': ['pd', 'dd']}]
+
+    journal = Journal(path)
+    journal.open()
+    journal.record('game', 'main', 3, stats, move_list)
+    journal.record('game', 'variations', 'abc', stats, move_list)
+    journal.record('other', 'done')
+    journal.close()
+
+    # Process killed during write of the last record
+    with open(path, 'a') as journal_file:
+        journal_file.write('{"game": "game", "pha')
+
+    journal = Journal(path)
+    journal.open()
+    assert journal.results('game', 'main', 3) == (stats, move_list)
+    assert journal.results('game', 'variations', 'abc') == (stats, move_list)
+    assert journal.results('game', 'main', 4) is None
+    assert journal.results('missing', 'main', 3) is None
+    assert journal.is_done('other')
+    assert not journal.is_done('game')
+
+    journal.record('game', 'done')
+    journal.close()
+    assert journal.results('game', 'main', 3) is None
+
+    journal = Journal(path)
+    journal.load()
+    assert journal.is_done('game')
@@ -0,0 +1,35 @@
+import logging
+
+from log import LazyLines, TranscriptHandler
+
+
+def test_lazy_lines():
+    assert str(LazyLines("< ", ["= D4\n", "\n"])) == "< = D4\n< "
+    assert str(LazyLines("> ", ["play black D4", "genmove white"])) == "> play black D4\n> genmove white"
+
+    # Lines changed after logging are written as they were logged
+    history = ["play black D4"]
+    lines = LazyLines("> ", history)
+    history.append("play white Q16")
+    assert str(lines) == "> play black D4"
+
+
+def test_transcripts_per_engine(tmpdir):
+    handler = TranscriptHandler(str(tmpdir))
+    handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def record(transcript, message, **extra):
+        log_record = logging.LogRecord('gtp', logging.DEBUG, __file__, 0, message, None, None)
+        log_record.__dict__.update(extra, transcript=transcript)
+        return log_record
+
+    for transcript, message in [('leela-1', 'first'), ('leela-2', 'second'), ('leela-1', 'third')]:
+        handler.handle(record(transcript, message))
+
+    # Stopped engine's file is closed at once, not when the program exits
+    handler.handle(record('leela-1', '', end_transcript=True))
+    assert list(handler._files) == ['gtp.leela-2']
+    handler.close()
+
+    assert tmpdir.join('gtp.leela-1.log').read() == "first\nthird\n"
+    assert tmpdir.join('gtp.leela-2.log').read() == "second\n"
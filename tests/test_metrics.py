@@ -0,0 +1,54 @@
+import json
+
+import metrics
+
+
+def test_timers_record_to_run_and_collecting_timings():
+    game = metrics.Timings()
+
+    with metrics.collecting(game):
+        with metrics.timer('test_phase'):
+            pass
+        metrics.timed('test_phase')(lambda: None)()
+
+    with metrics.timer('test_phase'):
+        pass
+
+    assert game.summary()['test_phase']['count'] == 2
+    assert metrics.run_timings.summary()['test_phase']['count'] >= 3
+
+
+def test_summary_percentiles():
+    timings = metrics.Timings()
+    for i in range(1, 101):
+        timings.add('search', i / 100)
+
+    summary = timings.summary()['search']
+    assert summary['count'] == 100
+    assert abs(summary['total'] - 50.5) < 1e-9
+    assert summary['max'] == 1.0
+    assert (summary['p50'], summary['p90'], summary['p99']) == (0.5, 0.9, 0.99)
+
+
+def test_prometheus_text_and_json(tmpdir):
+    timings = metrics.Timings()
+    timings.add('parse', 0.25)
+    timings.add('parse', 0.75)
+
+    text = metrics.prometheus_text(timings)
+    assert '# TYPE sgf_analyzer_phase_seconds summary' in text
+    assert 'sgf_analyzer_phase_seconds{phase="parse",quantile="0.5"} 0.250000' in text
+    assert 'sgf_analyzer_phase_seconds_sum{phase="parse"} 1.000000' in text
+    assert 'sgf_analyzer_phase_seconds_count{phase="parse"} 2' in text
+
+    json_path, textfile_path = str(tmpdir.join('metrics.json')), str(tmpdir.join('metrics.prom'))
+    writer = metrics.MetricsWriter(json_path, textfile_path, max_games=2)
+    for game in ['old.sgf', 'game.sgf', 'new.sgf']:
+        writer.add_game(game, timings)
+
+    with open(json_path) as json_file:
+        games = json.load(json_file)['games']
+    assert list(games) == ['game.sgf', 'new.sgf']
+    assert games['game.sgf']['parse']['count'] == 2
+    assert tmpdir.join('metrics.prom').read().startswith('# HELP')
+    assert len(tmpdir.listdir()) == 2
@@ -0,0 +1,49 @@
+import os
+import pstats
+import threading
+
+import profiling
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_phase_profiles_are_dumped_per_game(tmpdir):
+    profiler = profiling.PhaseProfiler(str(tmpdir), phases=['parse'], top=5)
+
+    for _ in range(2):
+        with profiler.profile('parse'):
+            # Nested phase is a part of the outer profile
+            with profiler.profile('parse'):
+                busy(1000)
+    with profiler.profile('graph'):
+        busy(1000)
+
+    profiler.dump_game(os.path.join('games', 'game.sgf'))
+
+    assert sorted(os.listdir(str(tmpdir))) == ['game.parse.prof', 'game.profile.txt']
+    stats = pstats.Stats(str(tmpdir.join('game.parse.prof')))
+    assert any(func[2] == 'busy' and stat[0] == 2 for func, stat in stats.stats.items())
+    assert '=== parse ===' in tmpdir.join('game.profile.txt').read()
+    assert profiler.stats == {}
+
+
+def test_sampler_writes_folded_stacks(tmpdir):
+    path = str(tmpdir.join('samples.folded'))
+    sampler = profiling.IntervalSampler(path)
+    stop = threading.Event()
+    worker = threading.Thread(target=stop.wait, name='worker')
+    worker.start()
+
+    try:
+        sampler.sample()
+        sampler.sample()
+    finally:
+        stop.set()
+        worker.join()
+    sampler.write()
+
+    with open(path) as stacks_file:
+        lines = stacks_file.read().splitlines()
+    assert any(line.startswith('worker;') and 'threading.py:wait' in line and line.endswith(' 2') for line in lines)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from report import player_report
+from results_store import NO_MOVE
+
+
+def test_player_report():
+    results = {'game': np.array(['g1', 'g1', 'g1', 'g1', 'g2', 'g1']),
+               'black': np.array(['Alice'] * 4 + ['Bob', 'Alice']),
+               'white': np.array(['Bob'] * 4 + ['Alice', 'Bob']),
+               'move_num': np.array([0, 1, 2, 100, 0, 2], dtype=np.int32),
+               'color': np.array([1, 2, 1, 1, 1, 1], dtype=np.uint8),
+               'move': np.array([1, 2, 3, 4, 5, 3], dtype=np.uint16),
+               'best': np.array([NO_MOVE, 2, 9, 4, 5, 9], dtype=np.uint16),
+               'delta': np.array([0.0, 0.0, -0.3, -0.03, -0.1, -0.3])}
+
+    report = {(row['player'], row['phase']): row for row in player_report(results)}
+
+    alice = report[('Alice', 'opening')]
+    assert (alice['games'], alice['moves']) == (1, 2)
+    assert alice['big mistakes'] == 1 and alice['mistakes'] == 0
+    assert alice['match_rate'] == 0.0
+    assert np.isclose(alice['mean_loss'], 0.15)
+
+    assert report[('Alice', 'middlegame')]['disliked'] == 1
+    assert report[('Alice', 'middlegame')]['match_rate'] == 1.0
+
+    bob = report[('Bob', 'opening')]
+    assert (bob['games'], bob['moves']) == (2, 2)
+    assert bob['mistakes'] == 1
+    assert bob['match_rate'] == 1.0
+
+    assert [row['player'] for row in player_report(results, 'Bob')] == ['Bob']
@@ -0,0 +1,91 @@
+import tracemalloc
+
+from results_store import ResultsStore, decode_move, encode_move
+
+
+def test_encode_move():
+    for pos in ['aa', 'pd', 'ss', 'tt', 'XX', '', 'resign']:
+        assert decode_move(encode_move(pos)) == pos
+
+
+def test_results_round_trip():
+    lz_stats = {'winrate': 0.4567, 'visits': 1500, 'best': 'pd', 'chosen': 'pd'}
+    lz_moves = [{'pos': 'pd', 'visits': 1000, 'winrate': 0.4567, 'policy_prob': 0.35, 'pv': ['pd', 'dd', ''],
+                 'color': 'black'},
+                {'pos': 'dp', 'visits': 500, 'winrate': 0.4412, 'policy_prob': 0.2, 'pv': ['dp'], 'color': 'black'}]
+    book_stats = {'bookmoves': 3, 'positions': 10, 'chosen': 'qd'}
+    book_moves = [{'pos': 'qd', 'is_book': True}]
+    leela_stats = {'winrate': 0.52, 'visits': 900, 'best': 'cc', 'chosen': 'cc', 'margin': 'B+1.5', 'mc_winrate': 0.5}
+    leela_moves = [{'pos': 'cc', 'visits': 900, 'winrate': 0.52, 'mc_winrate': 0.5, 'nn_winrate': 0.54,
+                    'nn_count': 10, 'policy_prob': 0.1, 'pv': ['cc'], 'color': 'white'}]
+
+    store = ResultsStore()
+    store.add(0, book_stats, book_moves)
+    store.add(2, lz_stats, lz_moves)
+    store.add(200, leela_stats, leela_moves)
+
+    assert store.all_stats[0] == book_stats
+    assert store.all_move_lists[0] == book_moves
+    assert store.all_stats[2] == lz_stats
+    assert store.all_move_lists[2] == lz_moves
+    assert store.all_stats[200] == leela_stats
+    assert store.all_move_lists[200] == leela_moves
+
+    assert sorted(store.all_stats) == [0, 2, 200]
+    assert 1 not in store.all_stats and -1 not in store.all_stats
+    assert sorted(store.best_moves) == [2, 200]
+    assert store.best_moves[2] == lz_moves[0]
+
+    move_nums, winrates = store.winrates()
+    assert list(move_nums) == [2, 200]
+    assert list(winrates) == [0.4567, 0.52]
+
+
+def test_results_added_again():
+    stats = {'winrate': 0.5, 'visits': 100}
+    long_moves = [{'pos': 'pd', 'visits': 60, 'winrate': 0.5, 'pv': ['pd', 'dd', 'dp']},
+                  {'pos': 'dd', 'visits': 40, 'winrate': 0.45, 'pv': ['dd'], 'is_book': True}]
+    short_moves = [{'pos': 'dp', 'visits': 100, 'winrate': 0.55, 'pv': ['dp', 'pd']}]
+
+    store = ResultsStore()
+    store.add(0, stats, long_moves)
+    store.add(1, stats, short_moves)
+    store.add(0, stats, short_moves)
+
+    # Rows of the first results are reused
+    assert store.moves.size == 3 and store.pvs.size == 6
+    assert store.all_move_lists[0] == short_moves
+
+    for _ in range(10):
+        store.add(1, stats, long_moves)
+        store.add(0, stats, long_moves)
+
+    # Rows left unused are dropped
+    assert store.moves.size <= 8
+    assert store.all_move_lists[0] == long_moves
+    assert store.all_move_lists[1] == long_moves
+    assert store.all_stats[0] == stats
+
+
+def test_results_memory():
+    points = ['pd', 'dd', 'dp', 'pp', 'qc', 'cq', 'qq', 'cc']
+    results = [({'winrate': 0.5, 'visits': 1600, 'best': 'pd', 'chosen': 'dd'},
+                [{'pos': pos, 'visits': 200 - i, 'winrate': 0.5 - i / 100, 'policy_prob': 0.1, 'pv': points[i:],
+                  'color': 'black'} for i, pos in enumerate(points)])
+               for _ in range(300)]
+
+    store = ResultsStore()
+    for move_num, (stats, move_list) in enumerate(results):
+        store.add(move_num, stats, move_list)
+
+    # Same results as dicts returned by bots take several times the memory of the store
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        dicts = [(store.all_stats[move_num], store.all_move_lists[move_num]) for move_num in range(len(results))]
+        dicts_bytes = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    assert dicts == results
+    assert store.nbytes * 3 < dicts_bytes
@@ -1,4 +1,6 @@
-from utils import convert_position, parse_position
+import pytest
+
+from utils import PointValueError, convert_position, parse_position
 
 
 def test_convert_position_valid():
@@ -45,3 +47,21 @@ def test_parse_position_valid():
     assert parse_position(9, 'J1') == 'ii'
     assert parse_position(9, 'E5') == 'ee'
     assert parse_position(9, 'pass') == ''
+
+
+def test_move_codes():
+    from coords import NO_MOVE, PASS, decode_moves, decode_vertices, encode_move, encode_moves, encode_vertices
+
+    assert encode_move('pd') == 15 * 64 + 3
+    assert encode_move('') == PASS and encode_move(None) == NO_MOVE
+    assert decode_moves(encode_moves(['pd', 'dd', '', 'resign', None])) == ['pd', 'dd', '', 'resign', None]
+
+    # Board positions get codes of their SGF coordinates
+    codes = encode_vertices(19, ['Q16', 'A1', 'pass'])
+    assert codes.dtype.name == 'uint16'
+    assert list(codes) == list(encode_moves([parse_position(19, pos) for pos in ['Q16', 'A1', 'pass']]))
+    assert decode_vertices(19, codes) == ['Q16', 'A1', 'pass']
+    assert decode_vertices(9, encode_vertices(9, ['J9', 'A1'])) == ['J9', 'A1']
+
+    with pytest.raises(PointValueError):
+        encode_vertices(9, ['K10'])
@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_load_heavy_modules():
+    heavy_modules = ['numpy', 'yaml', 'matplotlib', 'pyarrow', 'http.server', 'cProfile', 'pstats']
+    output = subprocess.check_output(
+        [sys.executable, '-c', f'import sys, sgfanalyze; print(*[m for m in {heavy_modules!r} if m in sys.modules])'],
+        cwd=REPO_DIR, universal_newlines=True)
+
+    assert output.split() == []
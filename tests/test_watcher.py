@@ -0,0 +1,19 @@
+import os
+
+from watcher import FolderWatcher
+
+
+def test_watcher_reports_new_and_changed_files(tmpdir):
+    game = tmpdir.join('game.sgf')
+    game.write('(;SZ[19];B[pd])')
+    tmpdir.join('game_bot.sgf').write('(;SZ[19];B[pd]C[annotated])')
+    tmpdir.join('notes.txt').write('not a game')
+
+    watcher = FolderWatcher([str(tmpdir)], ignore_suffix='_bot.sgf')
+    assert watcher.scan() == [str(game)]
+    assert watcher.scan() == []
+
+    game.write('(;SZ[19];B[pd];W[dd])')
+    os.utime(str(game), (0, 0))
+    assert watcher.scan() == [str(game)]
+    assert watcher.scan() == []
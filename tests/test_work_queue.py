@@ -0,0 +1,95 @@
+import os
+import time
+from multiprocessing import Process
+
+from work_queue import WorkQueue, job_id
+
+
+def run_worker(queue_dir, results_dir, paths):
+    work_queue = WorkQueue(queue_dir, lease_time=5)
+    work_queue.start()
+
+    for path in work_queue.jobs(paths, poll_interval=0.05):
+        # Fails if the same job is processed twice
+        fd = os.open(os.path.join(results_dir, job_id(path)), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.write(fd, work_queue.worker_id.encode())
+        os.close(fd)
+        time.sleep(0.01)
+        work_queue.complete(job_id(path))
+
+    work_queue.stop()
+
+
+def test_work_queue_workers_share_jobs(tmpdir):
+    queue_dir = str(tmpdir.mkdir('queue'))
+    results_dir = str(tmpdir.mkdir('results'))
+    paths = [f'game_{i}.sgf' for i in range(40)]
+
+    workers = [Process(target=run_worker, args=(queue_dir, results_dir, paths)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    assert sorted(os.listdir(results_dir)) == sorted(job_id(path) for path in paths)
+    assert not os.listdir(os.path.join(queue_dir, 'leases'))
+
+
+def test_work_queue_takes_over_expired_lease(tmpdir):
+    queue_dir = str(tmpdir)
+
+    first = WorkQueue(queue_dir, 'first', lease_time=60)
+    first.start()
+    second = WorkQueue(queue_dir, 'second', lease_time=60)
+    second.start()
+
+    assert first.claim('job')
+    assert not second.claim('job')
+
+    lease_path = os.path.join(queue_dir, 'leases', 'job')
+    os.utime(lease_path, (time.time() - 120, time.time() - 120))
+
+    assert second.claim('job')
+    with open(lease_path) as lease_file:
+        assert lease_file.read() == 'second'
+
+    # Worker which lost the lease must not remove it
+    first.release('job')
+    assert os.path.exists(lease_path)
+
+    second.complete('job')
+    assert first.is_done('job')
+
+    first.stop()
+    second.stop()
+
+
+def test_work_queue_expired_lease_is_taken_over_once(tmpdir, monkeypatch):
+    queue_dir = str(tmpdir)
+    stale, first, second = (WorkQueue(queue_dir, worker, lease_time=60) for worker in ('stale', 'first', 'second'))
+    for work_queue in (stale, first, second):
+        work_queue.start()
+
+    assert stale.claim('job')
+    lease_path = os.path.join(queue_dir, 'leases', 'job')
+    os.utime(lease_path, (time.time() - 120, time.time() - 120))
+
+    # Both workers see the expired lease, the first one takes it over right before the second one moves it away
+    rename = os.rename
+
+    def delayed_rename(src, dst):
+        if dst.endswith('second.expired'):
+            monkeypatch.setattr(os, 'rename', rename)
+            assert first.claim('job')
+        rename(src, dst)
+
+    monkeypatch.setattr(os, 'rename', delayed_rename)
+
+    assert not second.claim('job')
+    with open(lease_path) as lease_file:
+        assert lease_file.read() == 'first'
+    assert os.listdir(os.path.join(queue_dir, 'leases')) == ['job']
+
+    for work_queue in (stale, first, second):
+        work_queue.stop()
@@ -1,4 +1,4 @@
-import re
+from functools import lru_cache
 
 SGF_COORD = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', 'u',
              'v', 'w', 'x', 'y', 'z', 'A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N', 'O', 'P',
@@ -22,17 +22,12 @@ def convert_position(board_size, coord):
     """
     Convert SGF coordinates to board position coordinates
     Example aa -> A1, qq -> P15"""
+    table = sgf_to_gtp_table(board_size)
 
-    if coord == "" or (coord == "tt" and board_size <= 19):
-        return "pass"
-
-    if coord[0] not in SGF_COORD or board_size <= SGF_COORD.index(coord[0]) or board_size <= SGF_COORD.index(coord[1]):
+    if coord not in table:
         raise PointValueError(f'"{coord}" is not a valid point for board size = {board_size}.')
 
-    x = BRD_COORD[SGF_COORD.index(coord[0])]
-    y = board_size - SGF_COORD.index(coord[1])
-
-    return f"{x}{y}"
+    return table[coord]
 
 
 def parse_position(board_size, pos):
@@ -40,14 +35,40 @@ def parse_position(board_size, pos):
     Convert board position coordinates to SGF coordinates
     Example A1 -> aa, P15 -> qq
     """
+    table = gtp_to_sgf_table(board_size)
+
+    if pos not in table:
+        raise PointValueError(f'"{pos} is not a valid point for board size = {board_size}')
+
+    return table[pos]
+
+
+@lru_cache(maxsize=None)
+def gtp_to_sgf_table(board_size):
+    """ Returns SGF coordinates of every board position of given board size, e.g. 'A1' -> 'as'"""
     # Pass moves are the empty string in sgf files
-    if pos == "pass":
-        return ""
-
-    match = re.match(r"([a-zA-Z]+){1,2}([0-9]+){1,2}", pos)
-    if match and BRD_COORD.index(match.group(1)) < board_size and int(match.group(2)) <= board_size:
-        x = SGF_COORD[BRD_COORD.index(match.group(1))]
-        y = SGF_COORD[board_size - int(match.group(2))]
-        return f"{x}{y}"
-    else:
-        raise PointValueError(f'"{pos} is not a valid point for board size = {board_size}')
\ No newline at end of file
+    table = {'pass': ''}
+
+    for x in range(board_size):
+        for y in range(1, board_size + 1):
+            table[f"{BRD_COORD[x]}{y}"] = f"{SGF_COORD[x]}{SGF_COORD[board_size - y]}"
+
+    return table
+
+
+@lru_cache(maxsize=None)
+def sgf_to_gtp_table(board_size):
+    """ Returns board position of every SGF coordinates of given board size, e.g. 'as' -> 'A1'"""
+    table = {pos: vertex for vertex, pos in gtp_to_sgf_table(board_size).items()}
+
+    # 'tt' is an old way to pass, it is a point of larger boards
+    if board_size <= 19:
+        table['tt'] = 'pass'
+
+    return table
+
+
+def parse_positions(board_size, positions):
+    """ Converts board positions to SGF coordinates, e.g. principal variation of a move"""
+    table = gtp_to_sgf_table(board_size)
+    return [table[pos] if pos in table else parse_position(board_size, pos) for pos in positions]
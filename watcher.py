@@ -0,0 +1,58 @@
+import os
+import time
+
+
+class FolderWatcher:
+    """
+    Polls given SGF-files and directories and reports files which are new or changed since the last poll.
+    Files are compared by modification time and size, so games growing during live relay are reported
+    after every saved move.
+    """
+
+    def __init__(self, paths, interval=5.0, ignore_suffix=None):
+        self.paths = list(paths)
+        self.interval = interval
+        self.ignore_suffix = ignore_suffix
+
+        self._seen = {}
+
+    def files(self):
+        for path in self.paths:
+            if os.path.isdir(path):
+                for file in sorted(os.listdir(path)):
+                    if os.path.splitext(file)[1] == '.sgf':
+                        yield os.path.join(path, file)
+            elif os.path.exists(path):
+                yield path
+
+    def scan(self):
+        """ Returns list of files changed since the previous scan."""
+        changed = []
+
+        for path in self.files():
+            # Annotated files are written next to the watched ones
+            if self.ignore_suffix and path.endswith(self.ignore_suffix):
+                continue
+
+            try:
+                sgf_stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            signature = (sgf_stat.st_mtime, sgf_stat.st_size)
+            if self._seen.get(path) != signature:
+                self._seen[path] = signature
+                changed.append(path)
+
+        return changed
+
+    def watch(self):
+        """ Yields changed files forever, waits interval seconds between polls without changes."""
+        while True:
+            changed = self.scan()
+
+            for path in changed:
+                yield path
+
+            if not changed:
+                time.sleep(self.interval)
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import socket
+import time
+from threading import Event, Thread
+
+from log import logger
+
+
+def job_id(path):
+    return hashlib.md5(os.path.abspath(path).encode()).hexdigest()
+
+
+class WorkQueue:
+    """
+    Queue of game jobs shared by workers through files in a common (e.g. NFS) directory.
+
+    A worker owns a job while its lease file exists, the lease is created atomically with O_EXCL and
+    refreshed by heartbeat. Leases not refreshed for lease_time seconds are taken over by other workers.
+    Finished jobs are marked with files in done directory.
+    """
+
+    def __init__(self, queue_dir, worker_id=None, lease_time=300):
+        self.leases_dir = os.path.join(queue_dir, 'leases')
+        self.done_dir = os.path.join(queue_dir, 'done')
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_time = lease_time
+
+        self._leases = set()
+        self._stopped = Event()
+        self._heartbeat = None
+
+    def start(self):
+        os.makedirs(self.leases_dir, exist_ok=True)
+        os.makedirs(self.done_dir, exist_ok=True)
+
+        self._stopped.clear()
+        self._heartbeat = Thread(target=self._beat, daemon=True)
+        self._heartbeat.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+
+        for lease in list(self._leases):
+            self.release(lease)
+
+    def _lease_path(self, job):
+        return os.path.join(self.leases_dir, job)
+
+    def _done_path(self, job):
+        return os.path.join(self.done_dir, job)
+
+    def _owns(self, job):
+        try:
+            with open(self._lease_path(job), encoding='utf-8') as lease_file:
+                return lease_file.read() == self.worker_id
+        except FileNotFoundError:
+            return False
+
+    def _beat(self):
+        while not self._stopped.wait(self.lease_time / 3):
+            for job in list(self._leases):
+                if self._owns(job):
+                    os.utime(self._lease_path(job))
+                else:
+                    logger.warning("Lease for job %s was taken over by another worker.", job)
+                    self._leases.discard(job)
+
+    def is_done(self, job):
+        return os.path.exists(self._done_path(job))
+
+    def _lease_state(self, path):
+        """ Returns modification time and owner of the lease file, None if there is none."""
+        try:
+            with open(path, encoding='utf-8') as lease_file:
+                return os.fstat(lease_file.fileno()).st_mtime_ns, lease_file.read()
+        except FileNotFoundError:
+            return None
+
+    def claim(self, job):
+        """ Returns True if lease for the job is acquired by this worker."""
+        lease_path = self._lease_path(job)
+        lease_state = self._lease_state(lease_path)
+
+        if lease_state is not None:
+            if time.time() - lease_state[0] / 1e9 < self.lease_time:
+                return False
+
+            # Only one worker succeeds to move expired lease away
+            expired_path = f"{lease_path}.{self.worker_id}.expired"
+            try:
+                os.rename(lease_path, expired_path)
+            except FileNotFoundError:
+                return False
+
+            # Another worker could take over the lease after it was examined, its fresh lease is put back then
+            if self._lease_state(expired_path) != lease_state:
+                try:
+                    os.link(expired_path, lease_path)
+                except FileExistsError:
+                    logger.warning("Lease for job %s was moved away while it was taken over.", job)
+                os.remove(expired_path)
+                return False
+
+            os.remove(expired_path)
+            logger.info("Taking over expired lease for job %s.", job)
+
+        try:
+            lease_fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+
+        with os.fdopen(lease_fd, 'w', encoding='utf-8') as lease_file:
+            lease_file.write(self.worker_id)
+
+        self._leases.add(job)
+        return True
+
+    def release(self, job):
+        """ Gives up the job, so other workers could take it."""
+        self._leases.discard(job)
+        if self._owns(job):
+            os.remove(self._lease_path(job))
+
+    def complete(self, job):
+        with open(self._done_path(job), mode='w', encoding='utf-8') as done_file:
+            done_file.write(self.worker_id)
+        self.release(job)
+
+    def jobs(self, paths, poll_interval=None):
+        """
+        Yields paths claimed by this worker, caller must complete or release each of them.
+        Waits for jobs leased by other workers until they are done or their leases expire.
+        """
+        poll_interval = poll_interval or self.lease_time / 3
+        pending = {job_id(path): path for path in paths}
+
+        while pending:
+            claimed = None
+
+            for job in list(pending):
+                if self.is_done(job):
+                    del pending[job]
+                elif self.claim(job):
+                    # Job could be completed by another worker right before the claim
+                    if self.is_done(job):
+                        self.release(job)
+                        del pending[job]
+                        continue
+
+                    claimed = job
+                    break
+
+            if claimed is not None:
+                yield pending.pop(claimed)
+            elif pending:
+                logger.info("Waiting for %d jobs leased by other workers.", len(pending))
+                time.sleep(poll_interval)